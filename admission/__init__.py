@@ -0,0 +1,3 @@
+from .controller import AdmissionController, AdmissionStats, OverloadedError, parse_request_start
+
+__all__ = ['AdmissionController', 'AdmissionStats', 'OverloadedError', 'parse_request_start']
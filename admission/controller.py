@@ -0,0 +1,122 @@
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from metrics import ADMISSIONS
+
+SERVICE_UNAVAILABLE = 503
+
+
+class OverloadedError(Exception):
+    def __init__(self, message: str, status: int, retry_after: float) -> None:
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_request_start(value: str | None, now: float) -> float | None:
+    # Seconds a request waited since the proxy in front received it, from an X-Request-Start header like t=1712345678.123.
+    # Proxies send seconds, milliseconds or microseconds since the epoch, told apart by their magnitude. None when the
+    # proxy did not set it.
+    if not value:
+        return None
+
+    try:
+        start = float(value.removeprefix('t='))
+    except ValueError:
+        return None
+
+    if start > 1e14:  # noqa: PLR2004
+        start /= 1e6
+    elif start > 1e11:  # noqa: PLR2004
+        start /= 1e3
+
+    return max(now - start, 0)
+
+
+@dataclass
+class AdmissionStats:
+    in_flight: int
+    latency: float
+    queued: float
+    admitted: int
+    deadline: int
+    busy: int
+
+
+class AdmissionController:
+    # Turns pushes away before doing any work when they would not be answered before Pub/Sub redelivers them. A push
+    # has already spent queued seconds waiting for a thread, and takes about the latency of the recent requests once it
+    # has one. It is rejected with a 503 when that is past headroom of the ack deadline. A push that finds nothing in
+    # flight is only rejected when its queue time alone is past it, so the latency keeps being measured and shedding
+    # stops on recovery. Without a queue time, pushes wait for a thread unseen, so one that finds max_in_flight others
+    # in flight is rejected instead, and the pushes behind it are answered quickly rather than after waiting.
+    def __init__(self, headroom: float = 0.8, alpha: float = 0.2, max_in_flight: int | None = None) -> None:
+        self.headroom = headroom
+        self.alpha = alpha
+        self.max_in_flight = max_in_flight
+
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.latency = 0.0
+        self.queued = 0.0
+        self.admitted = 0
+        self.deadline = 0
+        self.busy = 0
+
+    def predict(self, queued: float) -> float:
+        # Seconds since it was received that a push admitted now would take to be answered
+        return queued + (self.latency if self.in_flight > 0 else 0)
+
+    def _admit(self, deadline: float, queued: float | None) -> None:
+        with self.lock:
+            if queued is None:
+                if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+                    self.busy += 1
+                    ADMISSIONS.labels('busy').inc()
+                    raise OverloadedError('Every thread is busy, retry later.', SERVICE_UNAVAILABLE, max(self.latency, 1))
+                queued = 0
+
+            self.queued = queued if self.admitted == 0 else self.queued + self.alpha * (queued - self.queued)
+
+            predicted = self.predict(queued)
+            if predicted > deadline * self.headroom:
+                self.deadline += 1
+                ADMISSIONS.labels('deadline').inc()
+                raise OverloadedError(
+                    'Request would miss the ack deadline, retry later.', SERVICE_UNAVAILABLE, max(predicted - deadline, 1)
+                )
+
+            self.in_flight += 1
+            self.admitted += 1
+            ADMISSIONS.labels('admitted').inc()
+
+    def _done(self, elapsed: float) -> None:
+        with self.lock:
+            self.in_flight -= 1
+            self.latency = elapsed if self.completed == 0 else self.latency + self.alpha * (elapsed - self.latency)
+            self.completed += 1
+
+    @contextmanager
+    def admit(self, deadline: float, queued: float | None = None) -> Iterator[None]:
+        self._admit(deadline, queued)
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._done(time.monotonic() - start)
+
+    def stats(self) -> AdmissionStats:
+        with self.lock:
+            return AdmissionStats(
+                in_flight=self.in_flight,
+                latency=self.latency,
+                queued=self.queued,
+                admitted=self.admitted,
+                deadline=self.deadline,
+                busy=self.busy,
+            )
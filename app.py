@@ -1,36 +1,242 @@
+import atexit
 import os
+import threading
 
+from dependency_injector import providers
 from flask import Flask
-from gcp_microservice_utils import setup_apigateway, setup_cloud_logging, setup_cloud_trace
 
-from blueprints import BlueprintEvent, BlueprintHealth
+from blueprints import BlueprintEvent, BlueprintHealth, BlueprintMetrics, BlueprintOutbox, BlueprintUpstream
+from blueprints.mails import TEMPLATES
+from blueprints.stream import MAX_ELEMENT_SIZE
+from blueprints.util import setup_apigateway
 from containers import Container
+from metrics import REGISTRY
+from profiling import setup_profiling
+from repositories.memory import parse_limits
+from repositories.rest import StaticTokenProvider
 
 
 class FlaskMicroservice(Flask):
     container: Container
 
 
-def create_app() -> FlaskMicroservice:
+def load_config(config: providers.Configuration) -> None:  # noqa: PLR0915
+    if 'SENDGRID_APIKEY' in os.environ:  # pragma: no cover
+        config.sendgrid.token_provider.from_value(StaticTokenProvider(os.environ['SENDGRID_APIKEY']))
+
+    config.sendgrid.base_url.from_env('SENDGRID_BASE_URL', default='https://api.sendgrid.com')
+
+    # Calls are paced to the budget announced by SendGrid, and after failure_threshold consecutive 429/5xx responses
+    # requests are answered with 503 for reset_timeout seconds, so Pub/Sub backs off instead of waiting on timeouts
+    config.sendgrid.max_rate.from_env('SENDGRID_MAX_RATE', as_=float, default=500)
+    config.sendgrid.burst.from_env('SENDGRID_BURST', as_=float, default=500)
+    config.sendgrid.max_wait.from_env('SENDGRID_MAX_WAIT', as_=float, default=1)
+    config.sendgrid.failure_threshold.from_env('SENDGRID_FAILURE_THRESHOLD', as_=int, default=5)
+    config.sendgrid.reset_timeout.from_env('SENDGRID_RESET_TIMEOUT', as_=float, default=30)
+
+    # Receivers that are never mailed. The file backend indexes addresses and domains, one rule per line,
+    # and picks up changes to the file every BLOCKLIST_RELOAD_INTERVAL seconds.
+    config.blocklist.backend.from_env('BLOCKLIST_BACKEND', default='memory')
+    config.blocklist.pattern.from_env('SENDGRID_BLOCKLIST', None)
+    config.blocklist.path.from_env('BLOCKLIST_PATH', default='blocklist.txt')
+    config.blocklist.reload_interval.from_env('BLOCKLIST_RELOAD_INTERVAL', as_=float, default=5)
+
+    # The pool is shared by all request threads, size it for the gunicorn thread count
+    config.http.pool_size.from_env('HTTP_POOL_SIZE', as_=int, default=8)
+    config.http.idle_timeout.from_env('HTTP_IDLE_TIMEOUT', as_=float, default=60)
+    config.http.connect_timeout.from_env('HTTP_CONNECT_TIMEOUT', as_=float, default=2)
+    config.http.read_timeout.from_env('HTTP_READ_TIMEOUT', as_=float, default=2)
+
+    config.mail.client.from_env('MAIL_CLIENT', default='sync')
+
+    # MAIL_CLIENT=smtp sends through a relay instead of SendGrid, over a pool of authenticated connections that are
+    # kept open for up to SMTP_MAX_MESSAGES mails or SMTP_IDLE_TIMEOUT seconds without use
+    config.smtp.host.from_env('SMTP_HOST', default='localhost')
+    config.smtp.port.from_env('SMTP_PORT', as_=int, default=587)
+    config.smtp.username.from_env('SMTP_USERNAME', None)
+    config.smtp.password.from_env('SMTP_PASSWORD', None)
+    config.smtp.starttls.from_env('SMTP_STARTTLS', as_=lambda value: value == '1', default='1')
+    config.smtp.pool_size.from_env('SMTP_POOL_SIZE', as_=int, default=8)
+    config.smtp.max_messages.from_env('SMTP_MAX_MESSAGES', as_=int, default=100)
+    config.smtp.idle_timeout.from_env('SMTP_IDLE_TIMEOUT', as_=float, default=30)
+    config.smtp.timeout.from_env('SMTP_TIMEOUT', as_=float, default=10)
+
+    # Coalesce mails from the same sender into one SendGrid request, flushed when full or after max_delay seconds
+    config.batching.mode.from_env('MAIL_BATCHING', default='disabled')
+    config.batching.max_batch.from_env('MAIL_BATCHING_MAX_BATCH', as_=int, default=100)
+    config.batching.max_delay.from_env('MAIL_BATCHING_MAX_DELAY', as_=float, default=0.05)
+
+    # Transient send failures are retried in process, as long as the retry budget and the ack deadline allow it.
+    # The outbox has its own backoff, so only direct mode goes through these retries. The HTTP client makes a single
+    # attempt, so a send is tried at most RETRY_MAX_ATTEMPTS times.
+    config.retry.max_attempts.from_env('RETRY_MAX_ATTEMPTS', as_=int, default=3)
+    config.retry.base_delay.from_env('RETRY_BASE_DELAY', as_=float, default=0.1)
+    config.retry.max_delay.from_env('RETRY_MAX_DELAY', as_=float, default=2)
+    config.retry.budget_ratio.from_env('RETRY_BUDGET_RATIO', as_=float, default=0.2)
+    config.retry.attempt_timeout.from_value(config.http.connect_timeout() + config.http.read_timeout())
+    config.pubsub.ack_deadline.from_env('PUBSUB_ACK_DEADLINE', as_=float, default=20)
+
+    # Pushes that would be answered after headroom of the ack deadline, given the time they waited for a thread and the
+    # recent latency, are shed with a 503 before any work is done. The wait is read from the X-Request-Start header,
+    # which the proxy in front has to set, like nginx with proxy_set_header X-Request-Start "t=${msec}". Cloud Run does
+    # not set it. Without it a push is shed when ADMISSION_MAX_IN_FLIGHT others are in flight, which gunicorn.conf.py
+    # sets to one less than the threads, so a saturated worker answers the backlog right away instead of late.
+    config.admission.mode.from_env('ADMISSION_CONTROL', default='disabled')
+    config.admission.headroom.from_env('ADMISSION_HEADROOM', as_=float, default=0.8)
+    config.admission.max_in_flight.from_env('ADMISSION_MAX_IN_FLIGHT', as_=int, default=7)
+
+    # With priority dispatch at most PRIORITY_CAPACITY mails are sent at once, the last PRIORITY_RESERVED of them only
+    # for urgent alerts, and the rest wait by priority on their request thread. Past PRIORITY_MAX_QUEUED waiting normal
+    # and low mails the push is answered with 503, so they cannot take every thread. gunicorn.conf.py sizes the threads
+    # and the queue for that.
+    config.priority.mode.from_env('PRIORITY_DISPATCH', default='disabled')
+    config.priority.capacity.from_env('PRIORITY_CAPACITY', as_=int, default=6)
+    config.priority.reserved.from_env('PRIORITY_RESERVED', as_=int, default=2)
+    config.priority.max_wait.from_env('PRIORITY_MAX_WAIT', as_=float, default=2)
+    config.priority.max_queued.from_env('PRIORITY_MAX_QUEUED', as_=int, default=16)
+
+    # In outbox mode mails are queued on disk and delivered by background workers after the push is acknowledged.
+    # Point OUTBOX_PATH to a persistent volume for queued mails to survive a restart of the instance.
+    config.mail.mode.from_env('MAIL_MODE', default='direct')
+    config.outbox.path.from_env('OUTBOX_PATH', default='/tmp/notification-outbox.sqlite3')  # noqa: S108
+    config.outbox.workers.from_env('OUTBOX_WORKERS', as_=int, default=2)
+
+    # Pub/Sub redelivers messages that were not acknowledged in time, remember what was already sent. A redelivery that
+    # arrives while the first one is still being sent is answered with 409 and retried later. A send that did not finish
+    # within the ack deadline, because its process died, is given up and can be sent again. The memory and file backends
+    # are private to a process, only the sqlite one is shared by the gunicorn workers of an instance.
+    config.dedup.backend.from_env('DEDUP_BACKEND', default='memory')
+    config.dedup.max_entries.from_env('DEDUP_MAX_ENTRIES', as_=int, default=100000)
+    config.dedup.ttl.from_env('DEDUP_TTL', as_=float, default=3600)
+    config.dedup.lease.from_value(config.pubsub.ack_deadline())
+    config.dedup.path.from_env('DEDUP_PATH', default='dedup.jsonl')
+    config.dedup.sqlite_path.from_env('DEDUP_SQLITE_PATH', default='/tmp/notification-dedup.sqlite3')  # noqa: S108
+
+    # In digest mode urgent and risk notifications for the same agent are sent together, window seconds after the first
+    config.digest.mode.from_env('DIGEST_MODE', default='disabled')
+    config.digest.window.from_env('DIGEST_WINDOW', as_=float, default=60)
+    config.digest.max_entries.from_env('DIGEST_MAX_ENTRIES', as_=int, default=50)
+    config.digest.max_bytes.from_env('DIGEST_MAX_BYTES', as_=int, default=8 * 1024 * 1024)
+
+    # Changes to the same incident within window seconds are mailed once, for the newest state. 0 sends every change.
+    config.coalesce.window.from_env('COALESCE_WINDOW', as_=float, default=0)
+    config.coalesce.max_keys.from_env('COALESCE_MAX_KEYS', as_=int, default=100000)
+
+    # A receiver gets at most count mails of a template every seconds, as template=count/seconds rules like
+    # updated=5/60,default=20/60. The default rule covers templates without one, and templates with neither are not
+    # limited, which is every template unless FLOOD_LIMITS is set. Malformed rules stop the service from starting.
+    config.flood.limits.from_env('FLOOD_LIMITS', as_=lambda value: parse_limits(value, TEMPLATES), default='')
+    config.flood.max_keys.from_env('FLOOD_MAX_KEYS', as_=int, default=100000)
+
+    # Events of a bulk request are dispatched concurrently by this many threads
+    config.bulk.workers.from_env('BULK_WORKERS', as_=int, default=16)
+    # Largest element of a JSON array body, in characters, it is all held in memory to be decoded
+    config.bulk.max_element_size.from_env('BULK_MAX_ELEMENT_SIZE', as_=int, default=MAX_ELEMENT_SIZE)
+
+    # With several gunicorn workers, point METRICS_DIR to a directory shared by them so /metrics adds up all of them
+    config.metrics.path.from_env('METRICS_DIR', None)
+    config.metrics.flush_interval.from_env('METRICS_FLUSH_INTERVAL', as_=float, default=5)
+
+    # Setting PROFILING_DIR profiles a sample of the requests and dumps the stacks of slow ones there. The sample rate
+    # and the threshold, 0 to only sample, can be changed without a redeploy by writing them to control.json there.
+    config.profiling.path.from_env('PROFILING_DIR', None)
+    config.profiling.sample_rate.from_env('PROFILING_SAMPLE_RATE', as_=float, default=0.01)
+    config.profiling.slow_threshold.from_env('PROFILING_SLOW_THRESHOLD', as_=float, default=1)
+    config.profiling.interval.from_env('PROFILING_INTERVAL', as_=float, default=0.01)
+    config.profiling.max_dumps.from_env('PROFILING_MAX_DUMPS', as_=int, default=200)
+
+
+def setup_cloud(app: Flask) -> None:  # pragma: no cover
+    # Importing the Google Cloud clients takes most of the startup time, only load them when they are enabled
     if os.getenv('ENABLE_CLOUD_LOGGING') == '1':
-        setup_cloud_logging()  # pragma: no cover
+        from gcp_microservice_utils import setup_cloud_logging
 
-    app = FlaskMicroservice(__name__)
-    app.container = Container()
+        setup_cloud_logging()
+
+    if os.getenv('ENABLE_CLOUD_TRACE') == '1':
+        from gcp_microservice_utils import setup_cloud_trace
 
-    if os.getenv('ENABLE_CLOUD_TRACE') == '1':  # pragma: no cover
         setup_cloud_trace(app)
 
+
+def warm_up_session(app: FlaskMicroservice) -> None:
+    config = app.container.config
+
+    if config.mail.client() == 'sync':
+        # The TLS handshake with SendGrid would otherwise be paid by the first mail
+        session = app.container.http_session()
+        threading.Thread(target=session.warm_up, args=(config.sendgrid.base_url(),), name='warm-up', daemon=True).start()
+
+
+def warm_up(app: FlaskMicroservice) -> None:
+    # Routing and the request hooks are set up on the first request, get it out of the way before traffic arrives
+    app.test_client().get('/api/v1/health/notification')
+
+
+def start_background(app: FlaskMicroservice) -> None:
+    # Threads do not survive a fork and the gRPC clients of the cloud libraries break, so with a preloaded app none of
+    # these are started in the master, only in the workers gunicorn forks
+    if os.getenv('FAST_START') == '1':
+        # Fast start answers requests while the cloud logging and trace clients load, logs until then go to stderr
+        threading.Thread(target=setup_cloud, args=(app,), name='cloud-setup', daemon=True).start()
+        warm_up_session(app)
+    else:
+        setup_cloud(app)
+
+    # The last counts of the worker are written out, for the master to keep them once it exited
+    atexit.register(app.container.metrics_store().close)
+
+    if app.container.config.mail.mode() == 'outbox':
+        # Start the workers right away, so mails left over by a previous run are delivered without waiting for a push
+        app.container.mail_repo()
+
+    if app.container.config.digest.mode() == 'enabled':
+        # Buffered notifications were already acknowledged, send them before the worker exits
+        atexit.register(app.container.digest_repo().close)
+
+    if app.container.config.coalesce.window() > 0:
+        atexit.register(app.container.coalesce_repo().close)
+
+
+def reset_after_fork(app: FlaskMicroservice) -> None:
+    # Called in every worker gunicorn forks from a preloaded app. Pooled sockets would be shared with the other workers,
+    # so everything but the read-only templates and the profiler is built again in the worker, the counts of the master
+    # are dropped, and the background workers started.
+    REGISTRY.reset()
+
+    shared = {app.container.templates, app.container.profiler}
+    for provider in app.container.traverse(types=[providers.BaseSingleton]):
+        if provider not in shared:
+            provider.reset()
+
+    start_background(app)
+
+
+def create_app() -> FlaskMicroservice:
+    app = FlaskMicroservice(__name__)
+    app.container = Container()
+
     setup_apigateway(app)
 
-    if 'SENDGRID_APIKEY' in os.environ:  # pragma: no cover
-        app.container.config.sendgrid.token_provider.from_value(
-            type('TokenProvider', (object,), {'get_token': lambda: os.environ['SENDGRID_APIKEY']})
-        )
+    load_config(app.container.config)
 
-    app.container.config.sendgrid.blocklist.from_env('SENDGRID_BLOCKLIST', None)
+    if app.container.config.profiling.path() is not None:
+        setup_profiling(app, app.container.profiler())
+
+    # The master gunicorn forks from a preloaded app serves no requests, the workers start their own from post_fork
+    if os.getenv('PRELOAD_APP') != '1':
+        start_background(app)
+
+    # Load and validate every mail template at boot, so requests never touch the filesystem
+    app.container.templates()
 
     app.register_blueprint(BlueprintEvent)
     app.register_blueprint(BlueprintHealth)
+    app.register_blueprint(BlueprintMetrics)
+    app.register_blueprint(BlueprintOutbox)
+    app.register_blueprint(BlueprintUpstream)
+
+    if os.getenv('FAST_START') == '1':
+        warm_up(app)
 
     return app
@@ -2,5 +2,8 @@
 
 from .event import blp as BlueprintEvent
 from .health import blp as BlueprintHealth
+from .metrics import blp as BlueprintMetrics
+from .outbox import blp as BlueprintOutbox
+from .upstream import blp as BlueprintUpstream
 
-__all__ = ['BlueprintHealth', 'BlueprintEvent']
+__all__ = ['BlueprintHealth', 'BlueprintEvent', 'BlueprintMetrics', 'BlueprintOutbox', 'BlueprintUpstream']
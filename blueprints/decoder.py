@@ -0,0 +1,272 @@
+import collections.abc
+import dataclasses
+import types
+from collections.abc import Callable, Sequence
+from datetime import datetime
+from enum import Enum
+from typing import Any, Generic, TypeVar, Union, get_args, get_origin, get_type_hints, overload
+
+T = TypeVar('T')
+
+Converter = Callable[[Any], Any]
+
+_MISSING = object()
+
+# Validating every entry and decoding the few that are read again only pays off past a handful of entries
+LAZY_MIN_ENTRIES = 8
+
+
+class DecodeError(ValueError):
+    def __init__(self, message: str, path: str = '') -> None:
+        super().__init__(f'${path}: {message}')
+        self.message = message
+        self.path = path
+
+    def nested(self, prefix: str) -> 'DecodeError':
+        return DecodeError(self.message, f'{prefix}{self.path}')
+
+
+def _decode_str(value: Any) -> str:  # noqa: ANN401
+    if not isinstance(value, str):
+        raise DecodeError('Not a valid string.')
+    return value
+
+
+def _decode_int(value: Any) -> int:  # noqa: ANN401
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+
+    raise DecodeError('Not a valid integer.')
+
+
+def _decode_datetime(value: Any) -> datetime:  # noqa: ANN401
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+
+    raise DecodeError('Not a valid datetime.')
+
+
+def _check_datetime(value: Any) -> None:  # noqa: ANN401
+    # Parsing is left for when the entry is read
+    if not isinstance(value, str):
+        raise DecodeError('Not a valid datetime.')
+
+
+def _enum_decoder(enum_cls: type[Enum]) -> Converter:
+    members = {member.value: member for member in enum_cls}
+    message = f'Must be one of: {", ".join(map(str, members))}.'
+
+    def decode(value: Any) -> Enum:  # noqa: ANN401
+        try:
+            return members[value]
+        except (KeyError, TypeError):
+            raise DecodeError(message) from None
+
+    return decode
+
+
+def _list_decoder(item: Converter) -> Converter:
+    def decode(value: Any) -> list[Any]:  # noqa: ANN401
+        if not isinstance(value, list):
+            raise DecodeError('Not a valid list.')
+
+        try:
+            return [item(entry) for entry in value]
+        except DecodeError:
+            # Only pay for locating the failing entry once decoding has already failed
+            for idx, entry in enumerate(value):  # pragma: no branch
+                try:
+                    item(entry)
+                except DecodeError as entry_err:
+                    raise entry_err.nested(f'[{idx}]') from None
+            raise  # pragma: no cover
+
+    return decode
+
+
+class LazyList(Sequence[T]):
+    # Entries are decoded on first access, so reading the ends of a long list does not pay for the whole of it
+    __slots__ = ('cache', 'decode', 'values')
+
+    def __init__(self, values: list[Any], decode: Callable[[Any], T]) -> None:
+        self.values = values
+        self.decode = decode
+        self.cache: dict[int, T] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @overload
+    def __getitem__(self, index: int) -> T: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[T]: ...
+
+    def __getitem__(self, index: int | slice) -> T | list[T]:
+        if isinstance(index, slice):
+            return [self[idx] for idx in range(*index.indices(len(self.values)))]
+
+        if index < 0:
+            index += len(self.values)
+        if not 0 <= index < len(self.values):
+            raise IndexError('list index out of range')
+
+        entry = self.cache.get(index, _MISSING)
+        if entry is _MISSING:
+            try:
+                entry = self.cache[index] = self.decode(self.values[index])
+            except DecodeError as err:
+                raise err.nested(f'[{index}]') from None
+
+        return entry  # type: ignore[return-value]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(left == right for left, right in zip(self, other, strict=True))
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f'LazyList({len(self.values)} entries, {len(self.cache)} decoded)'
+
+
+def _lazy_list_decoder(item: 'Decoder[Any]') -> Converter:
+    eager = _list_decoder(item.decode)
+
+    def decode(value: Any) -> Sequence[Any]:  # noqa: ANN401
+        if not isinstance(value, list):
+            raise DecodeError('Not a valid list.')
+        if len(value) < LAZY_MIN_ENTRIES:
+            # A tuple, as marshmallow_dataclass loads Sequence fields
+            return tuple(eager(value))
+
+        # The structure and types of every entry are checked up front, the dataclasses are only built, and values like
+        # datetimes only converted, for the entries that are read
+        for idx, entry in enumerate(value):
+            try:
+                item.check(entry)
+            except DecodeError as err:
+                raise err.nested(f'[{idx}]') from None
+
+        return LazyList(value, item.decode)
+
+    return decode
+
+
+class Decoder(Generic[T]):
+    # Compiles the layout of a dataclass into converters once, so decoding a payload is a single pass over it.
+    # Field metadata follows marshmallow_dataclass, `data_key` sets the key used in the payload.
+    # With lazy, the structure and types of Sequence fields of dataclasses are checked in full, but their entries are only
+    # converted and built when read.
+    def __init__(self, cls: type[T], *, lazy: bool = False) -> None:
+        self.cls = cls
+        self.lazy = lazy
+
+        if not dataclasses.is_dataclass(cls):
+            raise TypeError(f'{cls!r} is not a dataclass')
+
+        self.fields: list[tuple[str, str, Converter, Converter, bool]] = []
+
+        hints = get_type_hints(cls)
+        for dc_field in dataclasses.fields(cls):
+            hint = hints[dc_field.name]
+            optional = False
+
+            if get_origin(hint) in (Union, types.UnionType):
+                args = [arg for arg in get_args(hint) if arg is not type(None)]
+                if len(args) != 1:
+                    raise TypeError(f'Unsupported union for field {dc_field.name}')
+                optional = True
+                hint = args[0]
+
+            key = dc_field.metadata.get('data_key', dc_field.name)
+            self.fields.append((dc_field.name, key, *self._compile(hint), optional))
+
+        self.keys = frozenset(key for _, key, _, _, _ in self.fields)
+
+    def _compile_sequence(self, hint: Any) -> tuple[Converter, Converter]:  # noqa: ANN401
+        item = get_args(hint)[0]
+        lazy = self.lazy and get_origin(hint) is collections.abc.Sequence
+        if lazy and isinstance(item, type) and dataclasses.is_dataclass(item):
+            decoder = Decoder(item, lazy=True)
+            return _lazy_list_decoder(decoder), _list_decoder(decoder.check)
+
+        converter, check = self._compile(item)
+        return _list_decoder(converter), _list_decoder(check)
+
+    def _compile(self, hint: Any) -> tuple[Converter, Converter]:  # noqa: ANN401
+        # The converter of a field, and the check of its structure and types run on the entries of lazy lists
+        if get_origin(hint) in (list, collections.abc.Sequence):
+            return self._compile_sequence(hint)
+        if hint is str:
+            return _decode_str, _decode_str
+        if hint is int:
+            return _decode_int, _decode_int
+        if hint is datetime:
+            return _decode_datetime, _check_datetime
+        if isinstance(hint, type) and issubclass(hint, Enum):
+            decode = _enum_decoder(hint)
+            return decode, decode
+        if isinstance(hint, type) and dataclasses.is_dataclass(hint):
+            decoder = Decoder(hint, lazy=self.lazy)
+            return decoder.decode, decoder.check
+
+        raise TypeError(f'Unsupported field type {hint!r}')
+
+    def _check_keys(self, value: Any) -> None:  # noqa: ANN401
+        if not isinstance(value, dict):
+            raise DecodeError('Invalid input type.')
+
+        if not self.keys.issuperset(value):
+            unknown = ', '.join(sorted(str(key) for key in value if key not in self.keys))
+            raise DecodeError(f'Unknown field: {unknown}.')
+
+    def check(self, value: Any) -> None:  # noqa: ANN401
+        # Checks the structure and types decode relies on, without converting the fields or building the dataclass
+        self._check_keys(value)
+
+        for _, key, _, check, optional in self.fields:
+            field_value = value.get(key, _MISSING)
+
+            if field_value is _MISSING or field_value is None:
+                if not optional:
+                    raise DecodeError('Missing data for required field.', f'.{key}')
+                continue
+
+            try:
+                check(field_value)
+            except DecodeError as err:
+                raise err.nested(f'.{key}') from None
+
+    def decode(self, value: Any) -> T:  # noqa: ANN401
+        self._check_keys(value)
+
+        kwargs: dict[str, Any] = {}
+        for name, key, converter, _, optional in self.fields:
+            field_value = value.get(key, _MISSING)
+
+            if field_value is _MISSING or field_value is None:
+                if not optional:
+                    raise DecodeError('Missing data for required field.', f'.{key}')
+                kwargs[name] = None
+                continue
+
+            try:
+                kwargs[name] = converter(field_value)
+            except DecodeError as err:
+                raise err.nested(f'.{key}') from None
+
+        return self.cls(**kwargs)
@@ -1,24 +1,57 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
 from dataclasses import dataclass, field
 from datetime import UTC, datetime
-from importlib import resources as impresources
-from typing import cast
+from typing import Any
 
-import marshmallow_dataclass
 from dependency_injector.wiring import Provide
 from flask import Blueprint, Response, request
 from flask.views import MethodView
 
+from admission import AdmissionController, OverloadedError, parse_request_start
 from containers import Container
+from metrics import DECODE_SECONDS, RENDER_SECONDS, SENDS
 from models import Action, Channel, Plan, Risk, Role
-from repositories import MailRepository
-
-from . import mails
+from repositories import (
+    Claim,
+    CoalesceRepository,
+    DedupRepository,
+    DigestRepository,
+    FloodRepository,
+    MailRepository,
+    TemplateRepository,
+)
+from repositories.priority import HIGH, LOW, NORMAL, mail_priority
+from repositories.rest import UpstreamUnavailableError
+from repositories.retry import ack_deadline
+
+from .decoder import Decoder
+from .stream import StreamError, iter_json_array, iter_ndjson
 from .util import class_route, json_response
 
 blp = Blueprint('Event', __name__)
 
+logger = logging.getLogger(__name__)
+
 EVENT_PROCESSED = 'Event processed.'
 
+# Urgent alerts go out first, risk changes as urgent as the risk, and AI responses can wait for the rest
+RISK_PRIORITY = {Risk.HIGH: HIGH, Risk.MEDIUM: NORMAL, Risk.LOW: LOW}
+ACTION_PRIORITY = {Action.AI_RESPONSE: LOW}
+
+# Templates of the mails of the event being handled that were over the flood limit, None outside of a bulk request
+_suppressed: ContextVar[list[str] | None] = ContextVar('suppressed', default=None)
+
+
+class DeliveryInFlightError(Exception):
+    pass
+
 
 @dataclass
 class UserBody:
@@ -32,7 +65,7 @@ class UserBody:
 class ClientBody:
     id: str
     name: str
-    email_incidents: str
+    email_incidents: str = field(metadata={'data_key': 'emailIncidents'})
     plan: Plan = field(metadata={'by_value': True})
 
 
@@ -50,44 +83,167 @@ class EventBody:
     name: str
     channel: Channel = field(metadata={'by_value': True})
     language: str
-    reported_by: UserBody
-    created_by: UserBody
-    assigned_to: UserBody
-    history: list[HistoryBody]
+    reported_by: UserBody = field(metadata={'data_key': 'reportedBy'})
+    created_by: UserBody = field(metadata={'data_key': 'createdBy'})
+    assigned_to: UserBody = field(metadata={'data_key': 'assignedTo'})
+    history: Sequence[HistoryBody]
     client: ClientBody
     risk: Risk | None = field(metadata={'by_value': True})
 
 
+# Handlers only read the first and the last few entries of the history, long ones are decoded as they are read
+event_decoder = Decoder(EventBody, lazy=True)
+
+
 class ResponseMail:
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         sender: tuple[str | None, str],
         receiver: tuple[str | None, str],
         subject: str,
         reply_to: str | None,
         language: str,
+        delivery_key: str | None = None,
+        action: Action | None = None,
+        priority: str = NORMAL,
     ) -> None:
         self.sender = sender
         self.receiver = receiver
         self.subject = subject
         self.reply_to = reply_to
         self.language = language
+        self.delivery_key = delivery_key
+        self.action = 'unknown' if action is None else action.value
+        self.priority = priority
 
-    def send(self, text: str, mail_repo: MailRepository = Provide[Container.mail_repo]) -> None:
-        mail_repo.send(
-            sender=self.sender,
-            receiver=self.receiver,
-            subject=self.subject,
-            text=text,
-            reply_to=self.reply_to,
-        )
+    def claim(self, dedup_repo: DedupRepository = Provide[Container.dedup_repo]) -> bool:
+        if self.delivery_key is None:
+            return True
+
+        claim = dedup_repo.claim(self.delivery_key)
+        if claim == Claim.IN_FLIGHT:
+            # The first attempt may still fail, so the redelivery is not acknowledged until it is known how it went
+            SENDS.labels(self.action, 'in_flight').inc()
+            raise DeliveryInFlightError(f'Delivery {self.delivery_key} is in progress, retry later.')
+
+        if claim == Claim.DONE:
+            logger.info('Skipping duplicate delivery %s', self.delivery_key)
+            SENDS.labels(self.action, 'duplicate').inc()
+            return False
+
+        return True
+
+    def complete(self, dedup_repo: DedupRepository = Provide[Container.dedup_repo]) -> None:
+        if self.delivery_key is not None:
+            dedup_repo.complete(self.delivery_key)
 
-    def send_template(self, template: str, **kwargs: object) -> None:
-        response_file = impresources.files(mails) / f'{template}.{self.language}.txt'
-        with response_file.open('r') as f:
-            response_text = f.read().format(**kwargs)
+    def release(self, dedup_repo: DedupRepository = Provide[Container.dedup_repo]) -> None:
+        # Let the redelivery of the message try again
+        if self.delivery_key is not None:
+            dedup_repo.release(self.delivery_key)
 
-        self.send(response_text)
+    def send(
+        self,
+        template: str,
+        text: str,
+        mail_repo: MailRepository = Provide[Container.mail_repo],
+        dedup_repo: DedupRepository = Provide[Container.dedup_repo],
+        flood_repo: FloodRepository = Provide[Container.flood_repo],
+    ) -> None:
+        if not self.claim(dedup_repo=dedup_repo):
+            return
+
+        # Checked after the claim, so redeliveries of a mail already sent do not use up the limit of the receiver
+        if not flood_repo.allow(template, self.receiver[1]):
+            logger.info('Suppressing %s mail %s, the receiver is over its limit', template, self.delivery_key)
+            SENDS.labels(self.action, 'suppressed').inc()
+            suppressed = _suppressed.get()
+            if suppressed is not None:
+                suppressed.append(template)
+            self.complete(dedup_repo=dedup_repo)
+            return
+
+        try:
+            with mail_priority(self.priority):
+                mail_repo.send(
+                    sender=self.sender,
+                    receiver=self.receiver,
+                    subject=self.subject,
+                    text=text,
+                    reply_to=self.reply_to,
+                )
+        except Exception:
+            SENDS.labels(self.action, 'error').inc()
+            self.release(dedup_repo=dedup_repo)
+            raise
+
+        self.complete(dedup_repo=dedup_repo)
+        SENDS.labels(self.action, 'sent').inc()
+
+    def send_template(
+        self, template: str, /, templates: TemplateRepository = Provide[Container.templates], **kwargs: object
+    ) -> None:
+        start = time.perf_counter()
+        try:
+            text = templates.render(template, self.language, **kwargs)
+        except Exception:
+            RENDER_SECONDS.labels(template, self.language, 'error').observe(time.perf_counter() - start)
+            raise
+        RENDER_SECONDS.labels(template, self.language, 'ok').observe(time.perf_counter() - start)
+
+        self.send(template, text)
+
+    def digest(
+        self,
+        template: str,
+        /,
+        templates: TemplateRepository = Provide[Container.templates],
+        digest_repo: DigestRepository = Provide[Container.digest_repo],
+        dedup_repo: DedupRepository = Provide[Container.dedup_repo],
+        **kwargs: object,
+    ) -> None:
+        if not self.claim(dedup_repo=dedup_repo):
+            return
+
+        # Only the entry is rendered here, the subject and the rest of the mail are set when the digest is sent
+        try:
+            digest_repo.add(self.sender, self.receiver, self.language, templates.render(template, self.language, **kwargs))
+        except Exception:
+            self.release(dedup_repo=dedup_repo)
+            raise
+
+        self.complete(dedup_repo=dedup_repo)
+        SENDS.labels(self.action, 'digested').inc()
+
+
+def translate(table: str, key: str, language: str, templates: TemplateRepository = Provide[Container.templates]) -> str:
+    return templates.translate(table, key, language)
+
+
+def event_key(route: str, data: EventBody) -> str:
+    # A change of the risk is published without a new history entry, so the risk tells two of them apart
+    return hashlib.sha256(f'{route}/{data.id}/{data.history[-1].seq}/{data.risk}'.encode()).hexdigest()
+
+
+def delivery_key(data: EventBody) -> str:
+    # Pub/Sub push subscriptions without wrapper send the message metadata as headers
+    message_id = request.headers.get('X-Goog-Pubsub-Message-Id')
+    if message_id is not None:
+        subscription = request.headers.get('X-Goog-Pubsub-Subscription-Name', '')
+        return f'{subscription}/{message_id}'
+
+    return event_key(request.path, data)
+
+
+def decode_event(value: object, endpoint: str) -> EventBody:
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        data = event_decoder.decode(value)
+        outcome = 'ok'
+        return data
+    finally:
+        DECODE_SECONDS.labels(endpoint, outcome).observe(time.perf_counter() - start)
 
 
 def load_event_data() -> EventBody:
@@ -95,41 +251,80 @@ def load_event_data() -> EventBody:
     if req_json is None:
         raise ValueError('Invalid JSON body')
 
-    req_json['reported_by'] = req_json.pop('reportedBy')
-    req_json['created_by'] = req_json.pop('createdBy')
-    req_json['assigned_to'] = req_json.pop('assignedTo')
-    req_json['client']['email_incidents'] = req_json['client'].pop('emailIncidents')
+    return decode_event(req_json, request.path)
 
-    event_schema = marshmallow_dataclass.class_schema(EventBody)()
-    return cast(EventBody, event_schema.load(req_json))
 
+@blp.errorhandler(UpstreamUnavailableError)
+def upstream_unavailable(err: UpstreamUnavailableError) -> Response:
+    # Pub/Sub treats 503 as a failed push and backs off before redelivering
+    resp = json_response({'message': 'Mail provider unavailable, retry later.', 'code': 503}, 503)
+    resp.headers['Retry-After'] = str(math.ceil(err.retry_after))
+    return resp
 
-@class_route(blp, '/api/v1/incident-update/notification')
-class UpdateEvent(MethodView):
+
+@blp.errorhandler(DeliveryInFlightError)
+def delivery_in_flight(err: DeliveryInFlightError) -> Response:
+    # Any answer but a 2xx has Pub/Sub deliver the message again later, by then the first attempt sent it or gave up
+    return json_response({'message': str(err), 'code': 409}, 409)
+
+
+@blp.errorhandler(OverloadedError)
+def overloaded(err: OverloadedError) -> Response:
+    resp = json_response({'message': str(err), 'code': err.status}, err.status)
+    resp.headers['Retry-After'] = str(math.ceil(err.retry_after))
+    return resp
+
+
+class EventView(MethodView):
     init_every_request = False
 
     response = json_response({'message': EVENT_PROCESSED, 'code': 200}, 200)
 
+    def notify(self, data: EventBody, key: str | None) -> None:
+        raise NotImplementedError  # pragma: no cover
+
+    def handle(self, deadline: float) -> None:
+        # Retries of the send give up in time for Pub/Sub to get an answer before it redelivers the message
+        with ack_deadline(deadline):
+            data = load_event_data()
+            self.notify(data, delivery_key(data))
+
+    def post(
+        self,
+        deadline: float = Provide[Container.config.pubsub.ack_deadline],
+        admission_mode: str = Provide[Container.config.admission.mode],
+        admission: AdmissionController = Provide[Container.admission],
+    ) -> Response:
+        if admission_mode != 'enabled':
+            self.handle(deadline)
+            return self.response
+
+        # Time spent waiting for a thread counts against the ack deadline too
+        queued = parse_request_start(request.headers.get('X-Request-Start'), time.time())
+        with admission.admit(deadline, queued):
+            self.handle(deadline - (queued or 0))
+
+        return self.response
+
+
+@class_route(blp, '/api/v1/incident-update/notification')
+class UpdateEvent(EventView):
     def mail_created(self, data: EventBody, mail: ResponseMail) -> None:
         if data.channel == Channel.EMAIL:
             return
 
         mail.send_template('created', client_name=data.client.name)
 
-    def mail_updated(self, data: EventBody, mail: ResponseMail) -> None:
-        state_translated = {
-            Action.CREATED: {'es': 'creado', 'pt': 'criado'},
-            Action.ESCALATED: {'es': 'escalado', 'pt': 'escalado'},
-            Action.CLOSED: {'es': 'cerrado', 'pt': 'fechado'},
-        }
-
-        new_state = state_translated[data.history[-1].action][data.language]
+    def mail_updated(self, data: EventBody, mail: ResponseMail, since_seq: int) -> None:
+        new_state = translate('state', data.history[-1].action, data.language)
 
-        old_action = data.history[-2].action
-        if old_action == Action.AI_RESPONSE:
-            old_action = data.history[-3].action
+        # The reporter last heard of the state before the first change mailed now, AI responses do not change it
+        old_action = next(
+            (entry.action for entry in reversed(data.history) if entry.seq < since_seq and entry.action != Action.AI_RESPONSE),
+            Action.CREATED,
+        )
 
-        old_state = state_translated[old_action][data.language]
+        old_state = translate('state', old_action, data.language)
 
         mail.send_template(
             'updated',
@@ -146,94 +341,197 @@ class UpdateEvent(MethodView):
             comment=data.history[-1].description,
         )
 
-    def post(self) -> Response:
-        data = load_event_data()
-
+    def send(self, data: EventBody, key: str | None, since_seq: int) -> None:
         mail = ResponseMail(
             sender=(data.client.name, data.client.email_incidents),
             receiver=(data.reported_by.name, data.reported_by.email),
             subject=f'Re: {data.name}',
             reply_to=None,
             language=data.language,
+            delivery_key=key,
+            action=data.history[-1].action,
+            priority=ACTION_PRIORITY.get(data.history[-1].action, NORMAL),
         )
 
         if data.history[-1].action == Action.CREATED:
             self.mail_created(data, mail)
         elif data.history[-1].action == Action.ESCALATED:
-            self.mail_updated(data, mail)
+            self.mail_updated(data, mail, since_seq)
         elif data.history[-1].action == Action.CLOSED:
             self.basic_mail('closed', data, mail)
         elif data.history[-1].action == Action.AI_RESPONSE:
             self.basic_mail('iaresponse', data, mail)
 
-        return self.response
-
-
-@class_route(blp, '/api/v1/incident-alert/notification')
-class UpdateRiskEvent(MethodView):
-    init_every_request = False
+    def notify(
+        self,
+        data: EventBody,
+        key: str | None,
+        coalesce_window: float = Provide[Container.config.coalesce.window],
+        coalesce_repo: CoalesceRepository = Provide[Container.coalesce_repo],
+    ) -> None:
+        seq = data.history[-1].seq
+        if coalesce_window <= 0:
+            self.send(data, key, seq)
+            return
 
-    response = json_response({'message': EVENT_PROCESSED, 'code': 200}, 200)
+        # Only the newest change of a burst is mailed, older or replayed ones are dropped here
+        if not coalesce_repo.submit(data.id, seq, lambda since_seq: self.send(data, key, since_seq)):
+            logger.info('Skipping stale update %d of incident %s', seq, data.id)
+            SENDS.labels(data.history[-1].action.value, 'stale').inc()
 
-    def post(self) -> Response:
-        data = load_event_data()
 
+@class_route(blp, '/api/v1/incident-alert/notification')
+class UpdateRiskEvent(EventView):
+    def notify(self, data: EventBody, key: str | None, digest_mode: str = Provide[Container.config.digest.mode]) -> None:
         mail = ResponseMail(
             sender=(data.client.name, data.client.email_incidents),
             receiver=(data.assigned_to.name, data.assigned_to.email),
             subject=f'Incidente urgente: {data.name}',
             reply_to=None,
             language=data.language,
+            delivery_key=key,
+            action=data.history[-1].action,
+            priority=HIGH,
         )
 
         time_elapsed = (datetime.now(UTC) - data.history[0].date.replace(tzinfo=UTC)).total_seconds() // 3600
         base_url = data.client.email_incidents.split('@')[1]
+        url = f'https://{base_url}/incidents/{data.id}'
+
+        if digest_mode == 'enabled':
+            mail.digest(
+                'digest_urgent', incident_name=data.name, description=data.history[0].description, time=time_elapsed, url=url
+            )
+            return
 
         mail.send_template(
             'urgent',
             client_name=data.client.name,
             description=data.history[0].description,
             time=time_elapsed,
-            url=f'https://{base_url}/incidents/{data.id}',
+            url=url,
         )
 
-        return self.response
-
 
 @class_route(blp, '/api/v1/incident-risk-updated/notification')
-class AlertEvent(MethodView):
-    init_every_request = False
-
-    response = json_response({'message': EVENT_PROCESSED, 'code': 200}, 200)
-
-    def post(self) -> Response:
-        data = load_event_data()
-
-        subject_text = {'es': 'Riesgo actualizado', 'pt': 'Risco atualizado'}
-
-        risk_translated = {
-            Risk.HIGH: {'es': 'Alto', 'pt': 'Alto'},
-            Risk.MEDIUM: {'es': 'Medio', 'pt': 'Médio'},
-            Risk.LOW: {'es': 'Bajo', 'pt': 'Baixo'},
-        }
+class AlertEvent(EventView):
+    def notify(self, data: EventBody, key: str | None, digest_mode: str = Provide[Container.config.digest.mode]) -> None:
+        subject_text = translate('subject_risk_updated', 'default', data.language)
 
         mail = ResponseMail(
             sender=(data.client.name, data.client.email_incidents),
             receiver=(data.assigned_to.name, data.assigned_to.email),
-            subject=f'{subject_text[data.language]}: {data.name}',
+            subject=f'{subject_text}: {data.name}',
             reply_to=None,
             language=data.language,
+            delivery_key=key,
+            action=data.history[-1].action,
+            priority=NORMAL if data.risk is None else RISK_PRIORITY[data.risk],
         )
 
         base_url = data.client.email_incidents.split('@')[1]
+        url = f'https://{base_url}/incidents/{data.id}'
 
-        if data.risk is not None:
-            mail.send_template(
-                'updaterisk',
-                incident_name=data.name,
-                client_name=data.client.name,
-                url=f'https://{base_url}/incidents/{data.id}',
-                risk_level=risk_translated[data.risk][data.language],
-            )
+        if data.risk is None:
+            return
 
-        return self.response
+        risk_level = translate('risk', data.risk, data.language)
+
+        if digest_mode == 'enabled':
+            mail.digest('digest_updaterisk', incident_name=data.name, risk_level=risk_level, url=url)
+            return
+
+        mail.send_template(
+            'updaterisk',
+            incident_name=data.name,
+            client_name=data.client.name,
+            url=url,
+            risk_level=risk_level,
+        )
+
+
+class BulkEventView(MethodView):
+    init_every_request = False
+
+    handler: type[EventView]
+
+    def notify(self, handler: EventView, route: str, value: object) -> None:
+        data = decode_event(value, route)
+        handler.notify(data, event_key(route, data))
+
+    def post(
+        self,
+        workers: int = Provide[Container.config.bulk.workers],
+        max_element_size: int = Provide[Container.config.bulk.max_element_size],
+    ) -> Response:
+        events: Iterator[Any]
+        if request.mimetype == 'application/x-ndjson':
+            events = iter_ndjson(request.stream)
+        elif request.mimetype == 'application/json':
+            events = iter_json_array(request.stream, max_element_size=max_element_size)
+        else:
+            return json_response({'message': 'Expected a JSON array or NDJSON body.', 'code': 415}, 415)
+
+        # Events are keyed by their content, so replaying the same events again sends nothing twice. Pub/Sub pushes are
+        # keyed by their message id instead, a replay is not deduplicated against the pushes the service already got.
+        route = request.path.removesuffix('/bulk')
+        handler = self.handler()
+        results: list[dict[str, Any]] = []
+
+        # Stop reading the body while every worker is busy, so only a bounded number of events is held in memory
+        slots = threading.BoundedSemaphore(2 * workers)
+
+        def run(index: int, value: object) -> None:
+            suppressed: list[str] = []
+            token = _suppressed.set(suppressed)
+            try:
+                self.notify(handler, route, value)
+                if suppressed:
+                    results[index]['suppressed'] = len(suppressed)
+            except Exception as err:
+                logger.exception('Failed to process event %d of bulk request', index)
+                results[index] = {'index': index, 'status': 'error', 'message': str(err)}
+            finally:
+                _suppressed.reset(token)
+                slots.release()
+
+        message, status = EVENT_PROCESSED, 200
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bulk') as executor:
+            try:
+                for index, value in enumerate(events):
+                    slots.acquire()
+                    results.append({'index': index, 'status': 'ok'})
+                    executor.submit(run, index, value)
+            except StreamError as err:
+                # Like an invalid single event the body is rejected, the events read before the error were processed
+                results.append({'index': len(results), 'status': 'error', 'message': str(err)})
+                message, status = 'Invalid body, only the events before the error were processed.', 400
+
+        failed = sum(1 for result in results if result['status'] == 'error')
+        suppressed = sum(result.get('suppressed', 0) for result in results)
+        return json_response(
+            {
+                'message': message,
+                'code': status,
+                'processed': len(results),
+                'failed': failed,
+                'suppressed': suppressed,
+                'results': results,
+            },
+            status,
+        )
+
+
+@class_route(blp, '/api/v1/incident-update/notification/bulk')
+class BulkUpdateEvent(BulkEventView):
+    handler = UpdateEvent
+
+
+@class_route(blp, '/api/v1/incident-alert/notification/bulk')
+class BulkUpdateRiskEvent(BulkEventView):
+    handler = UpdateRiskEvent
+
+
+@class_route(blp, '/api/v1/incident-risk-updated/notification/bulk')
+class BulkAlertEvent(BulkEventView):
+    handler = AlertEvent
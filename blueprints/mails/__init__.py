@@ -0,0 +1,34 @@
+from models import Action, Risk
+
+LANGUAGES = ('es', 'pt')
+
+TEMPLATES = {
+    'closed': frozenset({'client_name', 'comment'}),
+    'created': frozenset({'client_name'}),
+    'digest': frozenset({'client_name', 'count', 'entries'}),
+    'digest_updaterisk': frozenset({'incident_name', 'risk_level', 'url'}),
+    'digest_urgent': frozenset({'description', 'incident_name', 'time', 'url'}),
+    'iaresponse': frozenset({'client_name', 'comment'}),
+    'updated': frozenset({'client_name', 'comment', 'old_state', 'new_state'}),
+    'updaterisk': frozenset({'client_name', 'incident_name', 'risk_level', 'url'}),
+    'urgent': frozenset({'client_name', 'description', 'time', 'url'}),
+}
+
+TRANSLATIONS: dict[str, dict[str, dict[str, str]]] = {
+    'state': {
+        Action.CREATED: {'es': 'creado', 'pt': 'criado'},
+        Action.ESCALATED: {'es': 'escalado', 'pt': 'escalado'},
+        Action.CLOSED: {'es': 'cerrado', 'pt': 'fechado'},
+    },
+    'risk': {
+        Risk.HIGH: {'es': 'Alto', 'pt': 'Alto'},
+        Risk.MEDIUM: {'es': 'Medio', 'pt': 'Médio'},
+        Risk.LOW: {'es': 'Bajo', 'pt': 'Baixo'},
+    },
+    'subject_risk_updated': {
+        'default': {'es': 'Riesgo actualizado', 'pt': 'Risco atualizado'},
+    },
+    'subject_digest': {
+        'default': {'es': 'Resumen de incidentes', 'pt': 'Resumo de incidentes'},
+    },
+}
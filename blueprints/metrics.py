@@ -0,0 +1,18 @@
+from dependency_injector.wiring import Provide
+from flask import Blueprint, Response
+from flask.views import MethodView
+
+from containers import Container
+from metrics import CONTENT_TYPE, MetricsStore, generate
+
+from .util import class_route
+
+blp = Blueprint('Metrics', __name__)
+
+
+@class_route(blp, '/metrics')
+class Metrics(MethodView):
+    init_every_request = False
+
+    def get(self, store: MetricsStore = Provide[Container.metrics_store]) -> Response:
+        return Response(generate(store.registry, store.collect()), 200, content_type=CONTENT_TYPE)
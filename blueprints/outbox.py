@@ -0,0 +1,24 @@
+from dataclasses import asdict
+
+from dependency_injector.wiring import Provide
+from flask import Blueprint, Response
+from flask.views import MethodView
+
+from containers import Container
+from repositories import MailRepository
+from repositories.sqlite import SQLiteOutboxMailRepository
+
+from .util import class_route, json_response
+
+blp = Blueprint('Outbox', __name__)
+
+
+@class_route(blp, '/api/v1/outbox/notification')
+class OutboxStatus(MethodView):
+    init_every_request = False
+
+    def get(self, mail_repo: MailRepository = Provide[Container.mail_repo]) -> Response:
+        if not isinstance(mail_repo, SQLiteOutboxMailRepository):
+            return json_response({'message': 'Outbox mode is not enabled.', 'code': 404}, 404)
+
+        return json_response(asdict(mail_repo.stats()), 200)
@@ -0,0 +1,131 @@
+import codecs
+import json
+from collections.abc import Iterator
+from typing import IO, Any
+
+CHUNK_SIZE = 64 * 1024
+MAX_ELEMENT_SIZE = 64 * 1024 * 1024
+
+_decoder = json.JSONDecoder()
+
+
+class StreamError(ValueError):
+    pass
+
+
+def iter_ndjson(stream: IO[bytes]) -> Iterator[Any]:
+    for line in stream:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as err:
+                raise StreamError(f'Invalid JSON line: {err}') from None
+
+
+def _skip_whitespace(buffer: str, pos: int) -> int:
+    while pos < len(buffer) and buffer[pos] in ' \t\n\r':
+        pos += 1
+    return pos
+
+
+class _ArrayReader:
+    # Elements are decoded from an offset into the buffer, which only drops what was read once an element is decoded.
+    # An element cut off by the end of the buffer is decoded again from its start, so that is only tried once twice as
+    # much of it is buffered, and a large element costs a few decodes instead of one for every chunk.
+    def __init__(self, stream: IO[bytes], chunk_size: int, max_element_size: int) -> None:
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_element_size = max_element_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size: int) -> None:
+        # Reads until size characters are buffered past pos, or the stream ends
+        if self.eof:
+            raise StreamError('Unexpected end of JSON array')
+        if len(self.buffer) - self.pos > self.max_element_size:
+            raise StreamError('JSON array element is too large')
+
+        if self.pos == len(self.buffer):
+            self.buffer, self.pos = '', 0
+
+        parts = []
+        buffered = len(self.buffer) - self.pos
+        while buffered < size and not self.eof:
+            chunk = self.stream.read(self.chunk_size)
+            self.eof = not chunk
+            text = self.decoder.decode(chunk, final=self.eof)
+            parts.append(text)
+            buffered += len(text)
+
+        self.buffer += ''.join(parts)
+
+    def compact(self) -> None:
+        # Copies less than was read since the last time, so the buffer is copied a bounded number of times
+        if self.pos > len(self.buffer) - self.pos:
+            self.buffer, self.pos = self.buffer[self.pos :], 0
+
+    def next_char(self) -> str:
+        while True:
+            self.pos = _skip_whitespace(self.buffer, self.pos)
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            self.fill(1)
+
+    def end(self) -> None:
+        # Like json.loads, nothing but whitespace may follow the array
+        while True:
+            self.pos = _skip_whitespace(self.buffer, self.pos)
+            if self.pos < len(self.buffer):
+                raise StreamError('Unexpected data after JSON array')
+            if self.eof:
+                return
+            self.fill(1)
+
+    def next_value(self) -> Any:  # noqa: ANN401
+        while True:
+            self.next_char()
+
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as err:
+                if self.eof:
+                    raise StreamError(f'Invalid JSON array element: {err}') from None
+            else:
+                # A value is only complete once the separator that follows it was read, a number could go on otherwise
+                follow = _skip_whitespace(self.buffer, end)
+                if self.eof or (follow < len(self.buffer) and self.buffer[follow] in ',]'):
+                    self.pos = end
+                    self.compact()
+                    return value
+
+            self.fill(min(2 * (len(self.buffer) - self.pos), self.max_element_size + 1))
+
+
+def iter_json_array(
+    stream: IO[bytes], chunk_size: int = CHUNK_SIZE, max_element_size: int = MAX_ELEMENT_SIZE
+) -> Iterator[Any]:
+    # Yields the elements of a top level JSON array while reading it, the body is never held in memory at once
+    reader = _ArrayReader(stream, chunk_size, max_element_size)
+
+    if reader.next_char() != '[':
+        raise StreamError('Expected a JSON array')
+    reader.pos += 1
+
+    if reader.next_char() == ']':
+        reader.pos += 1
+        reader.end()
+        return
+
+    while True:
+        yield reader.next_value()
+
+        separator = reader.next_char()
+        reader.pos += 1
+        if separator == ']':
+            reader.end()
+            return
+        if separator != ',':
+            raise StreamError(f'Unexpected character {separator!r} in JSON array')
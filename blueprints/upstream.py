@@ -0,0 +1,28 @@
+from dataclasses import asdict
+
+from dependency_injector.wiring import Provide
+from flask import Blueprint, Response
+from flask.views import MethodView
+
+from containers import Container
+from repositories.rest import CircuitBreaker, RateLimiter
+from repositories.retry import RetryingMailRepository
+
+from .util import class_route, json_response
+
+blp = Blueprint('Upstream', __name__)
+
+
+@class_route(blp, '/api/v1/upstream/notification')
+class UpstreamStatus(MethodView):
+    init_every_request = False
+
+    def get(
+        self,
+        limiter: RateLimiter = Provide[Container.sendgrid_limiter],
+        breaker: CircuitBreaker = Provide[Container.sendgrid_breaker],
+        retry: RetryingMailRepository = Provide[Container.retrying_mail_repo],
+    ) -> Response:
+        return json_response(
+            {'limiter': asdict(limiter.stats()), 'breaker': asdict(breaker.stats()), 'retry': asdict(retry.stats())}, 200
+        )
@@ -1,8 +1,10 @@
+import base64
+import contextlib
 import json
 from collections.abc import Callable
 from typing import Any
 
-from flask import Blueprint, Request, Response
+from flask import Blueprint, Flask, Request, Response, request
 from flask.views import MethodView
 
 
@@ -10,6 +12,23 @@ class APIGatewayRequest(Request):
     user_token: dict[str, Any]
 
 
+def _api_gateway_before_request() -> None:
+    # API Gateway forwards the claims of the verified JWT as unpadded base64url JSON
+    userinfo = request.headers.get('X-Apigateway-Api-Userinfo')
+    user_token = None
+
+    if userinfo:
+        with contextlib.suppress(ValueError):
+            user_token = json.loads(base64.urlsafe_b64decode(userinfo + '=' * (-len(userinfo) % 4)))
+
+    request.user_token = user_token  # type: ignore[attr-defined]
+
+
+def setup_apigateway(app: Flask) -> None:
+    # Same hook as gcp_microservice_utils, which would import the Google Cloud clients just to register it
+    app.before_request(_api_gateway_before_request)
+
+
 def class_route(blueprint: Blueprint, rule: str, **options: Any) -> Callable[[type[MethodView]], type[MethodView]]:  # noqa: ANN401
     def decorator(cls: type[MethodView]) -> type[MethodView]:
         blueprint.add_url_rule(rule, view_func=cls.as_view(cls.__name__), **options)
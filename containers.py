@@ -1,15 +1,237 @@
 from dependency_injector import providers
 from dependency_injector.containers import DeclarativeContainer, WiringConfiguration
 
-from repositories.rest import SendgridMailRepository
+from admission import AdmissionController
+from metrics import MetricsStore
+from profiling import RequestProfiler
+from repositories.file import FileBlocklistRepository, FileDedupRepository
+from repositories.memory import (
+    MemoryBlocklistRepository,
+    MemoryCoalesceRepository,
+    MemoryDedupRepository,
+    MemoryDigestRepository,
+    MemoryFloodRepository,
+)
+from repositories.priority import PriorityMailRepository
+from repositories.resource import ResourceTemplateRepository
+from repositories.rest import (
+    CachedTokenProvider,
+    CircuitBreaker,
+    PooledSession,
+    RateLimiter,
+    SendgridBatchingMailRepository,
+    SendgridMailRepository,
+    TokenProvider,
+)
+from repositories.retry import RetryingMailRepository
+from repositories.smtp import SMTPConnectionPool, SMTPMailRepository
+from repositories.sqlite import SQLiteDedupRepository, SQLiteOutboxMailRepository
+
+
+def cached_token_provider(provider: TokenProvider | None) -> CachedTokenProvider | None:
+    # Requests go out without a token when none is configured
+    return None if provider is None else CachedTokenProvider(provider)
 
 
 class Container(DeclarativeContainer):
-    wiring_config = WiringConfiguration(packages=['blueprints'])
+    # Only the modules that use Provide are wired, scanning the whole package slows down startup
+    wiring_config = WiringConfiguration(
+        modules=['blueprints.event', 'blueprints.metrics', 'blueprints.outbox', 'blueprints.upstream'],
+    )
     config = providers.Configuration()
 
-    mail_repo = providers.ThreadSafeSingleton(
+    templates = providers.ThreadSafeSingleton(
+        ResourceTemplateRepository,
+        package='blueprints.mails',
+    )
+
+    dedup_repo = providers.Selector(
+        config.dedup.backend,
+        memory=providers.ThreadSafeSingleton(
+            MemoryDedupRepository,
+            max_entries=config.dedup.max_entries,
+            ttl=config.dedup.ttl,
+            lease=config.dedup.lease,
+        ),
+        file=providers.ThreadSafeSingleton(
+            FileDedupRepository,
+            path=config.dedup.path,
+            ttl=config.dedup.ttl,
+            lease=config.dedup.lease,
+        ),
+        sqlite=providers.ThreadSafeSingleton(
+            SQLiteDedupRepository,
+            path=config.dedup.sqlite_path,
+            ttl=config.dedup.ttl,
+            lease=config.dedup.lease,
+        ),
+    )
+
+    blocklist = providers.Selector(
+        config.blocklist.backend,
+        memory=providers.ThreadSafeSingleton(
+            MemoryBlocklistRepository,
+            pattern=config.blocklist.pattern,
+        ),
+        file=providers.ThreadSafeSingleton(
+            FileBlocklistRepository,
+            path=config.blocklist.path,
+            pattern=config.blocklist.pattern,
+            reload_interval=config.blocklist.reload_interval,
+        ),
+    )
+
+    sendgrid_limiter = providers.ThreadSafeSingleton(
+        RateLimiter,
+        max_rate=config.sendgrid.max_rate,
+        burst=config.sendgrid.burst,
+        max_wait=config.sendgrid.max_wait,
+    )
+
+    sendgrid_breaker = providers.ThreadSafeSingleton(
+        CircuitBreaker,
+        failure_threshold=config.sendgrid.failure_threshold,
+        reset_timeout=config.sendgrid.reset_timeout,
+    )
+
+    http_session = providers.ThreadSafeSingleton(
+        PooledSession,
+        pool_size=config.http.pool_size,
+        idle_timeout=config.http.idle_timeout,
+        limiter=sendgrid_limiter,
+        breaker=sendgrid_breaker,
+    )
+
+    # Tokens are fetched once and refreshed in the background before they expire, instead of on every request
+    token_provider = providers.ThreadSafeSingleton(
+        cached_token_provider,
+        provider=config.sendgrid.token_provider,
+    )
+
+    sendgrid_mail_repo = providers.ThreadSafeSingleton(
         SendgridMailRepository,
-        token_provider=config.sendgrid.token_provider,
-        blocklist=config.sendgrid.blocklist,
+        token_provider=token_provider,
+        blocklist=blocklist,
+        session=http_session,
+        connect_timeout=config.http.connect_timeout,
+        read_timeout=config.http.read_timeout,
+        base_url=config.sendgrid.base_url,
+    )
+
+    batching_mail_repo = providers.ThreadSafeSingleton(
+        SendgridBatchingMailRepository,
+        repo=sendgrid_mail_repo,
+        max_batch=config.batching.max_batch,
+        max_delay=config.batching.max_delay,
+    )
+
+    sync_mail_repo = providers.Selector(
+        config.batching.mode,
+        disabled=sendgrid_mail_repo,
+        enabled=batching_mail_repo,
+    )
+
+    smtp_pool = providers.ThreadSafeSingleton(
+        SMTPConnectionPool,
+        host=config.smtp.host,
+        port=config.smtp.port,
+        username=config.smtp.username,
+        password=config.smtp.password,
+        starttls=config.smtp.starttls,
+        size=config.smtp.pool_size,
+        max_messages=config.smtp.max_messages,
+        idle_timeout=config.smtp.idle_timeout,
+        timeout=config.smtp.timeout,
+    )
+
+    smtp_mail_repo = providers.ThreadSafeSingleton(
+        SMTPMailRepository,
+        pool=smtp_pool,
+        blocklist=blocklist,
+    )
+
+    delivery_mail_repo = providers.Selector(
+        config.mail.client,
+        sync=sync_mail_repo,
+        smtp=smtp_mail_repo,
+    )
+
+    outbox_mail_repo = providers.ThreadSafeSingleton(
+        SQLiteOutboxMailRepository,
+        delivery=delivery_mail_repo,
+        path=config.outbox.path,
+        workers=config.outbox.workers,
+    )
+
+    coalesce_repo = providers.ThreadSafeSingleton(
+        MemoryCoalesceRepository,
+        window=config.coalesce.window,
+        max_keys=config.coalesce.max_keys,
+    )
+
+    flood_repo = providers.ThreadSafeSingleton(
+        MemoryFloodRepository,
+        limits=config.flood.limits,
+        max_keys=config.flood.max_keys,
+    )
+
+    retrying_mail_repo = providers.ThreadSafeSingleton(
+        RetryingMailRepository,
+        delivery=delivery_mail_repo,
+        max_attempts=config.retry.max_attempts,
+        base_delay=config.retry.base_delay,
+        max_delay=config.retry.max_delay,
+        attempt_timeout=config.retry.attempt_timeout,
+        budget_ratio=config.retry.budget_ratio,
+    )
+
+    priority_mail_repo = providers.ThreadSafeSingleton(
+        PriorityMailRepository,
+        delivery=retrying_mail_repo,
+        capacity=config.priority.capacity,
+        reserved=config.priority.reserved,
+        max_wait=config.priority.max_wait,
+        max_queued=config.priority.max_queued,
+    )
+
+    direct_mail_repo = providers.Selector(
+        config.priority.mode,
+        disabled=retrying_mail_repo,
+        enabled=priority_mail_repo,
+    )
+
+    mail_repo = providers.Selector(
+        config.mail.mode,
+        direct=direct_mail_repo,
+        outbox=outbox_mail_repo,
+    )
+
+    digest_repo = providers.ThreadSafeSingleton(
+        MemoryDigestRepository,
+        mail_repo=mail_repo,
+        templates=templates,
+        window=config.digest.window,
+        max_entries=config.digest.max_entries,
+        max_bytes=config.digest.max_bytes,
+    )
+
+    admission = providers.ThreadSafeSingleton(
+        AdmissionController,
+        headroom=config.admission.headroom,
+        max_in_flight=config.admission.max_in_flight,
+    )
+
+    metrics_store = providers.ThreadSafeSingleton(
+        MetricsStore,
+        path=config.metrics.path,
+        interval=config.metrics.flush_interval,
+    )
+
+    profiler = providers.ThreadSafeSingleton(
+        RequestProfiler,
+        path=config.profiling.path,
+        sample_rate=config.profiling.sample_rate,
+        slow_threshold=config.profiling.slow_threshold,
+        interval=config.profiling.interval,
+        max_dumps=config.profiling.max_dumps,
     )
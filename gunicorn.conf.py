@@ -0,0 +1,84 @@
+import os
+from pathlib import Path
+from typing import Any
+
+# Decoding and rendering hold the GIL, so one worker only ever uses one core. By default a worker is started for every
+# core available to the container, each with THREADS threads for the time spent waiting on SendGrid. WEB_CONCURRENCY
+# and GUNICORN_THREADS set them explicitly.
+#
+# With more than one worker the app is loaded once in the master and forked, so the templates and the compiled
+# decoders are shared copy-on-write. Every worker builds its own connection pool, rate limiter and background threads
+# after the fork, see app.reset_after_fork, and none are started in the master. The rate limit is split between the
+# workers, the metrics of all of them are added up through METRICS_DIR, which the master clears on start and where it
+# keeps the counts of the workers that exited, and the dedup state is kept in a SQLite table they share, so a
+# redelivery that lands on another worker is still recognized. Digest and coalescing state is per worker.
+
+THREADS = 8
+
+
+def available_cores() -> int:
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+
+    # Containers limited by a CPU quota still see every core of the host
+    try:
+        quota, period = Path('/sys/fs/cgroup/cpu.max').read_text().split()
+        if quota != 'max':
+            cores = min(cores, max(int(quota) // int(period), 1))
+    except (OSError, ValueError):
+        pass
+
+    return cores
+
+
+bind = f'0.0.0.0:{os.getenv("PORT", "8080")}'
+workers = int(os.getenv('WEB_CONCURRENCY', str(available_cores())))
+
+# With priority dispatch mails wait for a send slot on their request thread. A worker gets four threads for every slot,
+# and at most the threads not needed by the slots wait as normal and low mails, so urgent alerts always find a thread.
+priority_dispatch = os.getenv('PRIORITY_DISPATCH') == 'enabled'
+priority_capacity = int(os.getenv('PRIORITY_CAPACITY', '6'))
+priority_reserved = int(os.getenv('PRIORITY_RESERVED', '2'))
+default_threads = max(THREADS, 4 * priority_capacity) if priority_dispatch else THREADS
+
+threads = int(os.getenv('GUNICORN_THREADS', str(default_threads)))
+wsgi_app = 'app:create_app()'
+
+# Every thread of a worker may be sending at once
+os.environ.setdefault('HTTP_POOL_SIZE', str(threads))
+# Without X-Request-Start, admission control sheds the pushes that arrive while all but the last thread are busy
+os.environ.setdefault('ADMISSION_MAX_IN_FLIGHT', str(max(threads - 1, 1)))
+
+if priority_dispatch:
+    os.environ.setdefault('PRIORITY_MAX_QUEUED', str(max(threads - priority_capacity - priority_reserved, 1)))
+
+if workers > 1:
+    preload_app = True
+    os.environ['PRELOAD_APP'] = '1'
+
+    os.environ.setdefault('METRICS_DIR', '/tmp/notification-metrics')  # noqa: S108
+    os.environ.setdefault('DEDUP_BACKEND', 'sqlite')
+    os.environ.setdefault('SENDGRID_MAX_RATE', str(500 / workers))
+    os.environ.setdefault('SENDGRID_BURST', str(500 / workers))
+
+metrics_dir = os.getenv('METRICS_DIR')
+
+
+def on_starting(server: Any) -> None:  # noqa: ANN401, ARG001
+    if metrics_dir is not None:
+        from metrics import clear_snapshots
+
+        clear_snapshots(metrics_dir)
+
+
+def post_fork(server: Any, worker: Any) -> None:  # noqa: ANN401
+    if server.cfg.preload_app:
+        from app import reset_after_fork
+
+        reset_after_fork(worker.app.wsgi())
+
+
+def child_exit(server: Any, worker: Any) -> None:  # noqa: ANN401, ARG001
+    if metrics_dir is not None:
+        from metrics import retire_snapshot
+
+        retire_snapshot(metrics_dir, worker.pid)
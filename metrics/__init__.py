@@ -0,0 +1,36 @@
+from .exposition import CONTENT_TYPE, generate
+from .pipeline import (
+    ADMISSIONS,
+    BLOCKLIST_SECONDS,
+    BREAKER_TRANSITIONS,
+    DECODE_SECONDS,
+    QUEUE_SECONDS,
+    RENDER_SECONDS,
+    RETRIES,
+    SENDS,
+    UPSTREAM_SECONDS,
+)
+from .registry import LATENCY_BUCKETS, REGISTRY, Counter, Histogram, Registry
+from .store import MetricsStore, clear_snapshots, retire_snapshot
+
+__all__ = [
+    'ADMISSIONS',
+    'BLOCKLIST_SECONDS',
+    'BREAKER_TRANSITIONS',
+    'CONTENT_TYPE',
+    'DECODE_SECONDS',
+    'LATENCY_BUCKETS',
+    'QUEUE_SECONDS',
+    'REGISTRY',
+    'RENDER_SECONDS',
+    'RETRIES',
+    'SENDS',
+    'UPSTREAM_SECONDS',
+    'Counter',
+    'Histogram',
+    'MetricsStore',
+    'Registry',
+    'clear_snapshots',
+    'generate',
+    'retire_snapshot',
+]
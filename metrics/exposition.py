@@ -0,0 +1,49 @@
+import math
+
+from .registry import Histogram, Registry, Samples
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], *extra: tuple[str, str]) -> str:
+    pairs = [*zip(names, values, strict=True), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def generate(registry: Registry, samples: dict[str, Samples]) -> str:
+    lines = []
+
+    for name, metric in registry.metrics.items():
+        lines.append(f'# TYPE {name} {metric.type}')
+        lines.append(f'# HELP {name} {_escape(metric.documentation)}')
+
+        for values, value in sorted(samples.get(name, {}).items()):
+            if isinstance(metric, Histogram):
+                cumulative = 0.0
+                for bound, count in zip([*metric.bounds, math.inf], value[:-1], strict=True):
+                    cumulative += count
+                    labels = _labels(metric.labelnames, values, ('le', _number(bound)))
+                    lines.append(f'{name}_bucket{labels} {_number(cumulative)}')
+
+                labels = _labels(metric.labelnames, values)
+                lines.append(f'{name}_count{labels} {_number(cumulative)}')
+                lines.append(f'{name}_sum{labels} {_number(value[-1])}')
+            else:
+                lines.append(f'{name}_total{_labels(metric.labelnames, values)} {_number(value)}')
+
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,15 @@
+from .registry import Counter, Histogram
+
+DECODE_SECONDS = Histogram('notification_decode_seconds', 'Time spent decoding an event.', ('endpoint', 'outcome'))
+RENDER_SECONDS = Histogram(
+    'notification_render_seconds', 'Time spent rendering a mail template.', ('template', 'language', 'outcome')
+)
+BLOCKLIST_SECONDS = Histogram('notification_blocklist_seconds', 'Time spent checking the blocklist.', ('outcome',))
+UPSTREAM_SECONDS = Histogram('notification_upstream_seconds', 'Time spent calling the mail provider.', ('outcome',))
+QUEUE_SECONDS = Histogram(
+    'notification_queue_seconds', 'Time a mail waited for a send slot, by priority class.', ('priority', 'outcome')
+)
+SENDS = Counter('notification_sends', 'Mails handed to the mail repository.', ('action', 'outcome'))
+BREAKER_TRANSITIONS = Counter('notification_breaker_transitions', 'State changes of the circuit breaker.', ('from', 'to'))
+RETRIES = Counter('notification_retries', 'Outcomes of sends that were retried.', ('outcome',))
+ADMISSIONS = Counter('notification_admissions', 'Pushes admitted or shed by the admission control.', ('outcome',))
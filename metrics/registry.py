@@ -0,0 +1,192 @@
+import math
+import threading
+import weakref
+from bisect import bisect_left
+from collections.abc import Sequence
+from typing import Any, Generic, TypeVar
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Samples of a metric keyed by their label values, a count for counters, bucket counts followed by the sum for histograms
+Samples = dict[tuple[str, ...], Any]
+
+Child = TypeVar('Child', bound='CounterChild | HistogramChild')
+
+
+class _Owner:
+    # Held by the thread a shard belongs to, and dropped with the rest of its thread-local state when the thread ends
+    __slots__ = ('__weakref__',)
+
+
+class ShardedChild:
+    # Every thread adds to its own shard, so updates need no lock and are never lost. The shard of a thread is folded
+    # into the total once the thread ends, so threads of short lived pools do not pile up.
+    __slots__ = ('local', 'lock', 'shards', 'size', 'total')
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.shards: dict[int, list[float]] = {}
+        self.total = [0.0] * size
+
+    def _shard(self) -> list[float]:
+        owner = self.local.owner = _Owner()
+        shard = self.local.shard = [0.0] * self.size
+        with self.lock:
+            self.shards[id(owner)] = shard
+
+        # Runs before the owner is freed, so its id is not reused by then
+        weakref.finalize(owner, self._fold, id(owner))
+        return shard
+
+    def _fold(self, key: int) -> None:
+        with self.lock:
+            # Gone already when the child was reset since
+            shard = self.shards.pop(key, None)
+            if shard is not None:
+                for idx, count in enumerate(shard):
+                    self.total[idx] += count
+
+    def _sum(self) -> list[float]:
+        with self.lock:
+            total = list(self.total)
+            for shard in self.shards.values():
+                for idx, count in enumerate(shard):
+                    total[idx] += count
+        return total
+
+    def reset(self) -> None:
+        # Runs in a worker right after gunicorn forks it, while no other thread runs. A thread of the master may have
+        # held the lock at the fork, so a new one is made instead of taking it.
+        local = self.local
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.shards = {}
+        self.total = [0.0] * self.size
+
+        # Dropping the shards of this thread folds them, which takes the new lock
+        del local
+
+
+class CounterChild(ShardedChild):
+    __slots__ = ()
+
+    def __init__(self) -> None:
+        super().__init__(1)
+
+    def inc(self, amount: float = 1) -> None:
+        try:
+            shard = self.local.shard
+        except AttributeError:
+            shard = self._shard()
+
+        shard[0] += amount
+
+    def value(self) -> float:
+        return self._sum()[0]
+
+
+class HistogramChild(ShardedChild):
+    __slots__ = ('bounds',)
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        # Buckets are not cumulative here, the last one counts values above every bound, followed by the sum
+        super().__init__(len(bounds) + 2)
+        self.bounds = bounds
+
+    def observe(self, value: float) -> None:
+        try:
+            shard = self.local.shard
+        except AttributeError:
+            shard = self._shard()
+
+        shard[bisect_left(self.bounds, value)] += 1
+        shard[-1] += value
+
+    def value(self) -> list[float]:
+        return self._sum()
+
+
+class Metric(Generic[Child]):
+    type = ''
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: 'Registry | None' = None
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.children: dict[tuple[str, ...], Child] = {}
+
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _child(self) -> Child:
+        raise NotImplementedError  # pragma: no cover
+
+    def _create(self, values: tuple[str, ...]) -> Child:
+        if len(values) != len(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {", ".join(self.labelnames)}')
+
+        with self.lock:
+            return self.children.setdefault(values, self._child())
+
+    def labels(self, *values: str) -> Child:
+        child = self.children.get(values)
+        if child is None:
+            child = self._create(values)
+        return child
+
+    def collect(self) -> Samples:
+        return {values: child.value() for values, child in list(self.children.items())}
+
+    def reset(self) -> None:
+        self.lock = threading.Lock()
+        for child in list(self.children.values()):
+            child.reset()
+
+
+class Counter(Metric[CounterChild]):
+    type = 'counter'
+
+    def _child(self) -> CounterChild:
+        return CounterChild()
+
+
+class Histogram(Metric[HistogramChild]):
+    type = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        registry: 'Registry | None' = None,
+    ) -> None:
+        self.bounds = tuple(bound for bound in buckets if not math.isinf(bound))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _child(self) -> HistogramChild:
+        return HistogramChild(self.bounds)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric[Any]] = {}
+
+    def register(self, metric: 'Metric[Any]') -> None:
+        if metric.name in self.metrics:
+            raise ValueError(f'Duplicated metric {metric.name}')
+        self.metrics[metric.name] = metric
+
+    def collect(self) -> dict[str, Samples]:
+        return {name: metric.collect() for name, metric in self.metrics.items()}
+
+    def reset(self) -> None:
+        for metric in self.metrics.values():
+            metric.reset()
+
+
+REGISTRY = Registry()
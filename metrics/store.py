@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+from .registry import REGISTRY, Registry, Samples
+
+# Snapshot of the final counts of the workers that exited, kept up to date by the gunicorn master
+EXITED = 'exited.json'
+
+
+def merge(total: Samples, samples: Samples) -> None:
+    for values, value in samples.items():
+        current = total.get(values)
+        if current is None:
+            total[values] = value
+        elif isinstance(value, list):
+            if len(current) == len(value):
+                total[values] = [left + right for left, right in zip(current, value, strict=True)]
+        else:
+            total[values] = current + value
+
+
+def _encode(samples: dict[str, Samples]) -> dict[str, Any]:
+    return {name: [[list(values), value] for values, value in entries.items()] for name, entries in samples.items()}
+
+
+def _decode(snapshot: dict[str, Any]) -> dict[str, Samples]:
+    return {name: {tuple(values): value for values, value in entries} for name, entries in snapshot.items()}
+
+
+def _load(file: Path) -> dict[str, Any]:
+    try:
+        return json.loads(file.read_text())  # type: ignore[no-any-return]
+    except (OSError, ValueError):
+        # The file of another worker may be gone or half written on some filesystems, skip it for this scrape
+        return {}
+
+
+def _write(target: Path, snapshot: dict[str, Any]) -> None:
+    tmp = target.with_suffix('.tmp')
+    tmp.write_text(json.dumps(snapshot))
+    tmp.replace(target)
+
+
+def clear_snapshots(path: str) -> None:
+    # Called by the gunicorn master before it starts the workers, the snapshots of a previous run are not counted again
+    directory = Path(path)
+    for file in [*directory.glob('*.json'), *directory.glob('*.tmp')]:
+        file.unlink(missing_ok=True)
+
+
+def retire_snapshot(path: str, pid: int) -> None:
+    # Called by the gunicorn master when a worker exits. Its last snapshot is added to the totals of the workers that
+    # exited before, so its counts stay in the sums without a file being kept for every worker ever started.
+    file = Path(path) / f'{pid}.json'
+    if not file.exists():
+        return
+
+    exited = Path(path) / EXITED
+    totals = _decode(_load(exited))
+    for name, samples in _decode(_load(file)).items():
+        merge(totals.setdefault(name, {}), samples)
+
+    _write(exited, _encode(totals))
+    file.unlink(missing_ok=True)
+
+
+class MetricsStore:
+    # Each gunicorn worker keeps its own registry. With a path, every worker writes a snapshot of it there every
+    # interval seconds, and a scrape answered by any of them adds up the latest snapshot of all the others. The files
+    # of workers that exited are folded into a single one by the master, so their counts are not lost when gunicorn
+    # replaces them, see gunicorn.conf.py.
+    def __init__(self, path: str | None = None, interval: float = 5, registry: Registry = REGISTRY) -> None:
+        self.path = None if path is None else Path(path)
+        self.interval = interval
+        self.registry = registry
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.pid = os.getpid()
+        self.stopping = threading.Event()
+        self.thread: threading.Thread | None = None
+
+        if self.path is not None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self.thread = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+            self.thread.start()
+
+    def _run(self) -> None:
+        while not self.stopping.wait(self.interval):
+            try:
+                self.flush()
+            except OSError:
+                self.logger.exception('Failed to write metrics snapshot')
+
+    def flush(self) -> None:
+        if self.path is None:
+            return
+
+        _write(self.path / f'{self.pid}.json', _encode(self.registry.collect()))
+
+    def collect(self) -> dict[str, Samples]:
+        samples = self.registry.collect()
+        if self.path is None:
+            return samples
+
+        for file in self.path.glob('*.json'):
+            if file.stem == str(self.pid):
+                continue
+
+            for name, entries in _decode(_load(file)).items():
+                if name in samples:
+                    merge(samples[name], entries)
+
+        return samples
+
+    def close(self) -> None:
+        # Also registered to run at exit, a store closed before is left alone
+        if self.stopping.is_set():
+            return
+
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
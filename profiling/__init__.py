@@ -0,0 +1,4 @@
+from .hooks import setup_profiling
+from .profiler import STAGES, ProfilerSettings, RequestProfiler
+
+__all__ = ['STAGES', 'ProfilerSettings', 'RequestProfiler', 'setup_profiling']
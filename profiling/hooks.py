@@ -0,0 +1,19 @@
+from flask import Flask, Response, g, request
+
+from .profiler import RequestProfiler
+
+
+def setup_profiling(app: Flask, profiler: RequestProfiler) -> None:
+    @app.before_request
+    def begin_profile() -> None:
+        g.profile = profiler.begin()
+
+    @app.after_request
+    def end_profile(resp: Response) -> Response:
+        profiler.end(g.pop('profile', None), f'{request.method} {request.path}', resp.status_code)
+        return resp
+
+    @app.teardown_request
+    def abort_profile(_: BaseException | None) -> None:
+        # Requests that failed before a response was made still have to stop their profile
+        profiler.end(g.pop('profile', None), f'{request.method} {request.path}', 500)
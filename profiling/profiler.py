@@ -0,0 +1,222 @@
+import cProfile
+import itertools
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from types import FrameType
+
+# Functions whose time is reported as a stage of the pipeline, matched by name in profiles and sampled stacks
+STAGES = {
+    'decode': 'decode_event',
+    'render': 'render',
+    'blocklist': 'check_blocklist',
+    'upstream': 'authenticated_post',
+}
+
+CONTROL_FILE = 'control.json'
+
+# Held while a request is profiled with cProfile. From Python 3.12 it hooks sys.monitoring, which is process-wide, so
+# only one profiler can be enabled at a time and it records the calls of every thread, not just the profiled request.
+_cprofile_lock = threading.Lock()
+
+
+@dataclass
+class ProfilerSettings:
+    sample_rate: float
+    slow_threshold: float | None
+
+
+@dataclass
+class RequestProfile:
+    ident: int
+    start: float
+    profile: cProfile.Profile | None
+    samples: Counter[str]
+
+
+def collapse(frame: FrameType | None) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f'{code.co_qualname} ({Path(code.co_filename).name}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+class RequestProfiler:
+    # Profiles sample_rate of the requests with cProfile, one at a time, and samples the stacks of every request in flight
+    # every interval seconds, to dump those that end up slower than slow_threshold. Both can be changed at runtime by
+    # writing them to control.json in the dump directory, which every worker checks every reload_interval seconds.
+    def __init__(  # noqa: PLR0913
+        self,
+        path: str,
+        sample_rate: float = 0.01,
+        slow_threshold: float | None = 1,
+        interval: float = 0.01,
+        max_dumps: int = 200,
+        reload_interval: float = 5,
+    ) -> None:
+        self.path = Path(path)
+        self.defaults = ProfilerSettings(sample_rate, slow_threshold)
+        self.interval = interval
+        self.max_dumps = max_dumps
+        self.reload_interval = reload_interval
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.lock = threading.Lock()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.control = self.path / CONTROL_FILE
+        self.control_version: tuple[int, int] | None = None
+        self.settings = self.defaults
+        self.next_check = 0.0
+
+        self.active: dict[int, RequestProfile] = {}
+        self.thread: threading.Thread | None = None
+        self.thread_pid = 0
+        self.sequence = itertools.count()
+
+    def _reload(self) -> None:
+        try:
+            stat = self.control.stat()
+        except FileNotFoundError:
+            version = None
+        else:
+            version = (stat.st_mtime_ns, stat.st_size)
+
+        if version == self.control_version:
+            return
+
+        try:
+            overrides = json.loads(self.control.read_text()) if version is not None else {}
+            settings = ProfilerSettings(**(asdict(self.defaults) | overrides))
+        except (OSError, TypeError, ValueError):
+            # Keep profiling with the current settings until the file is fixed
+            self.logger.exception('Failed to load profiler settings %s', self.control)
+            return
+
+        self.control_version, self.settings = version, settings
+        self.logger.info('Profiler settings: %s', settings)
+
+    def _check(self) -> ProfilerSettings:
+        now = time.monotonic()
+
+        # Only one thread checks the file, the others go on with the current settings
+        if now >= self.next_check and self.lock.acquire(blocking=False):
+            try:
+                self.next_check = now + self.reload_interval
+                self._reload()
+            finally:
+                self.lock.release()
+
+        return self.settings
+
+    def _ensure_sampler(self) -> None:
+        # Started on first use, so every worker forked by gunicorn runs its own
+        if self.thread is not None and self.thread_pid == os.getpid():
+            return
+
+        with self.lock:
+            if self.thread is None or self.thread_pid != os.getpid():
+                self.thread_pid = os.getpid()
+                self.thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+                self.thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            if not self.active:
+                continue
+
+            frames = sys._current_frames()  # noqa: SLF001
+            for request in list(self.active.values()):
+                frame = frames.get(request.ident)
+                if frame is not None:
+                    request.samples[collapse(frame)] += 1
+
+    def begin(self) -> RequestProfile | None:
+        settings = self._check()
+        sampled = settings.sample_rate > 0 and random.random() < settings.sample_rate  # noqa: S311
+        tracked = settings.slow_threshold is not None and settings.slow_threshold > 0
+        if not sampled and not tracked:
+            return None
+
+        # A request sampled while another one is profiled is left out, the sampled stacks still cover it when slow
+        profile = None
+        if sampled and _cprofile_lock.acquire(blocking=False):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler is already attached, one that was not started here
+                _cprofile_lock.release()
+                profile = None
+
+        request = RequestProfile(threading.get_ident(), time.perf_counter(), profile, Counter())
+        if tracked:
+            self._ensure_sampler()
+            self.active[request.ident] = request
+
+        return request
+
+    def end(self, request: RequestProfile | None, label: str, status: int) -> None:
+        if request is None:
+            return
+
+        duration = time.perf_counter() - request.start
+        self.active.pop(request.ident, None)
+        if request.profile is not None:
+            request.profile.disable()
+            _cprofile_lock.release()
+
+        threshold = self.settings.slow_threshold
+        slow = threshold is not None and 0 < threshold <= duration and bool(request.samples)
+        if request.profile is None and not slow:
+            return
+
+        try:
+            self._dump(request, label, status, duration, slow=slow)
+        except OSError:
+            self.logger.exception('Failed to write profile of %s', label)
+
+    def _dump(self, request: RequestProfile, label: str, status: int, duration: float, *, slow: bool) -> None:
+        name = re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_')
+        stem = self.path / f'{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}-{next(self.sequence)}-{name}'
+
+        summary = {'label': label, 'status': status, 'duration': duration, 'stages': {}}
+
+        if request.profile is not None:
+            stats = pstats.Stats(request.profile)
+            stats.dump_stats(f'{stem}.pstats')
+            summary['stages'] = {
+                stage: sum(entry[3] for key, entry in stats.stats.items() if key[2] == func)  # type: ignore[attr-defined]
+                for stage, func in STAGES.items()
+            }
+
+        if slow:
+            # The sampler may still be adding to the counts of this request
+            samples = dict(request.samples)
+            lines = [f'{stack} {count}' for stack, count in samples.items()]
+            Path(f'{stem}.collapsed').write_text('\n'.join(lines) + '\n')
+            if request.profile is None:
+                summary['stages'] = {
+                    stage: self.interval * sum(count for stack, count in samples.items() if f'{func} (' in stack)
+                    for stage, func in STAGES.items()
+                }
+
+        Path(f'{stem}.json').write_text(json.dumps(summary))
+        self._rotate()
+
+    def _rotate(self) -> None:
+        dumps = sorted(self.path.glob('*-*.json'), key=lambda file: file.stat().st_mtime_ns)
+        for summary in dumps[: max(len(dumps) - self.max_dumps, 0)]:
+            for file in self.path.glob(f'{summary.stem}.*'):
+                file.unlink(missing_ok=True)
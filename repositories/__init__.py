@@ -1,3 +1,18 @@
+from .blocklist import BlocklistRepository
+from .coalesce import CoalesceRepository
+from .dedup import Claim, DedupRepository
+from .digest import DigestRepository
+from .flood import FloodRepository
 from .mail import MailRepository
+from .template import TemplateRepository
 
-__all__ = ['MailRepository']
+__all__ = [
+    'BlocklistRepository',
+    'Claim',
+    'CoalesceRepository',
+    'DedupRepository',
+    'DigestRepository',
+    'FloodRepository',
+    'MailRepository',
+    'TemplateRepository',
+]
@@ -0,0 +1,3 @@
+class BlocklistRepository:
+    def is_blocked(self, email: str) -> bool:
+        raise NotImplementedError  # pragma: no cover
@@ -0,0 +1,6 @@
+from collections.abc import Callable
+
+
+class CoalesceRepository:
+    def submit(self, key: str, seq: int, call: Callable[[int], None]) -> bool:
+        raise NotImplementedError  # pragma: no cover
@@ -0,0 +1,20 @@
+from enum import StrEnum
+
+
+class Claim(StrEnum):
+    CLAIMED = 'claimed'
+    IN_FLIGHT = 'in_flight'
+    DONE = 'done'
+
+
+class DedupRepository:
+    # A key is claimed before its mail is sent and completed once it was, a claim that is neither completed nor released
+    # is given up after a lease, so a redelivery can send it if the process sending it died
+    def claim(self, key: str) -> Claim:
+        raise NotImplementedError  # pragma: no cover
+
+    def complete(self, key: str) -> None:
+        raise NotImplementedError  # pragma: no cover
+
+    def release(self, key: str) -> None:
+        raise NotImplementedError  # pragma: no cover
@@ -0,0 +1,3 @@
+class DigestRepository:
+    def add(self, sender: tuple[str | None, str], receiver: tuple[str | None, str], language: str, entry: str) -> None:
+        raise NotImplementedError  # pragma: no cover
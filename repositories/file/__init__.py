@@ -0,0 +1,4 @@
+from .blocklist import FileBlocklistRepository
+from .dedup import FileDedupRepository
+
+__all__ = ['FileBlocklistRepository', 'FileDedupRepository']
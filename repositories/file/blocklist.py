@@ -0,0 +1,59 @@
+import logging
+import re
+import threading
+import time
+from pathlib import Path
+
+from repositories import BlocklistRepository
+from repositories.memory import MemoryBlocklistRepository
+
+
+class FileBlocklistRepository(BlocklistRepository):
+    # Loads the rules of MemoryBlocklistRepository from a file, one per line, and reloads them when the file changes
+    def __init__(self, path: str, pattern: str | None = None, reload_interval: float = 5) -> None:
+        self.path = Path(path)
+        self.pattern = pattern
+        self.reload_interval = reload_interval
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.lock = threading.Lock()
+        self.next_check = time.monotonic() + reload_interval
+
+        self.version = self._version()
+        self.index = self._load()
+
+    def _version(self) -> tuple[int, int]:
+        stat = self.path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> MemoryBlocklistRepository:
+        with self.path.open(encoding='utf-8') as f:
+            return MemoryBlocklistRepository(f, self.pattern)
+
+    def reload(self) -> None:
+        try:
+            version = self._version()
+            if version == self.version:
+                return
+
+            index = self._load()
+        except (OSError, re.error):
+            # Keep blocking with the previous rules until the file is fixed
+            self.logger.exception('Failed to reload blocklist %s', self.path)
+            return
+
+        # Lookups in flight keep using the previous index, the swap is a single assignment
+        self.version, self.index = version, index
+        self.logger.info('Reloaded blocklist %s', self.path)
+
+    def is_blocked(self, email: str) -> bool:
+        now = time.monotonic()
+
+        # Only one thread checks the file, the others go on with the current index
+        if now >= self.next_check and self.lock.acquire(blocking=False):
+            try:
+                self.next_check = now + self.reload_interval
+                self.reload()
+            finally:
+                self.lock.release()
+
+        return self.index.is_blocked(email)
@@ -0,0 +1,79 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+from repositories import Claim, DedupRepository
+
+
+class FileDedupRepository(DedupRepository):
+    # Claims are appended to the file as they change and read back on start, so they survive a restart of the process.
+    # The file is rewritten with only the live claims once it holds compact_lines lines more than there are of them.
+    # The file is only read on start, it cannot be shared by processes running at the same time.
+    def __init__(self, path: str, ttl: float = 3600, lease: float = 20, compact_lines: int = 10000) -> None:
+        self.path = Path(path)
+        self.ttl = ttl
+        self.lease = lease
+        self.compact_lines = compact_lines
+        self.lock = threading.Lock()
+        # Key to when it expires and whether its mail was sent
+        self.entries: dict[str, tuple[float, bool]] = {}
+        self.lines = 0
+
+        if self.path.exists():
+            with self.path.open(encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if entry['expires'] is None:
+                        self.entries.pop(entry['key'], None)
+                    else:
+                        self.entries[entry['key']] = (entry['expires'], entry.get('done', True))
+
+        self._compact()
+
+    def _compact(self) -> None:
+        now = time.time()
+        self.entries = {key: entry for key, entry in self.entries.items() if entry[0] > now}
+
+        tmp_path = self.path.with_suffix('.tmp')
+        with tmp_path.open('w', encoding='utf-8') as f:
+            for key, (expires, done) in self.entries.items():
+                f.write(json.dumps({'key': key, 'expires': expires, 'done': done}) + '\n')
+        tmp_path.replace(self.path)
+
+        self.lines = len(self.entries)
+
+    def _append(self, key: str, expires: float | None, *, done: bool = False) -> None:
+        if self.lines >= len(self.entries) + self.compact_lines:
+            self._compact()
+            return
+
+        with self.path.open('a', encoding='utf-8') as f:
+            f.write(json.dumps({'key': key, 'expires': expires, 'done': done}) + '\n')
+        self.lines += 1
+
+    def claim(self, key: str) -> Claim:
+        now = time.time()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                return Claim.DONE if entry[1] else Claim.IN_FLIGHT
+
+            self.entries[key] = (now + self.lease, False)
+            self._append(key, now + self.lease)
+
+        return Claim.CLAIMED
+
+    def complete(self, key: str) -> None:
+        expires = time.time() + self.ttl
+
+        with self.lock:
+            if key in self.entries:
+                self.entries[key] = (expires, True)
+                self._append(key, expires, done=True)
+
+    def release(self, key: str) -> None:
+        with self.lock:
+            if self.entries.pop(key, None) is not None:
+                self._append(key, None)
@@ -0,0 +1,3 @@
+class FloodRepository:
+    def allow(self, template: str, receiver: str) -> bool:
+        raise NotImplementedError  # pragma: no cover
@@ -0,0 +1,17 @@
+from .blocklist import MemoryBlocklistRepository
+from .coalesce import CoalesceStats, MemoryCoalesceRepository
+from .dedup import MemoryDedupRepository
+from .digest import DigestStats, MemoryDigestRepository
+from .flood import FloodStats, MemoryFloodRepository, parse_limits
+
+__all__ = [
+    'CoalesceStats',
+    'DigestStats',
+    'FloodStats',
+    'MemoryBlocklistRepository',
+    'MemoryCoalesceRepository',
+    'MemoryDedupRepository',
+    'MemoryDigestRepository',
+    'MemoryFloodRepository',
+    'parse_limits',
+]
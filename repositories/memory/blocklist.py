@@ -0,0 +1,61 @@
+import re
+from collections.abc import Iterable
+
+from repositories import BlocklistRepository
+
+Trie = dict[str, 'Trie']
+
+# Marks the end of a domain rule, labels are never empty so it cannot clash with one
+_END = ''
+
+
+class MemoryBlocklistRepository(BlocklistRepository):
+    # Rules, one per entry:
+    #   user@example.org  blocks that exact address
+    #   example.org       blocks every address of example.org and of any of its subdomains
+    #   re:<pattern>      blocks addresses matching the regex, checked only when the indexed rules do not match
+    # Blank entries and entries starting with # are ignored.
+    def __init__(self, rules: Iterable[str] = (), pattern: str | None = None) -> None:
+        self.addresses: set[str] = set()
+        self.domains: Trie = {}
+        self.patterns: list[re.Pattern[str]] = []
+
+        if pattern is not None:
+            self.patterns.append(re.compile(pattern))
+
+        for raw_rule in rules:
+            rule = raw_rule.strip()
+            if not rule or rule.startswith('#'):
+                continue
+
+            if rule.startswith('re:'):
+                self.patterns.append(re.compile(rule.removeprefix('re:')))
+            elif '@' in rule.lstrip('@'):
+                self.addresses.add(rule.lower())
+            else:
+                self._add_domain(rule.lstrip('@').lower())
+
+    def _add_domain(self, domain: str) -> None:
+        node = self.domains
+        for label in reversed(domain.strip('.').split('.')):
+            node = node.setdefault(label, {})
+        node[_END] = {}
+
+    def _domain_blocked(self, domain: str) -> bool:
+        node = self.domains
+        for label in reversed(domain.split('.')):
+            child = node.get(label)
+            if child is None:
+                return False
+            if _END in child:
+                return True
+            node = child
+
+        return False
+
+    def is_blocked(self, email: str) -> bool:
+        address = email.lower()
+        if address in self.addresses or self._domain_blocked(address.rpartition('@')[2]):
+            return True
+
+        return any(pattern.match(email) is not None for pattern in self.patterns)
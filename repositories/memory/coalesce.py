@@ -0,0 +1,91 @@
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from repositories import CoalesceRepository
+from repositories.window import WindowedFlusher
+
+
+@dataclass
+class PendingCall:
+    deadline: float
+    first_seq: int
+    seq: int
+    call: Callable[[int], None]
+
+
+@dataclass
+class CoalesceStats:
+    pending: int
+    flushed: int
+    coalesced: int
+    dropped: int
+
+
+class MemoryCoalesceRepository(CoalesceRepository, WindowedFlusher[str, PendingCall]):
+    # Holds a call for window seconds, replacing it when a newer one, by seq, is submitted for the same key. When the
+    # window ends only the newest call runs, with the lowest seq it replaced. Calls older than the newest pending or
+    # already run one are dropped, the last seq run is remembered for up to max_keys keys.
+    def __init__(self, window: float = 2, max_keys: int = 100000, flush_workers: int = 2) -> None:
+        self.window = window
+        self.max_keys = max_keys
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.done: OrderedDict[str, int] = OrderedDict()
+        self.flushed = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+        WindowedFlusher.__init__(self, 'coalesce', flush_workers)
+
+    def submit(self, key: str, seq: int, call: Callable[[int], None]) -> bool:
+        with self.cond:
+            done = self.done.get(key)
+            pending = self.pending.get(key)
+
+            if (done is not None and seq <= done) or (pending is not None and seq <= pending.seq):
+                self.dropped += 1
+                return False
+
+            if pending is None:
+                self.pending[key] = PendingCall(time.monotonic() + self.window, seq, seq, call)
+                self.cond.notify()
+            else:
+                pending.seq, pending.call = seq, call
+                self.coalesced += 1
+
+            ready = [self._pop(key)] if self.stopping else []
+
+        for pending_call in ready:
+            self._flush(key, pending_call)
+
+        return True
+
+    def _pop(self, key: str) -> PendingCall:
+        pending = self.pending.pop(key)
+
+        self.done[key] = pending.seq
+        self.done.move_to_end(key)
+        if len(self.done) > self.max_keys:
+            self.done.popitem(last=False)
+
+        self.flushed += 1
+        return pending
+
+    def _flush(self, key: str, pending: PendingCall) -> None:
+        try:
+            pending.call(pending.first_seq)
+        except Exception:
+            # The calls were already acknowledged, nothing will make them again
+            self.logger.exception('Failed to run coalesced call for %s', key)
+
+    def stats(self) -> CoalesceStats:
+        with self.cond:
+            return CoalesceStats(
+                pending=len(self.pending),
+                flushed=self.flushed,
+                coalesced=self.coalesced,
+                dropped=self.dropped,
+            )
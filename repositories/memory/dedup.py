@@ -0,0 +1,42 @@
+import threading
+import time
+from collections import OrderedDict
+
+from repositories import Claim, DedupRepository
+
+
+class MemoryDedupRepository(DedupRepository):
+    def __init__(self, max_entries: int = 100000, ttl: float = 3600, lease: float = 20) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lease = lease
+        self.lock = threading.Lock()
+        # Key to when it expires and whether its mail was sent
+        self.entries: OrderedDict[str, tuple[float, bool]] = OrderedDict()
+
+    def claim(self, key: str) -> Claim:
+        now = time.monotonic()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                return Claim.DONE if entry[1] else Claim.IN_FLIGHT
+
+            self.entries[key] = (now + self.lease, False)
+            self.entries.move_to_end(key)
+
+            # Least recently used keys go first, expired ones are dropped as they reach the front
+            while self.entries and (len(self.entries) > self.max_entries or next(iter(self.entries.values()))[0] <= now):
+                self.entries.popitem(last=False)
+
+        return Claim.CLAIMED
+
+    def complete(self, key: str) -> None:
+        with self.lock:
+            if key in self.entries:
+                self.entries[key] = (time.monotonic() + self.ttl, True)
+
+    def release(self, key: str) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
@@ -0,0 +1,118 @@
+import logging
+import time
+from dataclasses import dataclass, field
+
+from repositories import DigestRepository, MailRepository, TemplateRepository
+from repositories.window import WindowedFlusher
+
+Address = tuple[str | None, str]
+DigestKey = tuple[Address, Address, str]
+
+
+@dataclass
+class DigestBuffer:
+    deadline: float
+    entries: list[str] = field(default_factory=list)
+    size: int = 0
+
+
+@dataclass
+class DigestStats:
+    pending: int
+    buffered_bytes: int
+    digests: int
+    entries: int
+    failed: int
+
+
+class MemoryDigestRepository(DigestRepository, WindowedFlusher[DigestKey, DigestBuffer]):
+    # Entries for the same sender, receiver and language are buffered for window seconds and sent as one digest mail.
+    # A digest is sent early when it reaches max_entries, or when the buffered text would go over max_bytes, in which
+    # case the oldest digests go first. Whatever is buffered is sent on close.
+    def __init__(  # noqa: PLR0913
+        self,
+        mail_repo: MailRepository,
+        templates: TemplateRepository,
+        window: float = 60,
+        max_entries: int = 50,
+        max_bytes: int = 8 * 1024 * 1024,
+        flush_workers: int = 2,
+    ) -> None:
+        self.mail_repo = mail_repo
+        self.templates = templates
+        self.window = window
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.buffered_bytes = 0
+        self.digests = 0
+        self.entries = 0
+        self.failed = 0
+
+        # Pending is insertion ordered, so the first buffer is always the oldest one
+        WindowedFlusher.__init__(self, 'digest', flush_workers)
+
+    def _pop(self, key: DigestKey) -> DigestBuffer:
+        buffer = self.pending.pop(key)
+        self.buffered_bytes -= buffer.size
+        return buffer
+
+    def add(self, sender: Address, receiver: Address, language: str, entry: str) -> None:
+        key = (sender, receiver, language)
+        size = len(entry.encode())
+        ready = []
+
+        with self.cond:
+            if self.stopping:
+                ready.append((key, DigestBuffer(time.monotonic(), [entry], size)))
+            else:
+                buffer = self.pending.get(key)
+                if buffer is None:
+                    buffer = self.pending[key] = DigestBuffer(time.monotonic() + self.window)
+                    self.cond.notify()
+
+                buffer.entries.append(entry)
+                buffer.size += size
+                self.buffered_bytes += size
+
+                if len(buffer.entries) >= self.max_entries:
+                    ready.append((key, self._pop(key)))
+
+                while self.buffered_bytes > self.max_bytes:
+                    oldest = next(iter(self.pending))
+                    ready.append((oldest, self._pop(oldest)))
+
+        for digest in ready:
+            self._submit(*digest)
+
+    def _flush(self, key: DigestKey, buffer: DigestBuffer) -> None:
+        sender, receiver, language = key
+        entries = buffer.entries
+        subject = self.templates.translate('subject_digest', 'default', language)
+        text = self.templates.render(
+            'digest', language, client_name=sender[0] or sender[1], count=len(entries), entries='\n\n'.join(entries)
+        )
+
+        try:
+            self.mail_repo.send(sender, receiver, f'{subject} ({len(entries)})', text, None)
+        except Exception:
+            # The events were already acknowledged, nothing will deliver them again
+            self.logger.exception('Failed to send digest of %d notifications to %s', len(entries), receiver[1])
+            with self.cond:
+                self.failed += 1
+            return
+
+        with self.cond:
+            self.digests += 1
+            self.entries += len(entries)
+
+    def stats(self) -> DigestStats:
+        with self.cond:
+            return DigestStats(
+                pending=len(self.pending),
+                buffered_bytes=self.buffered_bytes,
+                digests=self.digests,
+                entries=self.entries,
+                failed=self.failed,
+            )
@@ -0,0 +1,97 @@
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from collections.abc import Collection
+from dataclasses import dataclass
+
+from repositories import FloodRepository
+
+# Limit of the templates without one of their own
+DEFAULT_TEMPLATE = 'default'
+
+
+def parse_limits(value: str, templates: Collection[str]) -> dict[str, tuple[float, float]]:
+    # Comma separated template=count/seconds rules, like updated=5/60,default=20/60. Rules are checked here, once at
+    # startup, since a malformed one would otherwise fail every send of its template.
+    limits = {}
+    for rule in value.split(','):
+        if not rule.strip():
+            continue
+
+        template, _, limit = rule.partition('=')
+        count, _, period = limit.partition('/')
+        template = template.strip()
+        if template != DEFAULT_TEMPLATE and template not in templates:
+            raise ValueError(f'Flood limit {rule.strip()!r} is for an unknown template')
+
+        try:
+            limits[template] = (float(count), float(period))
+        except ValueError:
+            raise ValueError(f'Malformed flood limit {rule.strip()!r}, expected template=count/seconds') from None
+
+        if not all(math.isfinite(number) and number > 0 for number in limits[template]):
+            raise ValueError(f'Flood limit {rule.strip()!r} must have a positive count and period')
+
+    return limits
+
+
+@dataclass
+class FloodStats:
+    keys: int
+    allowed: int
+    suppressed: dict[str, int]
+
+
+class MemoryFloodRepository(FloodRepository):
+    # A token bucket for every receiver of a template, holding up to count mails and refilled at count per period.
+    # Buckets are kept for up to max_keys receivers, least recently used first out. A bucket left alone for a whole
+    # period is full again and dropped, and an evicted one starts over full, so memory is bounded without ever
+    # suppressing mails that are within the limits.
+    def __init__(self, limits: dict[str, tuple[float, float]], max_keys: int = 100000) -> None:
+        self.limits = limits
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.buckets: OrderedDict[tuple[str, str], tuple[float, float]] = OrderedDict()
+        self.allowed = 0
+        self.suppressed: Counter[str] = Counter()
+
+    def _limit(self, template: str) -> tuple[float, float] | None:
+        return self.limits.get(template, self.limits.get(DEFAULT_TEMPLATE))
+
+    def _prune(self, now: float) -> None:
+        while self.buckets:
+            (template, _), (_, updated) = next(iter(self.buckets.items()))
+            limit = self._limit(template)
+            if len(self.buckets) <= self.max_keys and limit is not None and now - updated < limit[1]:
+                return
+            self.buckets.popitem(last=False)
+
+    def allow(self, template: str, receiver: str) -> bool:
+        limit = self._limit(template)
+        if limit is None:
+            return True
+
+        count, period = limit
+        key = (template, receiver.lower())
+        now = time.monotonic()
+
+        with self.lock:
+            bucket = self.buckets.pop(key, None)
+            tokens = count if bucket is None else min(bucket[0] + (now - bucket[1]) * count / period, count)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+                self.allowed += 1
+            else:
+                self.suppressed[template] += 1
+
+            self.buckets[key] = (tokens, now)
+            self._prune(now)
+
+        return allowed
+
+    def stats(self) -> FloodStats:
+        with self.lock:
+            return FloodStats(keys=len(self.buckets), allowed=self.allowed, suppressed=dict(self.suppressed))
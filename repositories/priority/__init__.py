@@ -0,0 +1,13 @@
+from .context import HIGH, LOW, NORMAL, PRIORITIES, current_priority, mail_priority
+from .mail import PriorityMailRepository, PriorityStats
+
+__all__ = [
+    'HIGH',
+    'LOW',
+    'NORMAL',
+    'PRIORITIES',
+    'PriorityMailRepository',
+    'PriorityStats',
+    'current_priority',
+    'mail_priority',
+]
@@ -0,0 +1,25 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+HIGH = 'high'
+NORMAL = 'normal'
+LOW = 'low'
+
+PRIORITIES = (HIGH, NORMAL, LOW)
+
+# Class of the mail being sent, set by the handler around the send
+_priority: ContextVar[str] = ContextVar('mail_priority', default=NORMAL)
+
+
+@contextmanager
+def mail_priority(priority: str) -> Iterator[None]:
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
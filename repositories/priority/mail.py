@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+
+from metrics import QUEUE_SECONDS
+from repositories import MailRepository
+from repositories.rest import UpstreamUnavailableError
+from repositories.retry import remaining_time
+
+from .context import HIGH, LOW, NORMAL, PRIORITIES, current_priority
+
+
+@dataclass
+class PriorityStats:
+    in_use: int
+    queued: dict[str, int]
+    granted: dict[str, int]
+    expired: dict[str, int]
+    rejected: int
+    aged: int
+
+
+class Waiter:
+    __slots__ = ('enqueued', 'event', 'granted', 'priority')
+
+    def __init__(self, priority: str) -> None:
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.event = threading.Event()
+        self.granted = False
+
+
+class PriorityMailRepository(MailRepository):
+    # Lets at most capacity sends through to the delivery at once and queues the others by the priority of the mail.
+    # The last reserved slots are only handed to high priority mails, so an urgent alert always finds one free, and
+    # queued high priority mails go first. Normal and low ones share the other slots in the ratio of their weights,
+    # and one that has waited for max_wait seconds goes ahead of every class, so the low class is never starved.
+    # Every waiting mail holds a request thread, so once max_queued normal and low mails wait more of them are turned
+    # away right away, and threads are left for urgent alerts to reach the queue.
+    def __init__(  # noqa: PLR0913
+        self,
+        delivery: MailRepository,
+        capacity: int = 6,
+        reserved: int = 2,
+        weights: dict[str, int] | None = None,
+        max_wait: float = 2,
+        max_queued: int = 16,
+    ) -> None:
+        self.delivery = delivery
+        self.capacity = capacity
+        self.reserved = min(reserved, capacity - 1)
+        self.weights = {NORMAL: 3, LOW: 1} if weights is None else weights
+        self.max_wait = max_wait
+        self.max_queued = max_queued
+
+        self.lock = threading.Lock()
+        self.queues: dict[str, deque[Waiter]] = {priority: deque() for priority in PRIORITIES}
+        self.credit = dict.fromkeys(self.weights, 0)
+        self.in_use = 0
+        self.granted: Counter[str] = Counter()
+        self.expired: Counter[str] = Counter()
+        self.rejected = 0
+        self.aged = 0
+
+    def _weighted(self) -> str | None:
+        # Smooth weighted round robin, the classes with mails waiting earn their weight and the richest one goes next
+        eligible = [priority for priority in self.weights if self.queues[priority]]
+        if not eligible:
+            return None
+
+        for priority in eligible:
+            self.credit[priority] += self.weights[priority]
+        chosen = max(eligible, key=self.credit.__getitem__)
+        self.credit[chosen] -= sum(self.weights[priority] for priority in eligible)
+        return chosen
+
+    def _next(self, now: float) -> str | None:
+        shared_free = self.in_use < self.capacity - self.reserved
+
+        aged = [
+            queue[0]
+            for priority, queue in self.queues.items()
+            if queue and now - queue[0].enqueued >= self.max_wait and (priority == HIGH or shared_free)
+        ]
+        if aged:
+            self.aged += 1
+            return min(aged, key=lambda waiter: waiter.enqueued).priority
+
+        if self.queues[HIGH]:
+            return HIGH
+
+        return self._weighted() if shared_free else None
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        while self.in_use < self.capacity:
+            priority = self._next(now)
+            if priority is None:
+                return
+
+            waiter = self.queues[priority].popleft()
+            waiter.granted = True
+            self.in_use += 1
+            self.granted[priority] += 1
+            waiter.event.set()
+
+    def _acquire(self, priority: str) -> float:
+        waiter = Waiter(priority)
+        with self.lock:
+            routine = sum(len(queue) for queued, queue in self.queues.items() if queued != HIGH)
+            rejected = priority != HIGH and routine >= self.max_queued
+            if rejected:
+                self.rejected += 1
+            else:
+                self.queues[priority].append(waiter)
+                self._dispatch()
+
+        if rejected:
+            QUEUE_SECONDS.labels(priority, 'rejected').observe(0)
+            raise UpstreamUnavailableError('Too many mails waiting for a send slot', 1)
+
+        # Waiting past the ack deadline is pointless, Pub/Sub is told to come back instead
+        if not waiter.event.wait(remaining_time()):
+            with self.lock:
+                expired = not waiter.granted
+                if expired:
+                    self.queues[priority].remove(waiter)
+                    self.expired[priority] += 1
+
+            if expired:
+                QUEUE_SECONDS.labels(priority, 'expired').observe(time.monotonic() - waiter.enqueued)
+                raise UpstreamUnavailableError('No send slot freed up before the ack deadline', 1)
+
+        return time.monotonic() - waiter.enqueued
+
+    def _release(self) -> None:
+        with self.lock:
+            self.in_use -= 1
+            self._dispatch()
+
+    def send(
+        self, sender: tuple[str | None, str], receiver: tuple[str | None, str], subject: str, text: str, reply_to: str | None
+    ) -> None:
+        priority = current_priority()
+        QUEUE_SECONDS.labels(priority, 'granted').observe(self._acquire(priority))
+
+        try:
+            self.delivery.send(sender, receiver, subject, text, reply_to)
+        finally:
+            self._release()
+
+    def stats(self) -> PriorityStats:
+        with self.lock:
+            return PriorityStats(
+                in_use=self.in_use,
+                queued={priority: len(queue) for priority, queue in self.queues.items()},
+                granted=dict(self.granted),
+                expired=dict(self.expired),
+                rejected=self.rejected,
+                aged=self.aged,
+            )
@@ -0,0 +1,3 @@
+from .template import ResourceTemplateRepository
+
+__all__ = ['ResourceTemplateRepository']
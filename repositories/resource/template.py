@@ -0,0 +1,81 @@
+import importlib
+import string
+from collections.abc import Mapping
+from importlib import resources as impresources
+from typing import NamedTuple, cast
+
+from repositories import TemplateRepository
+
+
+class CompiledTemplate(NamedTuple):
+    text: str
+    fields: frozenset[str]
+
+
+class ResourceTemplateRepository(TemplateRepository):
+    def __init__(self, package: str) -> None:
+        manifest = importlib.import_module(package)
+
+        self.languages = cast(tuple[str, ...], manifest.LANGUAGES)
+        self.templates = self._load_templates(package, cast(Mapping[str, frozenset[str]], manifest.TEMPLATES))
+        self.translations = self._load_translations(cast(Mapping[str, Mapping[str, Mapping[str, str]]], manifest.TRANSLATIONS))
+
+    @staticmethod
+    def _parse(name: str, text: str) -> CompiledTemplate:
+        try:
+            fields = frozenset(field for _, field, _, _ in string.Formatter().parse(text) if field is not None)
+        except ValueError as err:
+            raise ValueError(f'Malformed mail template {name}: {err}') from err
+
+        if '' in fields or any(not field.isidentifier() for field in fields):
+            raise ValueError(f'Mail template {name} must only use named placeholders')
+
+        return CompiledTemplate(text, fields)
+
+    def _load_templates(self, package: str, expected: Mapping[str, frozenset[str]]) -> dict[tuple[str, str], CompiledTemplate]:
+        templates: dict[tuple[str, str], CompiledTemplate] = {}
+
+        for resource in impresources.files(package).iterdir():
+            if not resource.name.endswith('.txt'):
+                continue
+
+            template, _, language = resource.name.removesuffix('.txt').partition('.')
+            if template not in expected or language not in self.languages:
+                raise ValueError(f'Unexpected mail template {resource.name}')
+
+            templates[(template, language)] = self._parse(resource.name, resource.read_text(encoding='utf-8'))
+
+        for template, fields in expected.items():
+            for language in self.languages:
+                compiled = templates.get((template, language))
+                if compiled is None:
+                    raise ValueError(f'Missing mail template {template}.{language}.txt')
+
+                if compiled.fields != fields:
+                    missing = ', '.join(sorted(fields - compiled.fields)) or '-'
+                    unknown = ', '.join(sorted(compiled.fields - fields)) or '-'
+                    raise ValueError(
+                        f'Mail template {template}.{language}.txt placeholders do not match '
+                        f'(missing: {missing}, unknown: {unknown})'
+                    )
+
+        return templates
+
+    def _load_translations(self, tables: Mapping[str, Mapping[str, Mapping[str, str]]]) -> dict[tuple[str, str, str], str]:
+        translations: dict[tuple[str, str, str], str] = {}
+
+        for table, entries in tables.items():
+            for key, texts in entries.items():
+                for language in self.languages:
+                    if language not in texts:
+                        raise ValueError(f'Missing {language} translation for {table}.{key}')
+
+                    translations[(table, str(key), language)] = texts[language]
+
+        return translations
+
+    def render(self, template: str, language: str, **kwargs: object) -> str:
+        return self.templates[(template, language)].text.format_map(kwargs)
+
+    def translate(self, table: str, key: str, language: str) -> str:
+        return self.translations[(table, key, language)]
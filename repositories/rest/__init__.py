@@ -1,7 +1,19 @@
-from .mail import SendgridMailRepository
-from .util import TokenProvider
+from .batching import SendgridBatchingMailRepository
+from .guard import CircuitBreaker, RateLimiter, UpstreamUnavailableError
+from .mail import BatchMail, SendgridMailRepository
+from .session import PooledSession
+from .util import CachedTokenProvider, ExpiringTokenProvider, StaticTokenProvider, TokenProvider
 
 __all__ = [
+    'BatchMail',
+    'CachedTokenProvider',
+    'CircuitBreaker',
+    'ExpiringTokenProvider',
+    'PooledSession',
+    'RateLimiter',
+    'SendgridBatchingMailRepository',
     'SendgridMailRepository',
+    'StaticTokenProvider',
     'TokenProvider',
+    'UpstreamUnavailableError',
 ]
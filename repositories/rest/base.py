@@ -1,15 +1,32 @@
 import logging
+import time
 from typing import Any, Never
 
 import requests
 
+from metrics import UPSTREAM_SECONDS
+from repositories.retry.deadline import remaining_time
+
 from .util import TokenProvider
 
+# Shortest timeout given to a request when the ack deadline is about to pass
+MIN_TIMEOUT = 0.1
+
 
 class RestBaseRepository:
-    def __init__(self, base_url: str, token_provider: TokenProvider | None) -> None:
+    def __init__(
+        self,
+        base_url: str,
+        token_provider: TokenProvider | None,
+        session: requests.Session | None = None,
+        connect_timeout: float = 2,
+        read_timeout: float = 2,
+    ) -> None:
         self.base_url = base_url
         self.token_provider = token_provider
+        self.session = requests.Session() if session is None else session
+        self.timeout = (connect_timeout, read_timeout)
+        self.headers: tuple[str, dict[str, str]] | None = None
         self.logger = logging.getLogger(self.__class__.__name__)
 
     def _get_headers(self) -> dict[str, str] | None:
@@ -17,12 +34,35 @@ class RestBaseRepository:
             headers = None
         else:
             id_token = self.token_provider.get_token()
-            headers = {'Authorization': f'Bearer {id_token}'}
+
+            # Only build the headers again when the token changes
+            cached = self.headers
+            if cached is None or cached[0] != id_token:
+                cached = (id_token, {'Authorization': f'Bearer {id_token}'})
+                self.headers = cached
+
+            headers = cached[1]
 
         return headers
 
+    def _timeout(self) -> tuple[float, float]:
+        # Waiting for an answer after the push was redelivered is wasted, the configured timeouts are only upper bounds
+        remaining = remaining_time()
+        if remaining is None:
+            return self.timeout
+
+        remaining = max(remaining, MIN_TIMEOUT)
+        return (min(self.timeout[0], remaining), min(self.timeout[1], remaining))
+
     def authenticated_post(self, url: str, json: dict[str, Any]) -> requests.Response:
-        return requests.post(url, json=json, timeout=2, headers=self._get_headers())
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            resp = self.session.post(url, json=json, timeout=self._timeout(), headers=self._get_headers())
+            outcome = str(resp.status_code)
+            return resp
+        finally:
+            UPSTREAM_SECONDS.labels(outcome).observe(time.perf_counter() - start)
 
     def unexpected_error(self, resp: requests.Response) -> Never:
         resp.raise_for_status()
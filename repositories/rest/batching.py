@@ -0,0 +1,86 @@
+import logging
+import time
+from concurrent.futures import Future
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+
+from repositories import MailRepository
+from repositories.retry.deadline import ack_deadline, remaining_time
+from repositories.window import WindowedFlusher
+
+from .mail import BatchMail, SendgridMailRepository
+
+Sender = tuple[str | None, str]
+
+
+@dataclass
+class PendingBatch:
+    deadline: float
+    items: list[tuple[BatchMail, Future[None]]] = field(default_factory=list)
+    # Earliest ack deadline of the pushes waiting on the batch, in monotonic time
+    expires: float | None = None
+
+    def add(self, item: tuple[BatchMail, Future[None]]) -> None:
+        self.items.append(item)
+
+        remaining = remaining_time()
+        if remaining is not None:
+            expires = time.monotonic() + remaining
+            self.expires = expires if self.expires is None else min(self.expires, expires)
+
+
+class SendgridBatchingMailRepository(MailRepository, WindowedFlusher[Sender, PendingBatch]):
+    # Mails waiting for a flush are grouped by sender, as it is shared by every personalization of a request
+    def __init__(
+        self, repo: SendgridMailRepository, max_batch: int = 100, max_delay: float = 0.05, flush_workers: int = 4
+    ) -> None:
+        self.repo = repo
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        WindowedFlusher.__init__(self, 'sendgrid-batch', flush_workers)
+
+    def send(
+        self, sender: tuple[str | None, str], receiver: tuple[str | None, str], subject: str, text: str, reply_to: str | None
+    ) -> None:
+        future: Future[None] = Future()
+        item = (BatchMail(receiver, subject, text, reply_to), future)
+        ready = None
+
+        with self.cond:
+            if self.stopping:
+                ready = PendingBatch(time.monotonic())
+                ready.add(item)
+            else:
+                batch = self.pending.get(sender)
+                if batch is None:
+                    batch = self.pending[sender] = PendingBatch(time.monotonic() + self.max_delay)
+                    self.cond.notify()
+
+                batch.add(item)
+
+                if len(batch.items) >= self.max_batch:
+                    ready = self._pop(sender)
+
+        if ready is not None:
+            # The caller would wait for the flush anyway, so a full batch is sent from its own thread
+            self._flush(sender, ready)
+
+        future.result()
+
+    def _flush(self, key: Sender, entry: PendingBatch) -> None:
+        # Flushes run on the flusher thread, outside of the pushes, so the request is timed by the earliest of their
+        # ack deadlines instead
+        deadline = nullcontext() if entry.expires is None else ack_deadline(entry.expires - time.monotonic())
+        try:
+            with deadline:
+                results = self.repo.send_batch(key, [mail for mail, _ in entry.items])
+        except Exception as err:  # noqa: BLE001
+            results = [err] * len(entry.items)
+
+        for (_, future), result in zip(entry.items, results, strict=True):
+            if result is None:
+                future.set_result(None)
+            else:
+                future.set_exception(result)
@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+from collections import Counter
+from collections.abc import Mapping
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from metrics import BREAKER_TRANSITIONS
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class UpstreamUnavailableError(requests.RequestException):
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> float | None:
+    value = headers.get('Retry-After')
+    if value is None:
+        return None
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _header_float(headers: Mapping[str, str], name: str) -> float | None:
+    try:
+        return float(headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def is_upstream_failure(status: int) -> bool:
+    return bool(status == requests.codes.too_many_requests or status >= requests.codes.internal_server_error)
+
+
+@dataclass
+class RateLimiterStats:
+    rate: float
+    tokens: float
+    paused_for: float
+    throttled: int
+
+
+class RateLimiter:
+    # Token bucket shared by every thread sending to the upstream. The rate follows the budget announced in the
+    # X-RateLimit-* headers, is halved on a 429 without them, and creeps back up to max_rate while calls succeed.
+    def __init__(self, max_rate: float = 500, burst: float = 500, max_wait: float = 1, min_rate: float = 1) -> None:
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.lock = threading.Lock()
+
+        self.rate = max_rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.throttled = 0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.burst)
+        self.updated = now
+
+    def reserve(self) -> float:
+        # Takes a token and returns how long to wait before using it, tokens may go negative to queue callers up
+        now = time.monotonic()
+
+        with self.lock:
+            self._refill(now)
+
+            wait = max(self.paused_until - now, 0)
+            if self.tokens < 1:
+                wait = max(wait, (1 - self.tokens) / self.rate)
+
+            if wait > self.max_wait:
+                self.throttled += 1
+                raise UpstreamUnavailableError('Rate limit of the mail provider reached', wait)
+
+            self.tokens -= 1
+
+        return wait
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def update(self, status: int, headers: Mapping[str, str]) -> None:
+        now = time.monotonic()
+        pause = parse_retry_after(headers) if status == requests.codes.too_many_requests else None
+
+        remaining = _header_float(headers, 'X-RateLimit-Remaining')
+        reset = _header_float(headers, 'X-RateLimit-Reset')
+
+        with self.lock:
+            self._refill(now)
+
+            if remaining is not None and reset is not None:
+                # Spread what is left of the window over the time until it resets
+                window = max(reset - time.time(), 1)
+                self.rate = min(max(remaining / window, self.min_rate), self.max_rate)
+                self.tokens = min(self.tokens, remaining)
+                if remaining < 1:
+                    pause = max(pause or 0, reset - time.time())
+            elif status == requests.codes.too_many_requests:
+                self.rate = max(self.rate / 2, self.min_rate)
+            elif self.rate < self.max_rate:
+                self.rate = min(self.rate + self.max_rate / 20, self.max_rate)
+
+            if pause is not None and pause > 0:
+                self.tokens = min(self.tokens, 0)
+                self.paused_until = max(self.paused_until, now + pause)
+                self.logger.warning('Mail provider asked to pause for %.1fs', pause)
+
+    def stats(self) -> RateLimiterStats:
+        now = time.monotonic()
+
+        with self.lock:
+            self._refill(now)
+            return RateLimiterStats(
+                rate=self.rate,
+                tokens=self.tokens,
+                paused_for=max(self.paused_until - now, 0),
+                throttled=self.throttled,
+            )
+
+
+@dataclass
+class CircuitBreakerStats:
+    state: str
+    failures: int
+    rejected: int
+    transitions: dict[str, int]
+
+
+class CircuitBreaker:
+    # Opens after failure_threshold consecutive failures and rejects calls right away until reset_timeout has passed,
+    # then lets a single probe through to decide whether to close again.
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.lock = threading.Lock()
+
+        self.state = CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self.probe_until = 0.0
+        self.rejected = 0
+        self.transitions: Counter[str] = Counter()
+
+    def _transition(self, state: str) -> None:
+        self.logger.warning('Circuit %s -> %s', self.state, state)
+        self.transitions[f'{self.state}->{state}'] += 1
+        BREAKER_TRANSITIONS.labels(self.state, state).inc()
+        self.state = state
+
+    def _open(self, now: float, retry_after: float | None) -> None:
+        self.open_until = now + max(self.reset_timeout, retry_after or 0)
+        self._transition(OPEN)
+
+    def before(self) -> None:
+        now = time.monotonic()
+
+        with self.lock:
+            if self.state == OPEN and now >= self.open_until:
+                self._transition(HALF_OPEN)
+
+            if self.state == HALF_OPEN and now >= self.probe_until:
+                # A probe that never reported back does not hold the circuit half open forever
+                self.probe_until = now + self.reset_timeout
+                return
+
+            if self.state != CLOSED:
+                self.rejected += 1
+                wait = max(self.open_until, self.probe_until) - now
+                raise UpstreamUnavailableError('Circuit to the mail provider is open', max(wait, 1))
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self, retry_after: float | None = None) -> None:
+        now = time.monotonic()
+
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self._open(now, retry_after)
+
+    def record(self, status: int, headers: Mapping[str, str]) -> None:
+        if is_upstream_failure(status):
+            self.record_failure(parse_retry_after(headers))
+        else:
+            self.record_success()
+
+    def stats(self) -> CircuitBreakerStats:
+        with self.lock:
+            return CircuitBreakerStats(
+                state=self.state,
+                failures=self.failures,
+                rejected=self.rejected,
+                transitions=dict(self.transitions),
+            )
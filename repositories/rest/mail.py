@@ -1,52 +1,161 @@
-import re
-from typing import Any, cast
+import time
+from typing import Any, NamedTuple, cast
 
 import requests
 
-from repositories import MailRepository
+from metrics import BLOCKLIST_SECONDS
+from repositories import BlocklistRepository, MailRepository
 
 from .base import RestBaseRepository
 from .util import TokenProvider
 
+SENDGRID_BASE_URL = 'https://api.sendgrid.com'
+MAIL_SEND_PATH = '/v3/mail/send'
+
+# Each personalization of a batch carries its own body as a substitution, SendGrid caps them at 10000 bytes
+BODY_TAG = '-notification-body-'
+MAX_SUBSTITUTION_BYTES = 10000
+
+
+class BatchMail(NamedTuple):
+    receiver: tuple[str | None, str]
+    subject: str
+    text: str
+    reply_to: str | None
+
+
+def address_payload(address: tuple[str | None, str]) -> dict[str, str]:
+    address_dict = {'email': address[1]}
+    if address[0] is not None:
+        address_dict['name'] = address[0]
+
+    return address_dict
+
+
+def mail_payload(
+    sender: tuple[str | None, str], receiver: tuple[str | None, str], subject: str, text: str, reply_to: str | None
+) -> dict[str, Any]:
+    data = {
+        'personalizations': [
+            {
+                'to': [address_payload(receiver)],
+            }
+        ],
+        'from': address_payload(sender),
+        'headers': {},
+        'subject': subject,
+        'content': [{'type': 'text/plain', 'value': text}],
+    }
+
+    if reply_to is not None:
+        cast(dict[str, Any], data['headers'])['In-Reply-To'] = reply_to
+        cast(dict[str, Any], data['headers'])['References'] = reply_to
+
+    return data
+
+
+_BLOCKED = BLOCKLIST_SECONDS.labels('blocked')
+_ALLOWED = BLOCKLIST_SECONDS.labels('allowed')
+
+
+def check_blocklist(blocklist: BlocklistRepository | None, receiver: tuple[str | None, str]) -> bool:
+    if blocklist is None:
+        return False
+
+    start = time.perf_counter()
+    blocked = blocklist.is_blocked(receiver[1])
+    (_BLOCKED if blocked else _ALLOWED).observe(time.perf_counter() - start)
+    return blocked
+
 
 class SendgridMailRepository(MailRepository, RestBaseRepository):
-    def __init__(self, token_provider: TokenProvider | None, blocklist: str | None = None) -> None:
-        RestBaseRepository.__init__(self, '', token_provider)
-        self.blocklist = None if blocklist is None else re.compile(blocklist)
+    def __init__(  # noqa: PLR0913
+        self,
+        token_provider: TokenProvider | None,
+        blocklist: BlocklistRepository | None = None,
+        session: requests.Session | None = None,
+        connect_timeout: float = 2,
+        read_timeout: float = 2,
+        base_url: str = SENDGRID_BASE_URL,
+    ) -> None:
+        RestBaseRepository.__init__(self, base_url, token_provider, session, connect_timeout, read_timeout)
+        self.blocklist = blocklist
+
+    def is_blocked(self, receiver: tuple[str | None, str]) -> bool:
+        return check_blocklist(self.blocklist, receiver)
 
     def send(
         self, sender: tuple[str | None, str], receiver: tuple[str | None, str], subject: str, text: str, reply_to: str | None
     ) -> None:
-        if self.blocklist is not None and self.blocklist.match(receiver[1]):
+        if self.is_blocked(receiver):
+            return
+
+        resp = self.authenticated_post(
+            f'{self.base_url}{MAIL_SEND_PATH}', json=mail_payload(sender, receiver, subject, text, reply_to)
+        )
+
+        if resp.status_code == requests.codes.accepted:
             return
 
-        receiver_dict = {'email': receiver[1]}
-        if receiver[0] is not None:
-            receiver_dict['name'] = receiver[0]
+        self.unexpected_error(resp)
+
+    def _try_send(self, sender: tuple[str | None, str], mail: BatchMail) -> Exception | None:
+        try:
+            self.send(sender, mail.receiver, mail.subject, mail.text, mail.reply_to)
+        except Exception as err:  # noqa: BLE001
+            return err
 
-        sender_dict = {'email': sender[1]}
-        if sender[0] is not None:
-            sender_dict['name'] = sender[0]
+        return None
+
+    def _post_batch(self, sender: tuple[str | None, str], mails: list[BatchMail]) -> list[Exception | None]:
+        personalizations = []
+        for mail in mails:
+            personalization: dict[str, Any] = {
+                'to': [address_payload(mail.receiver)],
+                'subject': mail.subject,
+                'substitutions': {BODY_TAG: mail.text},
+            }
+            if mail.reply_to is not None:
+                personalization['headers'] = {'In-Reply-To': mail.reply_to, 'References': mail.reply_to}
+            personalizations.append(personalization)
 
         data = {
-            'personalizations': [
-                {
-                    'to': [receiver_dict],
-                }
-            ],
-            'from': sender_dict,
-            'headers': {},
-            'subject': subject,
-            'content': [{'type': 'text/plain', 'value': text}],
+            'personalizations': personalizations,
+            'from': address_payload(sender),
+            'content': [{'type': 'text/plain', 'value': BODY_TAG}],
         }
 
-        if reply_to is not None:
-            cast(dict[str, Any], data['headers'])['In-Reply-To'] = reply_to
-            cast(dict[str, Any], data['headers'])['References'] = reply_to
+        try:
+            resp = self.authenticated_post(f'{self.base_url}{MAIL_SEND_PATH}', json=data)
+            if resp.status_code == requests.codes.accepted:
+                return [None] * len(mails)
 
-        resp = self.authenticated_post('https://api.sendgrid.com/v3/mail/send', json=data)
+            if requests.codes.bad_request <= resp.status_code < requests.codes.internal_server_error and (
+                resp.status_code != requests.codes.too_many_requests
+            ):
+                # A single invalid mail rejects the whole request, send them one by one to find out which one
+                self.logger.warning('Batch of %d mails rejected with status %d', len(mails), resp.status_code)
+                return [self._try_send(sender, mail) for mail in mails]
 
-        if resp.status_code == requests.codes.accepted:
-            return
+            self.unexpected_error(resp)
+        except requests.RequestException as err:
+            return [err] * len(mails)
 
-        self.unexpected_error(resp)
+    def send_batch(self, sender: tuple[str | None, str], mails: list[BatchMail]) -> list[Exception | None]:
+        results: list[Exception | None] = [None] * len(mails)
+
+        pending = [idx for idx, mail in enumerate(mails) if not self.is_blocked(mail.receiver)]
+        batch = [idx for idx in pending if len(mails[idx].text.encode()) <= MAX_SUBSTITUTION_BYTES]
+        if len(batch) < 2:  # noqa: PLR2004
+            batch = []
+
+        batched = set(batch)
+        for idx in pending:
+            if idx not in batched:
+                results[idx] = self._try_send(sender, mails[idx])
+
+        if batch:
+            for idx, result in zip(batch, self._post_batch(sender, [mails[idx] for idx in batch]), strict=True):
+                results[idx] = result
+
+        return results
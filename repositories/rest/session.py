@@ -0,0 +1,74 @@
+import logging
+import threading
+import time
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .guard import CircuitBreaker, RateLimiter
+
+
+class PooledSession(requests.Session):
+    def __init__(
+        self,
+        pool_size: int = 8,
+        idle_timeout: float = 60,
+        limiter: RateLimiter | None = None,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        super().__init__()
+        self.idle_timeout = idle_timeout
+        self.limiter = limiter
+        self.breaker = breaker
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+        # Failed requests are not retried here, RetryingMailRepository retries them within the ack deadline
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def evict_idle(self) -> None:
+        now = time.monotonic()
+
+        with self.lock:
+            idle = now - self.last_used > self.idle_timeout
+            self.last_used = now
+
+        if idle:
+            # Load balancers drop idle keep-alive connections, reconnect instead of failing on a stale socket
+            for adapter in self.adapters.values():
+                if isinstance(adapter, HTTPAdapter):
+                    adapter.poolmanager.clear()
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:  # noqa: ANN401
+        self.evict_idle()
+
+        # Fail fast while the upstream is struggling, instead of piling more calls onto it
+        if self.breaker is not None:
+            self.breaker.before()
+        if self.limiter is not None:
+            self.limiter.acquire()
+
+        try:
+            resp = super().send(request, **kwargs)
+        except requests.RequestException:
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise
+
+        if self.limiter is not None:
+            self.limiter.update(resp.status_code, resp.headers)
+        if self.breaker is not None:
+            self.breaker.record(resp.status_code, resp.headers)
+
+        return resp
+
+    def warm_up(self, url: str, timeout: float = 2) -> None:
+        # Opens a connection ahead of the first send. Nothing is sent, so the limiter and the breaker are left out.
+        try:
+            super().send(self.prepare_request(requests.Request('HEAD', url)), timeout=timeout)
+        except requests.RequestException as err:
+            self.logger.warning('Failed to warm up connection to %s: %s', url, err)
@@ -1,5 +1,82 @@
-from typing import Protocol
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Protocol, runtime_checkable
 
 
 class TokenProvider(Protocol):
     def get_token(self) -> str: ...  # pragma: no cover
+
+
+@runtime_checkable
+class ExpiringTokenProvider(Protocol):
+    def get_token(self) -> str: ...  # pragma: no cover
+
+    def get_token_with_expiry(self) -> tuple[str, datetime]: ...  # pragma: no cover
+
+
+class StaticTokenProvider:
+    def __init__(self, token: str) -> None:
+        self.token = token
+
+    def get_token(self) -> str:
+        return self.token
+
+
+class CachedTokenProvider:
+    def __init__(
+        self, provider: TokenProvider, ttl: float = 3600, refresh_ahead: float = 300, retry_interval: float = 10
+    ) -> None:
+        self.provider = provider
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.retry_interval = retry_interval
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.lock = threading.Lock()
+        self.current: tuple[str, float] | None = None
+        self.refreshing = False
+        self.next_refresh = 0.0
+
+    def _fetch(self) -> tuple[str, float]:
+        if isinstance(self.provider, ExpiringTokenProvider):
+            token, expiry = self.provider.get_token_with_expiry()
+            current = (token, expiry.timestamp())
+        else:
+            current = (self.provider.get_token(), time.time() + self.ttl)
+
+        self.current = current
+        return current
+
+    def _refresh(self) -> None:
+        try:
+            self._fetch()
+        except Exception:
+            self.logger.exception('Failed to refresh token, will retry in %ss', self.retry_interval)
+            self.next_refresh = time.time() + self.retry_interval
+        finally:
+            self.refreshing = False
+
+    def get_token(self) -> str:
+        current = self.current
+        now = time.time()
+
+        if current is None or now >= current[1]:
+            # Without a valid token every caller has to wait, but only the first one fetches it
+            with self.lock:
+                current = self.current
+                if current is None or time.time() >= current[1]:
+                    current = self._fetch()
+            return current[0]
+
+        if now >= current[1] - self.refresh_ahead and now >= self.next_refresh and not self.refreshing:
+            with self.lock:
+                start = not self.refreshing
+                self.refreshing = True
+
+            if start:
+                # Callers keep using the current token while a single background thread fetches the next one
+                threading.Thread(target=self._refresh, name='token-refresh', daemon=True).start()
+
+        return current[0]
@@ -0,0 +1,4 @@
+from .deadline import ack_deadline, remaining_time
+from .mail import RetryingMailRepository, RetryStats, is_transient
+
+__all__ = ['RetryStats', 'RetryingMailRepository', 'ack_deadline', 'is_transient', 'remaining_time']
@@ -0,0 +1,21 @@
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Monotonic time by which the message being handled has to be acknowledged, None outside of a push
+_deadline: ContextVar[float | None] = ContextVar('ack_deadline', default=None)
+
+
+@contextmanager
+def ack_deadline(seconds: float) -> Iterator[None]:
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> float | None:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
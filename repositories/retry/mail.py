@@ -0,0 +1,165 @@
+import logging
+import random
+import smtplib
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+
+from metrics import RETRIES
+from repositories import MailRepository
+from repositories.rest.guard import UpstreamUnavailableError
+
+from .deadline import remaining_time
+
+Sender = tuple[str | None, str]
+
+SMTP_TRANSIENT = 400
+SMTP_PERMANENT = 500
+
+
+def is_smtp_transient(err: Exception) -> bool:
+    # SMTP replies in the 4xx range ask to try again later, 5xx ones are permanent
+    if isinstance(err, smtplib.SMTPResponseException):
+        return bool(SMTP_TRANSIENT <= err.smtp_code < SMTP_PERMANENT)
+    if isinstance(err, smtplib.SMTPRecipientsRefused):
+        return all(SMTP_TRANSIENT <= code < SMTP_PERMANENT for code, _ in err.recipients.values())
+
+    return isinstance(err, smtplib.SMTPServerDisconnected | ConnectionError)
+
+
+def is_transient(err: Exception) -> bool:
+    # The breaker and the rate limiter already decided not to call the upstream, retrying would only wait on them
+    if isinstance(err, UpstreamUnavailableError):
+        return False
+
+    if isinstance(err, smtplib.SMTPException | ConnectionError):
+        return is_smtp_transient(err)
+
+    if isinstance(err, requests.HTTPError) and err.response is not None:
+        status = err.response.status_code
+        return bool(status == requests.codes.too_many_requests or status >= requests.codes.internal_server_error)
+
+    return isinstance(err, requests.ConnectionError | requests.Timeout | TimeoutError)
+
+
+@dataclass
+class RetryStats:
+    retries: int
+    recovered: int
+    exhausted: int
+    budget_exhausted: int
+    deadline_exceeded: int
+    budget: float
+    pending: int
+
+
+class RetryingMailRepository(MailRepository):
+    # Retries transient failures of the delivery with exponential backoff and full jitter. Only the send is repeated,
+    # the event is not decoded and rendered again as it would be on a redelivery. Retries are capped by max_attempts,
+    # by a budget that earns budget_ratio retries per send, and by the time left to acknowledge the Pub/Sub message.
+    def __init__(  # noqa: PLR0913
+        self,
+        delivery: MailRepository,
+        max_attempts: int = 3,
+        base_delay: float = 0.1,
+        max_delay: float = 2,
+        attempt_timeout: float = 4,
+        budget_ratio: float = 0.2,
+        max_budget: float = 10,
+    ) -> None:
+        self.delivery = delivery
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.budget_ratio = budget_ratio
+        self.max_budget = max_budget
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.lock = threading.Lock()
+        self.budget = max_budget
+        self.retries = 0
+        self.recovered = 0
+        self.exhausted = 0
+        self.budget_exhausted = 0
+        self.deadline_exceeded = 0
+        self.waiting = 0
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))  # noqa: S311
+
+    def _should_retry(self, attempt: int, delay: float, deadline: float | None) -> bool:
+        with self.lock:
+            if attempt >= self.max_attempts:
+                self.exhausted += 1
+                RETRIES.labels('exhausted').inc()
+                return False
+
+            if deadline is not None and time.monotonic() + delay + self.attempt_timeout > deadline:
+                self.deadline_exceeded += 1
+                RETRIES.labels('deadline_exceeded').inc()
+                return False
+
+            if self.budget < 1:
+                self.budget_exhausted += 1
+                RETRIES.labels('budget_exhausted').inc()
+                return False
+
+            self.budget -= 1
+            self.retries += 1
+            RETRIES.labels('scheduled').inc()
+            return True
+
+    def _wait(self, delay: float) -> None:
+        with self.lock:
+            self.waiting += 1
+        try:
+            time.sleep(delay)
+        finally:
+            with self.lock:
+                self.waiting -= 1
+
+    def send(
+        self, sender: tuple[str | None, str], receiver: tuple[str | None, str], subject: str, text: str, reply_to: str | None
+    ) -> None:
+        remaining = remaining_time()
+        deadline = None if remaining is None else time.monotonic() + remaining
+
+        with self.lock:
+            self.budget = min(self.budget + self.budget_ratio, self.max_budget)
+
+        # Every attempt runs on the calling thread in the context of the push, sleeping through the backoff in between.
+        # The backoff of a retry is at most max_delay and it is only made while it ends in time for the ack deadline.
+        attempt = 1
+        while True:
+            try:
+                self.delivery.send(sender, receiver, subject, text, reply_to)
+                break
+            except Exception as err:
+                delay = self._backoff(attempt)
+                if not is_transient(err) or not self._should_retry(attempt, delay, deadline):
+                    raise
+
+                self.logger.warning('Retrying send in %.2fs after attempt %d failed: %s', delay, attempt, err)
+                self._wait(delay)
+
+            attempt += 1
+
+        if attempt > 1:
+            with self.lock:
+                self.recovered += 1
+                RETRIES.labels('recovered').inc()
+
+    def stats(self) -> RetryStats:
+        with self.lock:
+            return RetryStats(
+                retries=self.retries,
+                recovered=self.recovered,
+                exhausted=self.exhausted,
+                budget_exhausted=self.budget_exhausted,
+                deadline_exceeded=self.deadline_exceeded,
+                budget=self.budget,
+                pending=self.waiting,
+            )
@@ -0,0 +1,4 @@
+from .mail import SMTPMailRepository
+from .pool import SMTPConnectionPool, SMTPPoolStats
+
+__all__ = ['SMTPConnectionPool', 'SMTPMailRepository', 'SMTPPoolStats']
@@ -0,0 +1,58 @@
+import smtplib
+import time
+from email.message import EmailMessage
+from email.utils import formataddr, formatdate, make_msgid
+
+from metrics import UPSTREAM_SECONDS
+from repositories import BlocklistRepository, MailRepository
+from repositories.rest.mail import check_blocklist
+
+from .pool import SMTP_OK, SMTPConnectionPool
+
+
+def mail_message(
+    sender: tuple[str | None, str], receiver: tuple[str | None, str], subject: str, text: str, reply_to: str | None
+) -> EmailMessage:
+    message = EmailMessage()
+    message['From'] = formataddr(sender)
+    message['To'] = formataddr(receiver)
+    message['Subject'] = subject
+    message['Date'] = formatdate()
+    # make_msgid looks up the FQDN of the host when not given a domain, which may block on DNS
+    message['Message-ID'] = make_msgid(domain=sender[1].rpartition('@')[2])
+
+    if reply_to is not None:
+        message['In-Reply-To'] = reply_to
+        message['References'] = reply_to
+
+    message.set_content(text)
+    return message
+
+
+class SMTPMailRepository(MailRepository):
+    def __init__(self, pool: SMTPConnectionPool, blocklist: BlocklistRepository | None = None) -> None:
+        self.pool = pool
+        self.blocklist = blocklist
+
+    def is_blocked(self, receiver: tuple[str | None, str]) -> bool:
+        return check_blocklist(self.blocklist, receiver)
+
+    def send(
+        self, sender: tuple[str | None, str], receiver: tuple[str | None, str], subject: str, text: str, reply_to: str | None
+    ) -> None:
+        if self.is_blocked(receiver):
+            return
+
+        message = mail_message(sender, receiver, subject, text, reply_to)
+
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            with self.pool.connection() as smtp:
+                smtp.send_message(message)
+            outcome = str(SMTP_OK)
+        except smtplib.SMTPResponseException as err:
+            outcome = str(err.smtp_code)
+            raise
+        finally:
+            UPSTREAM_SECONDS.labels(outcome).observe(time.perf_counter() - start)
@@ -0,0 +1,188 @@
+import logging
+import smtplib
+import ssl
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+SMTP_OK = 250
+
+
+@dataclass
+class SMTPPoolStats:
+    idle: int
+    in_use: int
+    opened: int
+    reused: int
+    replaced: int
+
+
+class PooledConnection:
+    __slots__ = ('last_used', 'messages', 'smtp')
+
+    def __init__(self, smtp: smtplib.SMTP) -> None:
+        self.smtp = smtp
+        self.messages = 0
+        self.last_used = time.monotonic()
+
+
+def is_broken(err: Exception) -> bool:
+    # The relay answered with an error, smtplib already reset the session and the connection can be used again
+    return not isinstance(err, smtplib.SMTPResponseException | smtplib.SMTPRecipientsRefused)
+
+
+class SMTPConnectionPool:
+    # Keeps up to size authenticated connections to the relay open and lends them out one send at a time. A connection
+    # is retired after max_messages mails or idle_timeout seconds unused. One that sat idle for more than check_after
+    # seconds is checked with a NOOP first, so a connection the relay dropped is replaced instead of failing the send.
+    def __init__(  # noqa: PLR0913
+        self,
+        host: str,
+        port: int = 587,
+        username: str | None = None,
+        password: str | None = None,
+        starttls: bool = True,  # noqa: FBT001, FBT002
+        size: int = 8,
+        max_messages: int = 100,
+        idle_timeout: float = 30,
+        check_after: float = 1,
+        timeout: float = 10,
+        ssl_context: ssl.SSLContext | None = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self.check_after = check_after
+        self.timeout = timeout
+        self.ssl_context = ssl.create_default_context() if ssl_context is None else ssl_context
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        self.idle: deque[PooledConnection] = deque()
+        self.in_use = 0
+        self.opened = 0
+        self.reused = 0
+        self.replaced = 0
+        self.closed = False
+
+    def _connect(self) -> PooledConnection:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.starttls:
+                smtp.starttls(context=self.ssl_context)
+                smtp.ehlo()
+            if self.username is not None:
+                smtp.login(self.username, self.password or '')
+        except Exception:
+            smtp.close()
+            raise
+
+        with self.lock:
+            self.opened += 1
+
+        return PooledConnection(smtp)
+
+    def _discard(self, conn: PooledConnection) -> None:
+        try:
+            conn.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.smtp.close()
+
+    def _is_alive(self, conn: PooledConnection) -> bool:
+        try:
+            return conn.smtp.noop()[0] == SMTP_OK
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _take(self) -> PooledConnection:
+        now = time.monotonic()
+        expired = []
+        conn = None
+
+        with self.lock:
+            # The least recently used connections are at the left, the ones the relay may have timed out already
+            while self.idle and now - self.idle[0].last_used > self.idle_timeout:
+                expired.append(self.idle.popleft())
+            if self.idle:
+                conn = self.idle.pop()
+
+        for old in expired:
+            self._discard(old)
+
+        if conn is not None and now - conn.last_used > self.check_after and not self._is_alive(conn):
+            self.logger.info('Replacing dead SMTP connection to %s:%d', self.host, self.port)
+            conn.smtp.close()
+            with self.lock:
+                self.replaced += 1
+            conn = None
+
+        if conn is None:
+            return self._connect()
+
+        with self.lock:
+            self.reused += 1
+        return conn
+
+    def _give_back(self, conn: PooledConnection) -> None:
+        conn.messages += 1
+        conn.last_used = time.monotonic()
+
+        with self.lock:
+            keep = not self.closed and conn.messages < self.max_messages
+            if keep:
+                self.idle.append(conn)
+
+        if not keep:
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[smtplib.SMTP]:
+        if not self.slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f'No SMTP connection to {self.host}:{self.port} available')
+
+        with self.lock:
+            self.in_use += 1
+
+        try:
+            conn = self._take()
+            try:
+                yield conn.smtp
+            except Exception as err:
+                if is_broken(err):
+                    conn.smtp.close()
+                else:
+                    self._give_back(conn)
+                raise
+
+            self._give_back(conn)
+        finally:
+            with self.lock:
+                self.in_use -= 1
+            self.slots.release()
+
+    def close(self) -> None:
+        with self.lock:
+            self.closed = True
+            idle, self.idle = list(self.idle), deque()
+
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self) -> SMTPPoolStats:
+        with self.lock:
+            return SMTPPoolStats(
+                idle=len(self.idle),
+                in_use=self.in_use,
+                opened=self.opened,
+                reused=self.reused,
+                replaced=self.replaced,
+            )
@@ -0,0 +1,4 @@
+from .dedup import SQLiteDedupRepository
+from .outbox import OutboxStats, SQLiteOutboxMailRepository
+
+__all__ = ['OutboxStats', 'SQLiteDedupRepository', 'SQLiteOutboxMailRepository']
@@ -0,0 +1,73 @@
+import sqlite3
+import threading
+import time
+
+from repositories import Claim, DedupRepository
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dedup (
+    key TEXT PRIMARY KEY,
+    expires REAL NOT NULL,
+    done INTEGER NOT NULL
+)
+"""
+
+# Takes the key unless an unexpired claim holds it, only one of the processes racing for a key gets a row back
+CLAIM = """
+INSERT INTO dedup (key, expires, done) VALUES (:key, :lease_end, 0)
+ON CONFLICT (key) DO UPDATE SET expires = excluded.expires, done = 0 WHERE dedup.expires <= :now
+RETURNING key
+"""
+
+
+class SQLiteDedupRepository(DedupRepository):
+    # Claims are kept in a table every gunicorn worker of the instance opens, so a redelivery is recognized by whichever
+    # worker gets it. Expired claims are deleted every purge_interval seconds.
+    def __init__(self, path: str, ttl: float = 3600, lease: float = 20, purge_interval: float = 60) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.lease = lease
+        self.purge_interval = purge_interval
+        self.local = threading.local()
+        self.purged_at = time.monotonic()
+
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn: sqlite3.Connection | None = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+
+        return conn
+
+    def _purge(self, now: float) -> None:
+        if time.monotonic() - self.purged_at < self.purge_interval:
+            return
+
+        self.purged_at = time.monotonic()
+        self._conn().execute('DELETE FROM dedup WHERE expires <= ?', (now,))
+
+    def claim(self, key: str) -> Claim:
+        now = time.time()
+        self._purge(now)
+
+        conn = self._conn()
+        if conn.execute(CLAIM, {'key': key, 'lease_end': now + self.lease, 'now': now}).fetchone() is not None:
+            return Claim.CLAIMED
+
+        row = conn.execute('SELECT done FROM dedup WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            # Released by another worker in between, a redelivery will claim it
+            return Claim.IN_FLIGHT
+
+        return Claim.DONE if row[0] else Claim.IN_FLIGHT
+
+    def complete(self, key: str) -> None:
+        self._conn().execute('UPDATE dedup SET expires = ?, done = 1 WHERE key = ?', (time.time() + self.ttl, key))
+
+    def release(self, key: str) -> None:
+        self._conn().execute('DELETE FROM dedup WHERE key = ?', (key,))
@@ -0,0 +1,176 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from repositories import MailRepository
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    locked_until REAL NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+CLAIM = """
+UPDATE outbox SET locked_until = :lease_end, attempts = attempts + 1
+WHERE id = (
+    SELECT id FROM outbox
+    WHERE failed = 0 AND available_at <= :now AND locked_until <= :now
+    ORDER BY id LIMIT 1
+)
+RETURNING id, payload, attempts
+"""
+
+
+@dataclass
+class OutboxStats:
+    depth: int
+    failed: int
+    delivered: int
+    drain_rate: float
+
+
+class SQLiteOutboxMailRepository(MailRepository):
+    def __init__(  # noqa: PLR0913
+        self,
+        delivery: MailRepository,
+        path: str,
+        workers: int = 2,
+        poll_interval: float = 1,
+        lease: float = 60,
+        max_attempts: int = 10,
+        rate_window: float = 60,
+    ) -> None:
+        self.delivery = delivery
+        self.path = path
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.rate_window = rate_window
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.local = threading.local()
+        self.wakeup = threading.Condition()
+        self.stopping = threading.Event()
+
+        self.stats_lock = threading.Lock()
+        self.delivered = 0
+        self.delivered_at: deque[float] = deque()
+
+        conn = self._conn()
+        # WAL keeps enqueues cheap and lets workers of other gunicorn processes read concurrently
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(SCHEMA)
+
+        # Rows claimed by a process that crashed become available again once their lease expires
+        self.workers = [threading.Thread(target=self._work, name=f'outbox-{idx}', daemon=True) for idx in range(workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn: sqlite3.Connection | None = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            # NORMAL is durable across process crashes in WAL mode, only an OS crash may lose the last commits
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+
+        return conn
+
+    def send(
+        self, sender: tuple[str | None, str], receiver: tuple[str | None, str], subject: str, text: str, reply_to: str | None
+    ) -> None:
+        payload = json.dumps({'sender': sender, 'receiver': receiver, 'subject': subject, 'text': text, 'reply_to': reply_to})
+        self._conn().execute('INSERT INTO outbox (payload, available_at) VALUES (?, ?)', (payload, time.time()))
+
+        with self.wakeup:
+            self.wakeup.notify()
+
+    def _claim(self) -> tuple[int, str, int] | None:
+        now = time.time()
+        row: tuple[int, str, int] | None = self._conn().execute(CLAIM, {'now': now, 'lease_end': now + self.lease}).fetchone()
+        return row
+
+    def _deliver(self, row_id: int, payload: str, attempts: int) -> None:
+        mail = json.loads(payload)
+
+        try:
+            self.delivery.send(
+                sender=tuple(mail['sender']),
+                receiver=tuple(mail['receiver']),
+                subject=mail['subject'],
+                text=mail['text'],
+                reply_to=mail['reply_to'],
+            )
+        except Exception:
+            if attempts >= self.max_attempts:
+                self.logger.exception('Giving up on outbox mail %d after %d attempts', row_id, attempts)
+                self._conn().execute('UPDATE outbox SET failed = 1 WHERE id = ?', (row_id,))
+            else:
+                self.logger.exception('Delivery of outbox mail %d failed, attempt %d', row_id, attempts)
+                backoff = min(2**attempts, 300)
+                self._conn().execute(
+                    'UPDATE outbox SET locked_until = 0, available_at = ? WHERE id = ?', (time.time() + backoff, row_id)
+                )
+            return
+
+        self._conn().execute('DELETE FROM outbox WHERE id = ?', (row_id,))
+
+        with self.stats_lock:
+            self.delivered += 1
+            self.delivered_at.append(time.monotonic())
+            self._trim_rate_window()
+
+    def _work(self) -> None:
+        while not self.stopping.is_set():
+            try:
+                row = self._claim()
+            except sqlite3.Error:
+                self.logger.exception('Failed to claim outbox mail')
+                row = None
+
+            if row is None:
+                with self.wakeup:
+                    self.wakeup.wait(self.poll_interval)
+                continue
+
+            try:
+                self._deliver(*row)
+            except sqlite3.Error:
+                # The mail stays claimed and is tried again once its lease expires, it may have been sent already
+                self.logger.exception('Failed to record the delivery of outbox mail %d', row[0])
+
+    def _trim_rate_window(self) -> None:
+        horizon = time.monotonic() - self.rate_window
+        while self.delivered_at and self.delivered_at[0] < horizon:
+            self.delivered_at.popleft()
+
+    def stats(self) -> OutboxStats:
+        depth, failed = self._conn().execute('SELECT COUNT(*) - SUM(failed), SUM(failed) FROM outbox').fetchone()
+
+        with self.stats_lock:
+            self._trim_rate_window()
+
+            return OutboxStats(
+                depth=depth or 0,
+                failed=failed or 0,
+                delivered=self.delivered,
+                drain_rate=len(self.delivered_at) / self.rate_window,
+            )
+
+    def close(self) -> None:
+        self.stopping.set()
+
+        with self.wakeup:
+            self.wakeup.notify_all()
+
+        for worker in self.workers:
+            worker.join()
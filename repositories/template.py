@@ -0,0 +1,6 @@
+class TemplateRepository:
+    def render(self, template: str, language: str, **kwargs: object) -> str:
+        raise NotImplementedError  # pragma: no cover
+
+    def translate(self, table: str, key: str, language: str) -> str:
+        raise NotImplementedError  # pragma: no cover
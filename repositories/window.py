@@ -0,0 +1,69 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Generic, Protocol, TypeVar
+
+
+class Windowed(Protocol):
+    deadline: float
+
+
+Key = TypeVar('Key')
+Entry = TypeVar('Entry', bound=Windowed)
+
+
+class WindowedFlusher(Generic[Key, Entry]):
+    # Keeps entries in pending by key until their deadline, when a single thread takes them out with _pop and hands
+    # them to flush_workers threads to _flush. Subclasses add to pending holding cond, and notify it for a new key so
+    # its deadline is waited for. Everything still pending is flushed on close.
+    def __init__(self, name: str, flush_workers: int) -> None:
+        self.pending: dict[Key, Entry] = {}
+        self.cond = threading.Condition()
+        self.stopping = False
+
+        self.executor = ThreadPoolExecutor(max_workers=flush_workers, thread_name_prefix=name)
+        self.flusher = threading.Thread(target=self._run, name=f'{name}-flusher', daemon=True)
+        self.flusher.start()
+
+    def _pop(self, key: Key) -> Entry:
+        return self.pending.pop(key)
+
+    def _flush(self, key: Key, entry: Entry) -> None:
+        raise NotImplementedError  # pragma: no cover
+
+    def _submit(self, key: Key, entry: Entry) -> None:
+        try:
+            self.executor.submit(self._flush, key, entry)
+        except RuntimeError:
+            # Closing, or the interpreter is shutting down, flush it from this thread instead
+            self._flush(key, entry)
+
+    def _due(self) -> list[tuple[Key, Entry]]:
+        now = time.monotonic()
+        due = [key for key, entry in self.pending.items() if entry.deadline <= now or self.stopping]
+        return [(key, self._pop(key)) for key in due]
+
+    def _run(self) -> None:
+        while True:
+            with self.cond:
+                due = self._due()
+                while not due and not self.stopping:
+                    timeout = min((entry.deadline for entry in self.pending.values()), default=None)
+                    self.cond.wait(None if timeout is None else max(timeout - time.monotonic(), 0))
+                    due = self._due()
+
+                stopping = self.stopping
+
+            for key, entry in due:
+                self._submit(key, entry)
+
+            if stopping:
+                return
+
+    def close(self) -> None:
+        with self.cond:
+            self.stopping = True
+            self.cond.notify()
+
+        self.flusher.join()
+        self.executor.shutdown(wait=True)
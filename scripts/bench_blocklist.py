@@ -0,0 +1,89 @@
+import argparse
+import random
+import re
+import sys
+import timeit
+import uuid
+from collections.abc import Callable
+
+from repositories.memory import MemoryBlocklistRepository
+
+
+def gen_rules(count: int) -> list[str]:
+    # Mostly suppressed addresses, with some blocked tenant domains
+    rules = []
+    for idx in range(count):
+        name = uuid.uuid4().hex[:12]
+        if idx % 10 == 0:
+            rules.append(f'{name}.test')
+        else:
+            rules.append(f'{name}@example.org')
+    return rules
+
+
+def single_regex(rules: list[str]) -> re.Pattern[str]:
+    # The previous code path matched every receiver against one SENDGRID_BLOCKLIST regex
+    alternatives = [re.escape(rule) if '@' in rule else rf'[^@]*@(?:[^@]*\.)?{re.escape(rule)}' for rule in rules]
+    return re.compile(f'^(?:{"|".join(alternatives)})$', re.IGNORECASE)
+
+
+def gen_receivers(rules: list[str], count: int) -> list[str]:
+    # Half of the receivers are blocked, spread over the whole list of rules
+    receivers = []
+    for _ in range(count // 2):
+        rule = random.choice(rules)  # noqa: S311
+        receivers.append(rule if '@' in rule else f'user@mail.{rule}')
+    receivers.extend(f'{uuid.uuid4().hex[:12]}@example.net' for _ in range(count - len(receivers)))
+    random.shuffle(receivers)
+    return receivers
+
+
+def bench(func: Callable[[str], object], receivers: list[str], number: int) -> float:
+    def run() -> None:
+        for receiver in receivers:
+            func(receiver)
+
+    timer = timeit.Timer(run)
+    return min(timer.repeat(repeat=5, number=number)) / (number * len(receivers))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Compare the indexed blocklist against a single regex.')
+    parser.add_argument('--number', type=int, default=5, help='passes over the receivers per timing round')
+    parser.add_argument('--receivers', type=int, default=200, help='receivers looked up per pass')
+    parser.add_argument('--rules', type=int, nargs='+', default=[100, 10000, 50000], help='blocklist sizes to benchmark')
+    parser.add_argument('--min-speedup', type=float, default=0.0, help='exit with an error below this speedup')
+    args = parser.parse_args()
+
+    print(f'{"rules":>8} {"single regex":>14} {"indexed":>10} {"speedup":>9}')
+
+    worst = float('inf')
+    for count in args.rules:
+        rules = gen_rules(count)
+        receivers = gen_receivers(rules, args.receivers)
+
+        pattern = single_regex(rules)
+        index = MemoryBlocklistRepository(rules)
+
+        # Both approaches must agree before their timings mean anything
+        for receiver in receivers:
+            if (pattern.match(receiver) is not None) != index.is_blocked(receiver):
+                print(f'Mismatch for {receiver}')
+                return 1
+
+        legacy = bench(pattern.match, receivers, args.number)
+        indexed = bench(index.is_blocked, receivers, args.number)
+
+        speedup = legacy / indexed
+        worst = min(worst, speedup)
+        print(f'{count:>8} {legacy * 1e6:>12.2f}us {indexed * 1e6:>8.2f}us {speedup:>8.1f}x')
+
+    if worst < args.min_speedup:
+        print(f'Speedup {worst:.1f}x is below the required {args.min_speedup:.1f}x')
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import argparse
+import json
+import random
+import sys
+import timeit
+import uuid
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import marshmallow_dataclass
+
+from blueprints.event import EventBody, event_decoder
+from models import Action, Channel, Plan, Risk, Role
+
+
+def gen_user(role: Role) -> dict[str, Any]:
+    user_id = str(uuid.uuid4())
+    return {'id': user_id, 'name': f'User {user_id[:8]}', 'email': f'{user_id[:8]}@example.org', 'role': role}
+
+
+def gen_event(history_len: int) -> dict[str, Any]:
+    start = datetime.now(UTC) - timedelta(days=7)
+    actions = [Action.CREATED] + [random.choice([Action.AI_RESPONSE, Action.ESCALATED]) for _ in range(history_len - 1)]  # noqa: S311
+
+    return {
+        'id': str(uuid.uuid4()),
+        'name': 'No puedo acceder a mi cuenta',
+        'channel': Channel.WEB,
+        'language': 'es',
+        'reportedBy': gen_user(Role.USER),
+        'createdBy': gen_user(Role.AGENT),
+        'assignedTo': gen_user(Role.AGENT),
+        'history': [
+            {
+                'seq': seq,
+                'date': (start + timedelta(minutes=seq)).isoformat().replace('+00:00', 'Z'),
+                'action': action,
+                'description': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 4,
+            }
+            for seq, action in enumerate(actions)
+        ],
+        'client': {
+            'id': str(uuid.uuid4()),
+            'name': 'Capibaras S.A.',
+            'emailIncidents': 'incidentes@example.org',
+            'plan': Plan.EMPRESARIO,
+        },
+        'risk': Risk.HIGH,
+    }
+
+
+def per_request_schema(payload: dict[str, Any]) -> object:
+    # The previous code path built the schema on every request
+    return marshmallow_dataclass.class_schema(EventBody)().load(payload)
+
+
+def cached_schema() -> Callable[[dict[str, Any]], object]:
+    schema = marshmallow_dataclass.class_schema(EventBody)()
+    return schema.load
+
+
+def bench(func: Callable[[dict[str, Any]], object], payload: dict[str, Any], number: int) -> float:
+    raw = json.dumps(payload)
+    timer = timeit.Timer(lambda: func(json.loads(raw)))
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Compare the event decoder against marshmallow_dataclass.')
+    parser.add_argument('--number', type=int, default=200, help='decodes per timing round')
+    parser.add_argument('--history', type=int, nargs='+', default=[2, 5, 20], help='history lengths to benchmark')
+    parser.add_argument('--min-speedup', type=float, default=0.0, help='exit with an error below this speedup')
+    args = parser.parse_args()
+
+    print(f'{"history":>8} {"per-request schema":>20} {"cached schema":>15} {"decoder":>10} {"speedup":>8}')
+
+    worst = float('inf')
+    for history_len in args.history:
+        payload = gen_event(history_len)
+
+        legacy = bench(per_request_schema, payload, args.number)
+        cached = bench(cached_schema(), payload, args.number)
+        decoder = bench(event_decoder.decode, payload, args.number)
+
+        speedup = legacy / decoder
+        worst = min(worst, speedup)
+        print(f'{history_len:>8} {legacy * 1e6:>18.1f}us {cached * 1e6:>13.1f}us {decoder * 1e6:>8.1f}us {speedup:>7.1f}x')
+
+    if worst < args.min_speedup:
+        print(f'Speedup {worst:.1f}x is below the required {args.min_speedup:.1f}x')
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+import requests
+
+from models import Action
+from scripts.bench_decoder import gen_event
+
+ROOT = Path(__file__).resolve().parents[1]
+
+ENDPOINTS = {
+    'update': '/api/v1/incident-update/notification',
+    'alert': '/api/v1/incident-alert/notification',
+    'risk': '/api/v1/incident-risk-updated/notification',
+}
+
+# Bursty traffic sends the same number of requests as steady traffic, packed into the first 1/BURST_FACTOR of every second
+BURST_FACTOR = 4
+
+
+def gen_payload(endpoint: str, history_len: int) -> dict[str, Any]:
+    event = gen_event(history_len)
+
+    if endpoint == 'update':
+        # Escalations and AI responses take turns, and the last action picks which of the update mails is sent
+        for seq, entry in enumerate(event['history'][1:], start=1):
+            entry['action'] = Action.ESCALATED if seq % 2 else Action.AI_RESPONSE
+        event['history'][-1]['action'] = random.choice([Action.ESCALATED, Action.AI_RESPONSE, Action.CLOSED])  # noqa: S311
+
+    return event
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return int(sock.getsockname()[1])
+
+
+def wait_ready(url: str, process: subprocess.Popen[bytes], timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{process.args!r} exited with {process.returncode}')
+        try:
+            requests.get(url, timeout=1)
+        except requests.RequestException:
+            time.sleep(0.1)
+        else:
+            return
+
+    process.kill()
+    raise RuntimeError(f'{url} did not come up in {timeout}s')
+
+
+def start_stub(args: argparse.Namespace) -> tuple[subprocess.Popen[bytes], str]:
+    port = free_port()
+    command = [sys.executable, '-m', 'scripts.sendgrid_stub', '--port', str(port)]
+    command += ['--latency', str(args.latency), '--error-rate', str(args.error_rate)]
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL)  # noqa: S603
+
+    base_url = f'http://127.0.0.1:{port}'
+    wait_ready(base_url, process)
+    return process, base_url
+
+
+def start_app(args: argparse.Namespace, stub_url: str) -> tuple[subprocess.Popen[bytes], str]:
+    port = free_port()
+    env = os.environ | {'SENDGRID_BASE_URL': stub_url} | dict(item.split('=', 1) for item in args.env)
+    command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}']
+    command += ['--workers', str(args.workers), '--threads', str(args.threads), 'app:create_app()']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)  # noqa: S603
+
+    base_url = f'http://127.0.0.1:{port}'
+    wait_ready(f'{base_url}/api/v1/health/notification', process)
+    return process, base_url
+
+
+def cpu_seconds(pid: int) -> float | None:
+    # Time spent by the gunicorn master and its workers, only available where /proc is
+    proc = Path('/proc')
+    if not proc.exists():
+        return None
+
+    ticks = os.sysconf('SC_CLK_TCK')
+    total = 0.0
+    pids = [pid, *map(int, (proc / str(pid) / 'task' / str(pid) / 'children').read_text().split())]
+    for child in pids:
+        # Fields after the command name, which may contain spaces, utime and stime are the 12th and 13th
+        fields = (proc / str(child) / 'stat').read_text().rpartition(')')[2].split()
+        total += (int(fields[11]) + int(fields[12])) / ticks
+
+    return total
+
+
+def schedule(profile: str, rate: float, duration: float) -> list[float]:
+    count = int(rate * duration)
+    if profile == 'steady':
+        return [idx / rate for idx in range(count)]
+
+    per_second = int(rate)
+    return [idx // per_second + (idx % per_second) / (rate * BURST_FACTOR) for idx in range(count)]
+
+
+def run_load(url: str, payloads: list[dict[str, Any]], offsets: list[float], concurrency: int) -> list[tuple[float, int]]:
+    local = threading.local()
+    results: list[tuple[float, int]] = []
+    lock = threading.Lock()
+
+    def send(payload: dict[str, Any], scheduled: float) -> None:
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+
+        try:
+            status = local.session.post(url, json=payload, timeout=30).status_code
+        except requests.RequestException:
+            status = 0
+
+        # Measured from when the request was due, so time spent queued behind a slow server is not hidden
+        latency = time.perf_counter() - scheduled
+        with lock:
+            results.append((latency, status))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        for payload, offset in zip(payloads, offsets, strict=True):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, payload, start + offset)
+
+    return results
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def run_scenario(  # noqa: PLR0913
+    args: argparse.Namespace, app: subprocess.Popen[bytes], stub_url: str, endpoint: str, url: str, profile: str
+) -> dict[str, Any]:
+    offsets = schedule(profile, args.rate, args.duration)
+    payloads = [gen_payload(endpoint, args.history) for _ in offsets]
+
+    requests.get(f'{stub_url}/stats', timeout=5)
+    cpu_before = cpu_seconds(app.pid)
+    start = time.perf_counter()
+    results = run_load(url, payloads, offsets, args.concurrency)
+    elapsed = time.perf_counter() - start
+    cpu_after = cpu_seconds(app.pid)
+    upstream = requests.get(f'{stub_url}/stats', timeout=5).json()
+
+    latencies = [latency for latency, status in results if status == requests.codes.ok]
+    statuses: dict[str, int] = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    return {
+        'requests': len(results),
+        'errors': len(results) - len(latencies),
+        'statuses': statuses,
+        'throughput': len(latencies) / elapsed,
+        'p50': percentile(latencies, 50) if latencies else None,
+        'p95': percentile(latencies, 95) if latencies else None,
+        'p99': percentile(latencies, 99) if latencies else None,
+        'cpu_per_request': None if cpu_before is None or cpu_after is None else (cpu_after - cpu_before) / len(results),
+        'upstream_in_flight': upstream['max_in_flight'],
+    }
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], max_regression: float) -> list[str]:
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if previous is None:
+            continue
+
+        if current['throughput'] < previous['throughput'] * (1 - max_regression):
+            regressions.append(f'{name}: throughput {previous["throughput"]:.1f} -> {current["throughput"]:.1f} req/s')
+
+        regressions.extend(
+            f'{name}: {key} {previous[key] * 1e3:.2f} -> {current[key] * 1e3:.2f} ms'
+            for key in ('p50', 'p95', 'p99', 'cpu_per_request')
+            if current[key] is not None and previous[key] is not None and current[key] > previous[key] * (1 + max_regression)
+        )
+
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()  # noqa: S603, S607
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Load the service under gunicorn against a local SendGrid stub.')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--rate', type=float, default=50, help='requests per second')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of load per scenario')
+    parser.add_argument('--warmup', type=float, default=2, help='seconds of load before measuring')
+    parser.add_argument('--concurrency', type=int, default=64, help='client connections')
+    parser.add_argument('--latency', type=float, default=0.05, help='latency of the SendGrid stub in seconds')
+    parser.add_argument('--error-rate', type=float, default=0, help='share of SendGrid calls answered with 503')
+    parser.add_argument('--history', type=int, default=5, help='history entries per event')
+    parser.add_argument('--profiles', nargs='+', choices=['steady', 'bursty'], default=['steady', 'bursty'])
+    parser.add_argument('--endpoints', nargs='+', choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument('--env', nargs='*', default=[], metavar='KEY=VALUE', help='extra environment for the service')
+    parser.add_argument('--output', help='where to write the results, .benchmarks/e2e-<commit>.json by default')
+    parser.add_argument('--baseline', help='results of a previous run to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.1, help='tolerated regression against the baseline')
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results: dict[str, Any] = {
+        'commit': commit,
+        'created': datetime.now(UTC).isoformat(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'scenarios': {},
+    }
+
+    stub, stub_url = start_stub(args)
+    processes = [stub]
+    try:
+        app, app_url = start_app(args, stub_url)
+        processes.append(app)
+
+        for endpoint in args.endpoints:
+            url = f'{app_url}{ENDPOINTS[endpoint]}'
+            warmup = schedule('steady', args.rate, args.warmup)
+            run_load(url, [gen_payload(endpoint, args.history) for _ in warmup], warmup, args.concurrency)
+
+            for profile in args.profiles:
+                results['scenarios'][f'{endpoint}/{profile}'] = run_scenario(args, app, stub_url, endpoint, url, profile)
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    print(f'{"scenario":>16} {"req/s":>8} {"p50":>9} {"p95":>9} {"p99":>9} {"cpu/req":>9} {"errors":>7} {"upstream":>8}')
+    for name, scenario in results['scenarios'].items():
+        row = [scenario[key] for key in ('p50', 'p95', 'p99', 'cpu_per_request')]
+        millis = ' '.join('      n/a' if value is None else f'{value * 1e3:>7.2f}ms' for value in row)
+        upstream = scenario['upstream_in_flight']
+        print(f'{name:>16} {scenario["throughput"]:>8.1f} {millis} {scenario["errors"]:>7} {upstream:>8}')
+
+    output = Path(args.output or ROOT / '.benchmarks' / f'e2e-{commit[:12]}.json')
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + '\n')
+    print(f'Results written to {output}')
+
+    if args.baseline is not None:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(results, baseline, args.max_regression)
+        for regression in regressions:
+            print(f'Regression against {baseline["commit"][:12]}: {regression}')
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
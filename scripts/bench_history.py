@@ -0,0 +1,70 @@
+import argparse
+import json
+import sys
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from blueprints.decoder import Decoder
+from blueprints.event import EventBody, event_decoder
+from scripts.bench_decoder import gen_event
+
+
+def handle(decode: Callable[[Any], EventBody], raw: str) -> object:
+    # Reads the entries the handlers use: the first one and the last three
+    event = decode(json.loads(raw))
+    return event.history[0].date, [entry.action for entry in event.history[-3:]]
+
+
+def bench(decode: Callable[[Any], EventBody], raw: str, number: int) -> float:
+    timer = timeit.Timer(lambda: handle(decode, raw))
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def peak_memory(decode: Callable[[Any], EventBody], raw: str) -> int:
+    tracemalloc.start()
+    try:
+        handle(decode, raw)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Compare eager and lazy decoding of events with long histories.')
+    parser.add_argument('--history', type=int, nargs='+', default=[10, 1000, 100000], help='history lengths to benchmark')
+    parser.add_argument('--budget', type=float, default=0.2, help='seconds of decoding per timing round')
+    parser.add_argument('--min-speedup', type=float, default=0.0, help='exit with an error below this speedup')
+    args = parser.parse_args()
+
+    eager = Decoder(EventBody).decode
+
+    print(f'{"history":>8} {"body":>9} {"eager":>11} {"lazy":>11} {"speedup":>8} {"eager peak":>11} {"lazy peak":>11}')
+
+    worst = float('inf')
+    for history_len in args.history:
+        raw = json.dumps(gen_event(history_len))
+        number = max(int(args.budget / bench(eager, raw, 1)), 1)
+
+        eager_time = bench(eager, raw, number)
+        lazy_time = bench(event_decoder.decode, raw, number)
+        eager_peak = peak_memory(eager, raw)
+        lazy_peak = peak_memory(event_decoder.decode, raw)
+
+        speedup = eager_time / lazy_time
+        worst = min(worst, speedup)
+        print(
+            f'{history_len:>8} {len(raw) / 1024:>7.0f}KB {eager_time * 1e3:>9.3f}ms {lazy_time * 1e3:>9.3f}ms '
+            f'{speedup:>7.1f}x {eager_peak / 1024:>9.0f}KB {lazy_peak / 1024:>9.0f}KB'
+        )
+
+    if worst < args.min_speedup:
+        print(f'Speedup {worst:.1f}x is below the required {args.min_speedup:.1f}x')
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
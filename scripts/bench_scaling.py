@@ -0,0 +1,102 @@
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from tempfile import TemporaryDirectory
+
+import requests
+
+from scripts.bench_e2e import ENDPOINTS, ROOT, free_port, gen_payload, start_stub, wait_ready
+
+
+def start_app(workers: int, threads: int, stub_url: str, metrics_dir: str) -> tuple[subprocess.Popen[bytes], str]:
+    # Sized through the environment like in production, so gunicorn.conf.py decides on preloading
+    port = free_port()
+    env = os.environ | {
+        'SENDGRID_BASE_URL': stub_url,
+        'WEB_CONCURRENCY': str(workers),
+        'GUNICORN_THREADS': str(threads),
+        'METRICS_DIR': metrics_dir,
+        'METRICS_FLUSH_INTERVAL': '0.2',
+    }
+    command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)  # noqa: S603
+
+    base_url = f'http://127.0.0.1:{port}'
+    wait_ready(f'{base_url}/api/v1/health/notification', process)
+    return process, base_url
+
+
+def saturate(url: str, history_len: int, clients: int, duration: float) -> int:
+    # Closed loop, every client sends its next request as soon as the previous one is answered
+    payloads = [gen_payload('alert', history_len) for _ in range(100)]
+    deadline = time.monotonic() + duration
+    counts = [0] * clients
+
+    def client(idx: int) -> None:
+        with requests.Session() as session:
+            while time.monotonic() < deadline:
+                resp = session.post(url, json=payloads[counts[idx] % len(payloads)], timeout=30)
+                if resp.status_code == requests.codes.ok:
+                    counts[idx] += 1
+
+    threads = [threading.Thread(target=client, args=(idx,)) for idx in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return sum(counts)
+
+
+def scraped_sends(base_url: str) -> float:
+    text = requests.get(f'{base_url}/metrics', timeout=5).text
+    return sum(float(line.rpartition(' ')[2]) for line in text.splitlines() if line.startswith('notification_sends_total{'))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Measure how the throughput of the service scales with gunicorn workers.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='worker counts to benchmark')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--clients', type=int, default=32, help='concurrent client connections')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of load per worker count')
+    parser.add_argument('--history', type=int, default=50, help='history entries per event, more makes requests CPU bound')
+    parser.add_argument('--latency', type=float, default=0.005, help='latency of the SendGrid stub in seconds')
+    args = parser.parse_args()
+
+    print(f'{len(os.sched_getaffinity(0))} cores available')
+    print(f'{"workers":>8} {"req/s":>9} {"scaling":>8} {"handled":>8} {"scraped":>8}')
+
+    stub, stub_url = start_stub(argparse.Namespace(latency=args.latency, error_rate=0))
+    try:
+        baseline = None
+        for workers in args.workers:
+            with TemporaryDirectory() as metrics_dir:
+                app, base_url = start_app(workers, args.threads, stub_url, metrics_dir)
+                try:
+                    url = f'{base_url}{ENDPOINTS["alert"]}'
+                    warm = saturate(url, args.history, args.clients, 1)
+                    start = time.perf_counter()
+                    sent = saturate(url, args.history, args.clients, args.duration)
+                    throughput = sent / (time.perf_counter() - start)
+
+                    # Once every worker flushed its counts, any of them answers /metrics with the total of all
+                    time.sleep(1)
+                    scraped = scraped_sends(base_url)
+                finally:
+                    app.terminate()
+                    app.wait()
+
+            baseline = baseline or throughput
+            print(f'{workers:>8} {throughput:>9.1f} {throughput / baseline:>7.2f}x {warm + sent:>8} {scraped:>8.0f}')
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
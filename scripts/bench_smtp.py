@@ -0,0 +1,70 @@
+import argparse
+import ssl
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from repositories.smtp import SMTPConnectionPool, SMTPMailRepository
+from scripts.smtp_stub import SMTPStub, generate_certificate
+
+
+def bench(repo: SMTPMailRepository, messages: int, threads: int) -> float:
+    def send(idx: int) -> None:
+        repo.send(('Soporte', 'soporte@example.org'), (None, f'agent{idx}@example.org'), 'Incidente', 'Texto ' * 50, None)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        start = time.perf_counter()
+        list(executor.map(send, range(messages)))
+        return messages / (time.perf_counter() - start)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Compare pooled SMTP connections against connecting for every message.')
+    parser.add_argument('--messages', type=int, default=500, help='messages per run')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent senders, also the size of the pool')
+    parser.add_argument('--latency', type=float, default=0.002, help='seconds the relay waits before every reply')
+    parser.add_argument('--no-tls', dest='tls', action='store_false', help='skip STARTTLS and AUTH')
+    parser.add_argument('--min-speedup', type=float, default=0.0, help='exit with an error below this speedup')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        certificate = generate_certificate(Path(directory)) if args.tls else None
+        credentials = ('bench', 'secret') if args.tls else None
+        stub = SMTPStub(latency=args.latency, credentials=credentials, certificate=certificate, record=False).start()
+
+        context = ssl.create_default_context(cafile=certificate[0]) if certificate is not None else None
+        username, password = credentials or (None, None)
+
+        results = {}
+        try:
+            # A pool that retires connections after a single message connects for every one of them
+            for name, max_messages in (('per message', 1), ('pooled', 100)):
+                pool = SMTPConnectionPool(
+                    *stub.address,
+                    username=username,
+                    password=password,
+                    starttls=args.tls,
+                    size=args.threads,
+                    max_messages=max_messages,
+                    ssl_context=context,
+                )
+                connections = stub.connections
+                results[name] = bench(SMTPMailRepository(pool), args.messages, args.threads)
+                pool.close()
+                print(f'{name:>12} {results[name]:>8.1f} msg/s {stub.connections - connections:>6} connections')
+        finally:
+            stub.close()
+
+    speedup = results['pooled'] / results['per message']
+    print(f'Pooled connections are {speedup:.1f}x faster')
+    if speedup < args.min_speedup:
+        print(f'Speedup {speedup:.1f}x is below the required {args.min_speedup:.1f}x')
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+from scripts.bench_e2e import ENDPOINTS, ROOT, free_port, gen_payload, start_stub
+
+
+def import_seconds() -> float:
+    # A fresh interpreter each time, so nothing is already imported
+    code = 'import time; start = time.perf_counter(); import app; print(time.perf_counter() - start)'
+    return float(subprocess.check_output([sys.executable, '-c', code], cwd=ROOT, text=True))  # noqa: S603
+
+
+def first_request_seconds(args: argparse.Namespace, stub_url: str, timeout: float = 60) -> float:
+    port = free_port()
+    env = os.environ | {'SENDGRID_BASE_URL': stub_url} | dict(item.split('=', 1) for item in args.env)
+    command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', *args.gunicorn_args, 'app:create_app()']
+    url = f'http://127.0.0.1:{port}{ENDPOINTS["alert"]}'
+    payload = gen_payload('alert', 1)
+
+    # Measured like a cold start on Cloud Run, from spawning the server until a mail was sent for an event
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)  # noqa: S603
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f'{process.args!r} exited with {process.returncode}')
+            try:
+                if requests.post(url, json=payload, timeout=5).status_code == requests.codes.ok:
+                    return time.perf_counter() - start
+            except requests.RequestException:
+                pass
+            time.sleep(0.005)
+
+        raise RuntimeError(f'No successful request in {timeout}s')
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Measure the time from starting the service to its first successful request.')
+    parser.add_argument('--runs', type=int, default=5, help='cold starts to measure')
+    parser.add_argument('--budget', type=float, default=2.0, help='seconds a start may take, 0 to not check')
+    parser.add_argument('--env', nargs='*', default=['FAST_START=1'], metavar='KEY=VALUE', help='environment for the service')
+    parser.add_argument('--gunicorn-args', nargs='*', default=['--workers', '1', '--threads', '8'], help='gunicorn options')
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub(argparse.Namespace(latency=0, error_rate=0))
+    try:
+        imports = [import_seconds() for _ in range(args.runs)]
+        starts = [first_request_seconds(args, stub_url) for _ in range(args.runs)]
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    print(f'{"":>15} {"median":>9} {"max":>9}')
+    for name, values in (('import app', imports), ('first request', starts)):
+        print(f'{name:>15} {statistics.median(values) * 1e3:>7.0f}ms {max(values) * 1e3:>7.0f}ms')
+
+    if args.budget and max(starts) > args.budget:
+        print(f'Slowest start took {max(starts):.2f}s, over the budget of {args.budget:.2f}s')
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
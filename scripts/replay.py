@@ -0,0 +1,288 @@
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+
+from app import load_config
+from blueprints.event import AlertEvent, EventView, UpdateEvent, UpdateRiskEvent, decode_event, event_key
+from containers import Container
+from repositories import MailRepository
+from repositories.memory import MemoryDedupRepository
+from repositories.rest import RateLimiter
+
+ROUTES: dict[str, tuple[str, type[EventView]]] = {
+    'update': ('/api/v1/incident-update/notification', UpdateEvent),
+    'alert': ('/api/v1/incident-alert/notification', UpdateRiskEvent),
+    'risk': ('/api/v1/incident-risk-updated/notification', AlertEvent),
+}
+
+logger = logging.getLogger('replay')
+
+
+class ReplayMailRepository(MailRepository):
+    # Counts the mails of every thread, and hands them to the delivery unless it is a dry run
+    def __init__(self, delivery: MailRepository | None) -> None:
+        self.delivery = delivery
+        self.local = threading.local()
+
+    def sent(self) -> int:
+        return getattr(self.local, 'sent', 0)
+
+    def send(
+        self, sender: tuple[str | None, str], receiver: tuple[str | None, str], subject: str, text: str, reply_to: str | None
+    ) -> None:
+        if self.delivery is not None:
+            self.delivery.send(sender, receiver, subject, text, reply_to)
+        self.local.sent = self.sent() + 1
+
+
+@dataclass
+class Worker:
+    container: Container
+    mail_repo: ReplayMailRepository
+    handlers: dict[str, EventView]
+
+
+# Set up once in every process of the pool
+_worker: Worker | None = None
+
+
+def init_worker(*, dry_run: bool) -> None:
+    global _worker  # noqa: PLW0603
+
+    container = Container()
+    load_config(container.config)
+
+    # Every event is mailed on its own, digest and coalescing windows mean nothing at the pace of a replay, and neither
+    # do flood limits, a backlog of events for the same receiver is not a flood
+    container.config.digest.mode.override('disabled')
+    container.config.coalesce.window.override(0)
+    container.config.flood.limits.override({})
+
+    if dry_run:
+        # Only render, and remember nothing as sent
+        container.dedup_repo.override(MemoryDedupRepository())
+        mail_repo = ReplayMailRepository(None)
+    else:
+        mail_repo = ReplayMailRepository(container.mail_repo())
+
+    container.mail_repo.override(mail_repo)
+    _worker = Worker(container, mail_repo, {name: handler() for name, (_, handler) in ROUTES.items()})
+
+
+def replay_event(name: str, line: bytes) -> int:
+    if _worker is None:
+        raise RuntimeError('Replay worker is not initialized')
+
+    route, _ = ROUTES[name]
+    data = decode_event(json.loads(line), route)
+
+    # Keyed like a bulk request of the same event, so events a replay already mailed are skipped while the dedup state
+    # lasts. Pushes are keyed by their Pub/Sub message id, events the service already mailed are sent again.
+    before = _worker.mail_repo.sent()
+    _worker.handlers[name].notify(data, event_key(route, data))
+    return _worker.mail_repo.sent() - before
+
+
+def read_checkpoint(path: Path, dump: Path) -> tuple[int, set[int]]:
+    try:
+        checkpoint = json.loads(path.read_text())
+    except FileNotFoundError:
+        return 0, set()
+
+    if checkpoint['dump'] != str(dump.resolve()):
+        raise ValueError(f'Checkpoint {path} belongs to {checkpoint["dump"]}')
+
+    return int(checkpoint['line']), {int(line) for line in checkpoint.get('finished', [])}
+
+
+def write_checkpoint(path: Path, dump: Path, line: int, finished: set[int] | None = None) -> None:
+    # Replaced in one step, an interrupted write leaves the previous checkpoint
+    temp = path.with_name(f'{path.name}.tmp')
+    temp.write_text(json.dumps({'dump': str(dump.resolve()), 'line': line, 'finished': sorted(finished or ())}))
+    temp.replace(path)
+
+
+@dataclass
+class ReplayStats:
+    events: int
+    mails: int
+    failed: int
+    skipped: int
+    elapsed: float
+
+
+class Progress:
+    # Events finish out of order, the checkpoint is the last line before which every event has finished, along with the
+    # lines after it that have finished too, so neither is replayed again on resume. Events that finished after the last
+    # save are, unless the dedup state is shared with the previous run, like with DEDUP_BACKEND=file.
+    def __init__(  # noqa: PLR0913
+        self, dump: Path, checkpoint: Path | None, failed: Path | None, start: int, finished: set[int], every: int
+    ) -> None:
+        self.dump = dump
+        self.checkpoint = checkpoint
+        self.failed_file = None if failed is None else failed.open('ab')
+        self.every = every
+
+        self.lock = threading.Lock()
+        self.line = start
+        self.finished = set(finished)
+        self.events = 0
+        self.mails = 0
+        self.failed = 0
+
+    def finish(self, line: int, raw: bytes, future: Future[int]) -> None:
+        if future.cancelled():
+            return
+
+        err = future.exception()
+        with self.lock:
+            self.events += 1
+            if err is None:
+                self.mails += future.result()
+            else:
+                self.failed += 1
+                logger.error('Failed to replay line %d: %s', line, err)
+                if self.failed_file is not None:
+                    self.failed_file.write(raw.rstrip(b'\n') + b'\n')
+
+            self.skip(line)
+            if self.events % self.every == 0:
+                self.save()
+
+    def skip(self, line: int) -> None:
+        self.finished.add(line)
+        while self.line + 1 in self.finished:
+            self.line += 1
+            self.finished.remove(self.line)
+
+    def save(self) -> None:
+        if self.checkpoint is not None:
+            write_checkpoint(self.checkpoint, self.dump, self.line, self.finished)
+        if self.failed_file is not None:
+            self.failed_file.flush()
+
+    def close(self) -> None:
+        with self.lock:
+            self.save()
+            if self.failed_file is not None:
+                self.failed_file.close()
+
+
+def create_executor(workers: int, *, processes: bool, dry_run: bool) -> Executor:
+    if processes:
+        return ProcessPoolExecutor(max_workers=workers, initializer=partial(init_worker, dry_run=dry_run))
+
+    # Threads share a single container, like the threads of a gunicorn worker
+    init_worker(dry_run=dry_run)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='replay')
+
+
+def replay(  # noqa: PLR0913
+    dump: Path,
+    name: str,
+    *,
+    workers: int = 8,
+    processes: bool = False,
+    rate: float = 50,
+    checkpoint: Path | None = None,
+    checkpoint_every: int = 100,
+    failed: Path | None = None,
+    dry_run: bool = False,
+) -> ReplayStats:
+    start_line, finished = (0, set()) if checkpoint is None else read_checkpoint(checkpoint, dump)
+    progress = Progress(dump, checkpoint, failed, start_line, finished, checkpoint_every)
+    limiter = RateLimiter(max_rate=rate, burst=1, max_wait=math.inf)
+
+    # Stop reading the dump while every worker is busy, so only a bounded number of events is held in memory
+    slots = threading.BoundedSemaphore(2 * workers)
+
+    def finish(line: int, raw: bytes, future: Future[int]) -> None:
+        try:
+            progress.finish(line, raw, future)
+        finally:
+            slots.release()
+
+    start = time.perf_counter()
+    executor = create_executor(workers, processes=processes, dry_run=dry_run)
+    try:
+        with dump.open('rb') as stream:
+            for line, raw in enumerate(stream, 1):
+                if line <= start_line or line in finished:
+                    continue
+                if not raw.strip():
+                    with progress.lock:
+                        progress.skip(line)
+                    continue
+
+                limiter.acquire()
+                slots.acquire()
+                executor.submit(replay_event, name, raw).add_done_callback(partial(finish, line, raw))
+    except BaseException:
+        # On an interrupt the events already being replayed finish, the ones waiting in the pool are dropped
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    finally:
+        executor.shutdown(wait=True)
+        progress.close()
+
+    return ReplayStats(
+        events=progress.events,
+        mails=progress.mails,
+        failed=progress.failed,
+        skipped=start_line + len(finished),
+        elapsed=time.perf_counter() - start,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Send the notifications of a JSONL dump of incident events again.')
+    parser.add_argument('dump', type=Path, help='JSONL file with an event per line')
+    parser.add_argument('--route', choices=ROUTES, required=True, help='endpoint the events were pushed to')
+    parser.add_argument('--workers', type=int, default=8, help='threads or processes replaying events')
+    parser.add_argument('--processes', action='store_true', help='replay in a pool of processes instead of threads')
+    parser.add_argument('--rate', type=float, default=50, help='events per second, across every worker')
+    parser.add_argument('--checkpoint', type=Path, help='file to resume from, defaults to the dump with .checkpoint')
+    parser.add_argument('--checkpoint-every', type=int, default=100, help='events between checkpoints')
+    parser.add_argument('--failed', type=Path, help='append the events that failed to this file, to replay them later')
+    parser.add_argument('--dry-run', action='store_true', help='render the mails without sending them')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'WARNING'))
+
+    # A dry run sends nothing, so there is nothing to resume
+    checkpoint = None if args.dry_run else args.checkpoint or args.dump.with_name(f'{args.dump.name}.checkpoint')
+
+    try:
+        stats = replay(
+            args.dump,
+            args.route,
+            workers=args.workers,
+            processes=args.processes,
+            rate=args.rate,
+            checkpoint=checkpoint,
+            checkpoint_every=args.checkpoint_every,
+            failed=args.failed,
+            dry_run=args.dry_run,
+        )
+    except KeyboardInterrupt:
+        print(f'Interrupted, resume from {checkpoint}' if checkpoint is not None else 'Interrupted')
+        return 130
+
+    mails = 'rendered' if args.dry_run else 'sent'
+    print(f'{stats.events} events replayed, {stats.skipped} lines skipped from the checkpoint, {stats.failed} failed')
+    print(f'{stats.mails} mails {mails} in {stats.elapsed:.1f}s')
+    print(f'{stats.events / stats.elapsed:.1f} events/s {stats.mails / stats.elapsed:.1f} mails {mails}/s')
+    return 1 if stats.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+
+class StubServer(ThreadingHTTPServer):
+    # Many clients connect at once, the default backlog of 5 would make them wait in line
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class SendgridStub:
+    # Accepts mails like the SendGrid send endpoint, after an optional latency, and keeps track of what it received.
+    # A share of error_rate requests is answered with 503 instead of status.
+    def __init__(  # noqa: PLR0913
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: float = 0,
+        status: int = 202,
+        error_rate: float = 0,
+        record: bool = True,  # noqa: FBT001, FBT002
+    ) -> None:
+        self.latency = latency
+        self.status = status
+        self.error_rate = error_rate
+        self.record = record
+        self.received = 0
+        self.lock = threading.Lock()
+        self.requests: list[tuple[dict[str, str], Any]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self) -> None:  # noqa: N802
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                status = stub.handle(dict(self.headers), body)
+
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_GET(self) -> None:  # noqa: N802
+                body = json.dumps(stub.stats()).encode()
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002, ANN401
+                pass
+
+        self.server = StubServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), name='sendgrid-stub', daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host!s}:{port}'
+
+    def handle(self, headers: dict[str, str], body: Any) -> int:  # noqa: ANN401
+        with self.lock:
+            if self.record:
+                self.requests.append((headers, body))
+            self.received += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        time.sleep(self.latency)
+
+        with self.lock:
+            self.in_flight -= 1
+
+        return 503 if random.random() < self.error_rate else self.status  # noqa: S311
+
+    def stats(self) -> dict[str, int]:
+        # The highest number of requests in flight since the last call, so a load generator can read it per run
+        with self.lock:
+            stats = {'received': self.received, 'max_in_flight': self.max_in_flight}
+            self.max_in_flight = self.in_flight
+        return stats
+
+    def start(self) -> 'SendgridStub':
+        self.thread.start()
+        return self
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Serve a local stand-in for the SendGrid send endpoint.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds to wait before answering')
+    parser.add_argument('--status', type=int, default=202, help='status code to answer with')
+    parser.add_argument('--error-rate', type=float, default=0, help='share of requests answered with 503')
+    args = parser.parse_args()
+
+    stub = SendgridStub(args.host, args.port, args.latency, args.status, args.error_rate, record=False)
+    print(f'Listening on {stub.base_url}', flush=True)
+    stub.server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
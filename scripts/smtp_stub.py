@@ -0,0 +1,216 @@
+import argparse
+import base64
+import contextlib
+import shutil
+import socket
+import socketserver
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+def generate_certificate(directory: Path) -> tuple[Path, Path]:
+    # Self-signed for 127.0.0.1, clients trust it by loading the certificate as their CA
+    cert, key = directory / 'cert.pem', directory / 'key.pem'
+    openssl = shutil.which('openssl')
+    if openssl is None:
+        raise RuntimeError('openssl is needed to generate a certificate')
+
+    command = [openssl, 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=localhost']
+    command += ['-addext', 'subjectAltName=IP:127.0.0.1,DNS:localhost', '-keyout', str(key), '-out', str(cert)]
+    subprocess.run(command, check=True, capture_output=True)  # noqa: S603
+    return cert, key
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    server: 'StubServer'
+
+    def setup(self) -> None:
+        super().setup()
+        self.stub = self.server.stub
+        self.tls = False
+        self.authenticated = self.stub.credentials is None
+        self.sender = ''
+        self.recipients: list[str] = []
+        self.stub.opened(self.connection)
+
+    def finish(self) -> None:
+        self.stub.closed(self.connection)
+        with contextlib.suppress(OSError):
+            super().finish()
+
+    def reply(self, *lines: str) -> None:
+        time.sleep(self.stub.latency)
+        # Every line but the last continues the reply, like 250-STARTTLS
+        text = ''.join(f'{line[:3]}{"-" if idx < len(lines) - 1 else " "}{line[4:]}\r\n' for idx, line in enumerate(lines))
+        self.wfile.write(text.encode())
+        self.wfile.flush()
+
+    def start_tls(self, context: ssl.SSLContext) -> None:
+        self.reply('220 Ready to start TLS')
+        # Wrapping detaches the plain socket, from then on the TLS one is the one to shut down
+        self.stub.closed(self.connection)
+        self.connection = context.wrap_socket(self.connection, server_side=True)
+        self.stub.opened(self.connection)
+        self.rfile = self.connection.makefile('rb')
+        self.wfile = self.connection.makefile('wb')
+        self.tls = True
+
+    def read_data(self) -> bytes:
+        lines = []
+        while (line := self.rfile.readline()) not in (b'.\r\n', b''):
+            lines.append(line[1:] if line.startswith(b'.') else line)
+        return b''.join(lines)
+
+    def ehlo(self) -> None:
+        extensions = ['250 stub', '250 8BITMIME']
+        if self.stub.context is not None and not self.tls:
+            extensions.append('250 STARTTLS')
+        if self.stub.credentials is not None:
+            extensions.append('250 AUTH PLAIN')
+        self.reply(*extensions)
+
+    def auth(self, arg: str) -> None:
+        _, user, password = base64.b64decode(arg.partition(' ')[2]).decode().split('\0')
+        self.authenticated = (user, password) == self.stub.credentials
+        self.reply('235 Authenticated' if self.authenticated else '535 Authentication failed')
+
+    def transaction(self, command: str, arg: str) -> None:
+        if not self.authenticated:
+            self.reply('530 Authentication required')
+        elif command == 'MAIL':
+            self.sender, self.recipients = arg.partition(':')[2].strip('<>'), []
+            self.reply('250 OK')
+        elif command == 'RCPT':
+            self.recipients.append(arg.partition(':')[2].strip('<>'))
+            self.reply('250 OK')
+        else:
+            self.reply('354 End data with <CR><LF>.<CR><LF>')
+            self.stub.handle(self.sender, self.recipients, self.read_data())
+            self.reply('250 OK')
+
+    def handle(self) -> None:
+        self.reply('220 stub ESMTP')
+
+        while line := self.rfile.readline():
+            command, _, arg = line.decode().rstrip('\r\n').partition(' ')
+            command = command.upper()
+
+            if command in ('EHLO', 'HELO'):
+                self.ehlo()
+            elif command == 'STARTTLS' and self.stub.context is not None and not self.tls:
+                self.start_tls(self.stub.context)
+            elif command == 'AUTH' and self.stub.credentials is not None:
+                self.auth(arg)
+            elif command in ('MAIL', 'RCPT', 'DATA'):
+                self.transaction(command, arg)
+            elif command in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class StubServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+    def __init__(self, address: tuple[str, int], stub: 'SMTPStub') -> None:
+        self.stub = stub
+        super().__init__(address, SMTPHandler)
+
+
+class SMTPStub:
+    # Accepts mails like an SMTP relay, with STARTTLS when given a certificate and AUTH PLAIN when given credentials.
+    # Every reply is delayed by latency, standing in for the round trip to a remote relay.
+    def __init__(  # noqa: PLR0913
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: float = 0,
+        credentials: tuple[str, str] | None = None,
+        certificate: tuple[Path, Path] | None = None,
+        record: bool = True,  # noqa: FBT001, FBT002
+    ) -> None:
+        self.latency = latency
+        self.credentials = credentials
+        self.record = record
+        self.lock = threading.Lock()
+        self.messages: list[tuple[str, list[str], bytes]] = []
+        self.received = 0
+        self.connections = 0
+        self.sockets: set[socket.socket] = set()
+
+        self.context: ssl.SSLContext | None = None
+        if certificate is not None:
+            self.context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            self.context.load_cert_chain(*certificate)
+
+        self.server = StubServer((host, port), self)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), name='smtp-stub', daemon=True)
+
+    @property
+    def address(self) -> tuple[str, int]:
+        host, port = self.server.server_address[:2]
+        return str(host), int(port)
+
+    def opened(self, sock: socket.socket) -> None:
+        with self.lock:
+            if not isinstance(sock, ssl.SSLSocket):
+                self.connections += 1
+            self.sockets.add(sock)
+
+    def closed(self, sock: socket.socket) -> None:
+        with self.lock:
+            self.sockets.discard(sock)
+
+    def handle(self, sender: str, recipients: list[str], data: bytes) -> None:
+        with self.lock:
+            if self.record:
+                self.messages.append((sender, recipients, data))
+            self.received += 1
+
+    def drop_connections(self) -> None:
+        # Like a relay closing idle connections, clients only find out on their next command
+        with self.lock:
+            sockets = list(self.sockets)
+        for sock in sockets:
+            with contextlib.suppress(OSError):
+                sock.shutdown(socket.SHUT_RDWR)
+
+    def start(self) -> 'SMTPStub':
+        self.thread.start()
+        return self
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.drop_connections()
+        self.server.server_close()
+        self.thread.join()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Serve a local stand-in for an SMTP relay.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2525)
+    parser.add_argument('--latency', type=float, default=0.001, help='seconds to wait before every reply')
+    parser.add_argument('--credentials', nargs=2, metavar=('USERNAME', 'PASSWORD'), help='require AUTH PLAIN')
+    parser.add_argument('--starttls', action='store_true', help='offer STARTTLS with a self-signed certificate')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        certificate = generate_certificate(Path(directory)) if args.starttls else None
+        credentials = None if args.credentials is None else tuple(args.credentials)
+        stub = SMTPStub(args.host, args.port, args.latency, credentials, certificate, record=False)
+        print(f'Listening on {args.host}:{stub.address[1]}', flush=True)
+        stub.server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
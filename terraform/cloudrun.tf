@@ -32,6 +32,12 @@ resource "google_cloud_run_v2_service" "default" {
         value = "1"
       }
 
+      # Load the cloud logging and trace clients in the background, and warm up before the first request
+      env {
+        name = "FAST_START"
+        value = "1"
+      }
+
       env {
         name = "USE_CLOUD_TOKEN_PROVIDER"
         value = "1"
@@ -0,0 +1,106 @@
+import threading
+import time
+
+from unittest_parametrize import ParametrizedTestCase, parametrize
+
+from admission import AdmissionController, OverloadedError, parse_request_start
+from metrics import ADMISSIONS
+
+
+class TestAdmissionController(ParametrizedTestCase):
+    def hold(self, controller: AdmissionController, count: int) -> threading.Event:
+        # Keeps count requests in flight until the returned event is set
+        release = threading.Event()
+        admitted = threading.Barrier(count + 1)
+
+        def run() -> None:
+            with controller.admit(20):
+                admitted.wait()
+                release.wait(5)
+
+        threads = [threading.Thread(target=run) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        admitted.wait()
+
+        def join() -> None:
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        self.addCleanup(join)
+        return release
+
+    def test_latency(self) -> None:
+        controller = AdmissionController(alpha=0.5)
+
+        with controller.admit(20):
+            time.sleep(0.02)
+        with controller.admit(20):
+            pass
+
+        stats = controller.stats()
+        self.assertEqual((stats.in_flight, stats.admitted), (0, 2))
+        self.assertAlmostEqual(stats.latency, 0.01, delta=0.01)
+
+    def test_deadline(self) -> None:
+        controller = AdmissionController(headroom=0.5)
+        controller.latency = 4
+        deadline = ADMISSIONS.labels('deadline').value()
+        self.hold(controller, 1)
+
+        # A push that waited 1s for a thread is answered a latency later, one that waited 2s would be too late
+        self.assertEqual(controller.predict(1), 5)
+        with controller.admit(10, 1), self.assertRaises(OverloadedError) as ctx, controller.admit(10, 2):
+            pass  # pragma: no cover
+
+        self.assertEqual((ctx.exception.status, ctx.exception.retry_after), (503, 1))
+        self.assertEqual(controller.stats().deadline, 1)
+        self.assertEqual(ADMISSIONS.labels('deadline').value(), deadline + 1)
+
+    def test_idle_always_admitted(self) -> None:
+        controller = AdmissionController()
+        controller.latency = 60
+
+        with controller.admit(20):
+            pass
+
+        self.assertEqual(controller.stats().deadline, 0)
+
+    def test_idle_queued_past_deadline(self) -> None:
+        controller = AdmissionController()
+
+        with self.assertRaises(OverloadedError), controller.admit(20, 17):
+            pass  # pragma: no cover
+
+        self.assertEqual(controller.stats().queued, 17)
+
+    def test_busy_without_queue_time(self) -> None:
+        controller = AdmissionController(max_in_flight=2)
+        controller.latency = 3
+        self.hold(controller, 1)
+
+        with controller.admit(20), self.assertRaises(OverloadedError) as ctx, controller.admit(20):
+            pass  # pragma: no cover
+
+        # A known queue time is judged by the deadline alone
+        with controller.admit(20), controller.admit(20, 0):
+            pass
+
+        self.assertEqual((ctx.exception.status, ctx.exception.retry_after), (503, 3))
+        self.assertEqual(controller.stats().busy, 1)
+
+    @parametrize(
+        ('value', 'queued'),
+        [
+            ('t=1700000000.5', 1.5),
+            ('1700000000500', 1.5),
+            ('1700000000500000', 1.5),
+            ('t=1700000004', 0),
+            ('', None),
+            (None, None),
+            ('t=soon', None),
+        ],
+    )
+    def test_parse_request_start(self, value: str | None, queued: float | None) -> None:
+        self.assertEqual(parse_request_start(value, 1700000002), queued)
@@ -0,0 +1,233 @@
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from typing import Any, cast
+
+import marshmallow_dataclass
+from faker import Faker
+from unittest_parametrize import ParametrizedTestCase, parametrize
+
+from blueprints.decoder import LAZY_MIN_ENTRIES, DecodeError, Decoder, LazyList
+from blueprints.event import EventBody, event_decoder
+from models import Action, Channel, Plan, Risk, Role
+
+
+class TestDecoder(ParametrizedTestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+
+    def gen_user(self, role: Role) -> dict[str, Any]:
+        return {
+            'id': cast(str, self.faker.uuid4()),
+            'name': self.faker.name(),
+            'email': self.faker.email(),
+            'role': role,
+        }
+
+    def gen_event(self) -> dict[str, Any]:
+        return {
+            'id': cast(str, self.faker.uuid4()),
+            'name': self.faker.sentence(3),
+            'channel': self.faker.random_element(list(Channel)),
+            'language': self.faker.random_element(['es', 'pt']),
+            'reportedBy': self.gen_user(Role.USER),
+            'createdBy': self.gen_user(Role.USER),
+            'assignedTo': self.gen_user(Role.AGENT),
+            'history': [
+                {
+                    'seq': seq,
+                    'date': self.faker.past_datetime(tzinfo=UTC).isoformat().replace('+00:00', 'Z'),
+                    'action': action,
+                    'description': self.faker.text(200),
+                }
+                for seq, action in enumerate([Action.CREATED, Action.AI_RESPONSE, Action.ESCALATED])
+            ],
+            'client': {
+                'id': cast(str, self.faker.uuid4()),
+                'name': self.faker.name(),
+                'emailIncidents': self.faker.email(),
+                'plan': self.faker.random_element(list(Plan)),
+            },
+            'risk': self.faker.random_element(list(Risk)),
+        }
+
+    def test_matches_marshmallow(self) -> None:
+        schema = marshmallow_dataclass.class_schema(EventBody)()
+
+        for _ in range(10):
+            data = self.gen_event()
+            self.assertEqual(event_decoder.decode(data), schema.load(data))
+
+    def test_decode(self) -> None:
+        data = self.gen_event()
+        data['risk'] = None
+
+        event = event_decoder.decode(data)
+
+        self.assertEqual(event.reported_by.email, data['reportedBy']['email'])
+        self.assertEqual(event.client.email_incidents, data['client']['emailIncidents'])
+        self.assertIsInstance(event.channel, Channel)
+        self.assertIs(event.history[-1].action, Action.ESCALATED)
+        self.assertEqual(event.history[0].date.tzinfo, UTC)
+        self.assertIsNone(event.risk)
+
+    def test_optional_missing(self) -> None:
+        data = self.gen_event()
+        del data['risk']
+
+        self.assertIsNone(event_decoder.decode(data).risk)
+
+    @parametrize(
+        ('path', 'value', 'message'),
+        [
+            (('name',), 1, '$.name: Not a valid string.'),
+            (('channel',), 'fax', '$.channel: Must be one of: web, mobile, email.'),
+            (('reportedBy', 'role'), None, '$.reportedBy.role: Missing data for required field.'),
+            (('history',), {}, '$.history: Not a valid list.'),
+            (('history', 1, 'seq'), True, '$.history[1].seq: Not a valid integer.'),
+            (('history', 2, 'date'), 'yesterday', '$.history[2].date: Not a valid datetime.'),
+            (('client',), [], '$.client: Invalid input type.'),
+            (('client', 'email_incidents'), 'x@example.org', '$.client: Unknown field: email_incidents.'),
+        ],
+    )
+    def test_decode_error(self, path: tuple[str | int, ...], value: object, message: str) -> None:
+        data = self.gen_event()
+
+        target: Any = data
+        for key in path[:-1]:
+            target = target[key]
+        target[path[-1]] = value
+
+        with self.assertRaises(DecodeError) as ctx:
+            event_decoder.decode(data)
+
+        self.assertEqual(str(ctx.exception), message)
+
+    def gen_long_event(self) -> dict[str, Any]:
+        data = self.gen_event()
+        for seq in range(len(data['history']), LAZY_MIN_ENTRIES * 2):
+            data['history'].append({**data['history'][-1], 'seq': seq, 'description': self.faker.text(200)})
+        return data
+
+    def test_lazy_history(self) -> None:
+        data = self.gen_long_event()
+
+        history = event_decoder.decode(data).history
+
+        self.assertIsInstance(history, LazyList)
+        self.assertEqual(len(history), LAZY_MIN_ENTRIES * 2)
+        self.assertEqual(history[-1].seq, LAZY_MIN_ENTRIES * 2 - 1)
+        self.assertEqual(history[0].date.tzinfo, UTC)
+        self.assertEqual(repr(history), f'LazyList({LAZY_MIN_ENTRIES * 2} entries, 2 decoded)')
+        self.assertIs(history[-1], history[LAZY_MIN_ENTRIES * 2 - 1])
+        self.assertEqual([entry.seq for entry in history[-3:]], list(range(LAZY_MIN_ENTRIES * 2 - 3, LAZY_MIN_ENTRIES * 2)))
+        with self.assertRaises(IndexError):
+            history[LAZY_MIN_ENTRIES * 2]
+
+    def test_lazy_matches_eager(self) -> None:
+        data = self.gen_long_event()
+
+        self.assertEqual(event_decoder.decode(data), Decoder(EventBody).decode(data))
+        self.assertEqual(event_decoder.decode(data), marshmallow_dataclass.class_schema(EventBody)().load(data))
+
+    def test_lazy_list(self) -> None:
+        @dataclass
+        class Body:
+            seq: int
+
+        values = LazyList([{'seq': 1}, {'seq': 'two'}], Decoder(Body).decode)
+
+        self.assertEqual(values[0], Body(seq=1))
+        self.assertNotEqual(values, 1)
+        with self.assertRaises(DecodeError) as ctx:
+            values[-1]
+        self.assertEqual(str(ctx.exception), '$[1].seq: Not a valid integer.')
+
+    @parametrize(
+        ('key', 'value', 'message'),
+        [
+            ('seq', 'one', '.seq: Not a valid integer.'),
+            ('date', 20240101, '.date: Not a valid datetime.'),
+            ('action', None, '.action: Missing data for required field.'),
+            ('reply', 'hi', ': Unknown field: reply.'),
+        ],
+    )
+    def test_lazy_history_error(self, key: str, value: object, message: str) -> None:
+        data = self.gen_long_event()
+        data['history'][LAZY_MIN_ENTRIES][key] = value
+
+        # The structure and types of every entry are checked when decoding, not only of the ones that are read
+        with self.assertRaises(DecodeError) as ctx:
+            event_decoder.decode(data)
+
+        self.assertEqual(str(ctx.exception), f'$.history[{LAZY_MIN_ENTRIES}]{message}')
+
+    def test_lazy_history_datetime_on_access(self) -> None:
+        data = self.gen_long_event()
+        data['history'][LAZY_MIN_ENTRIES]['date'] = 'yesterday'
+
+        # Only parsed when the entry is read
+        history = event_decoder.decode(data).history
+        self.assertEqual(history[-1].seq, LAZY_MIN_ENTRIES * 2 - 1)
+
+        with self.assertRaises(DecodeError) as ctx:
+            history[LAZY_MIN_ENTRIES]
+        self.assertEqual(str(ctx.exception), f'$[{LAZY_MIN_ENTRIES}].date: Not a valid datetime.')
+
+    @parametrize(
+        ('value', 'expected'),
+        [
+            (3, 3),
+            (3.0, 3),
+            ('3', 3),
+        ],
+    )
+    def test_decode_int(self, value: object, expected: int) -> None:
+        @dataclass
+        class Body:
+            seq: int
+
+        self.assertEqual(Decoder(Body).decode({'seq': value}).seq, expected)
+
+    @parametrize(
+        ('value',),
+        [
+            (3.5,),
+            ('three',),
+        ],
+    )
+    def test_decode_int_invalid(self, value: object) -> None:
+        @dataclass
+        class Body:
+            seq: int
+
+        with self.assertRaises(DecodeError):
+            Decoder(Body).decode({'seq': value})
+
+    def test_data_key(self) -> None:
+        @dataclass
+        class Body:
+            created_at: datetime = field(metadata={'data_key': 'createdAt'})
+
+        body = Decoder(Body).decode({'createdAt': '2024-11-20T10:00:00'})
+
+        self.assertEqual(body.created_at, datetime(2024, 11, 20, 10, 0))  # noqa: DTZ001
+
+    def test_not_dataclass(self) -> None:
+        with self.assertRaises(TypeError):
+            Decoder(dict)
+
+    def test_unsupported_field(self) -> None:
+        @dataclass
+        class Body:
+            value: float
+
+        with self.assertRaises(TypeError):
+            Decoder(Body)
+
+    def test_unsupported_union(self) -> None:
+        @dataclass
+        class Body:
+            value: int | str
+
+        with self.assertRaises(TypeError):
+            Decoder(Body)
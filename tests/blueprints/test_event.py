@@ -1,12 +1,19 @@
+import json
+import math
+import time
 from typing import Any, cast
 from unittest.mock import Mock
 
 from faker import Faker
 from unittest_parametrize import ParametrizedTestCase, parametrize
 
+from admission import AdmissionController, OverloadedError
 from app import create_app
 from models import Action, Channel, Plan, Risk, Role
-from repositories import MailRepository
+from repositories import DigestRepository, MailRepository
+from repositories.memory import MemoryDedupRepository, MemoryFloodRepository
+from repositories.priority import HIGH, LOW, NORMAL, current_priority
+from repositories.rest import UpstreamUnavailableError
 
 
 class TestEvent(ParametrizedTestCase):
@@ -128,3 +135,346 @@ class TestEvent(ParametrizedTestCase):
             cast(Mock, mail_repo_mock.send).assert_not_called()
 
         self.assertEqual(resp.status_code, 200)
+
+    @parametrize(
+        ('endpoint', 'risk', 'actions', 'priority'),
+        [
+            ('incident-alert', Risk.LOW, (), HIGH),
+            ('incident-risk-updated', Risk.HIGH, (), HIGH),
+            ('incident-risk-updated', Risk.MEDIUM, (), NORMAL),
+            ('incident-risk-updated', Risk.LOW, (), LOW),
+            ('incident-update', Risk.HIGH, (Action.ESCALATED,), NORMAL),
+            ('incident-update', Risk.HIGH, (Action.AI_RESPONSE,), LOW),
+        ],
+    )
+    def test_priority(self, endpoint: str, risk: Risk, actions: tuple[Action], priority: str) -> None:
+        priorities: list[str] = []
+        mail_repo_mock = Mock(MailRepository)
+        cast(Mock, mail_repo_mock.send).side_effect = lambda **_: priorities.append(current_priority())
+        data = self.gen_update(self.gen_random_event_data(risk=risk), *actions)
+
+        with self.app.container.mail_repo.override(mail_repo_mock):
+            resp = self.client.post(f'/api/v1/{endpoint}/notification', json=data)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(priorities, [priority])
+
+    def gen_update(self, data: dict[str, Any], *actions: Action) -> dict[str, Any]:
+        history = [*data['history']]
+        for action in actions:
+            history.append(
+                {
+                    'seq': len(history),
+                    'date': self.faker.past_datetime().isoformat().replace('+00:00', 'Z'),
+                    'action': action,
+                    'description': self.faker.text(200),
+                },
+            )
+        return data | {'history': history}
+
+    def test_coalesce(self) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        data = self.gen_random_event_data(channel=Channel.WEB)
+        data['language'] = 'es'
+
+        with (
+            self.app.container.mail_repo.override(mail_repo_mock),
+            self.app.container.config.coalesce.window.override(60),
+        ):
+            for update in (
+                data,
+                self.gen_update(data, Action.AI_RESPONSE, Action.ESCALATED),
+                self.gen_update(data, Action.AI_RESPONSE),
+            ):
+                resp = self.client.post('/api/v1/incident-update/notification', json=update)
+                self.assertEqual(resp.status_code, 200)
+
+            cast(Mock, mail_repo_mock.send).assert_not_called()
+            self.app.container.coalesce_repo().close()
+
+        cast(Mock, mail_repo_mock.send).assert_called_once()
+        text = cast(Mock, mail_repo_mock.send).call_args.kwargs['text']
+        self.assertIn('creado', text)
+        self.assertIn('escalado', text)
+
+    def test_old_state_skips_ai_responses(self) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        data = self.gen_random_event_data()
+        data['language'] = 'pt'
+        data = self.gen_update(data, Action.AI_RESPONSE, Action.AI_RESPONSE, Action.ESCALATED)
+
+        with self.app.container.mail_repo.override(mail_repo_mock):
+            resp = self.client.post('/api/v1/incident-update/notification', json=data)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('criado', cast(Mock, mail_repo_mock.send).call_args.kwargs['text'])
+
+    @parametrize(
+        ('endpoint', 'template'),
+        [
+            ('/api/v1/incident-alert/notification', 'Incidente urgente'),
+            ('/api/v1/incident-risk-updated/notification', 'Riesgo actualizado'),
+        ],
+    )
+    def test_digest(self, endpoint: str, template: str) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        digest_repo_mock = Mock(DigestRepository)
+        data = self.gen_random_event_data(risk=Risk.HIGH)
+        data['language'] = 'es'
+
+        with (
+            self.app.container.mail_repo.override(mail_repo_mock),
+            self.app.container.digest_repo.override(digest_repo_mock),
+            self.app.container.config.digest.mode.override('enabled'),
+        ):
+            resp = self.client.post(endpoint, json=data)
+
+        self.assertEqual(resp.status_code, 200)
+        cast(Mock, mail_repo_mock.send).assert_not_called()
+
+        sender, receiver, language, entry = cast(Mock, digest_repo_mock.add).call_args.args
+        self.assertEqual(sender, (data['client']['name'], data['client']['emailIncidents']))
+        self.assertEqual(receiver, (data['assignedTo']['name'], data['assignedTo']['email']))
+        self.assertEqual(language, 'es')
+        self.assertIn(f'{template}: {data["name"]}', entry)
+
+    def test_flood_suppressed(self) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        flood_repo = MemoryFloodRepository({'updated': (2, 60)})
+        reporter = self.gen_random_event_data()['reportedBy']
+
+        with (
+            self.app.container.mail_repo.override(mail_repo_mock),
+            self.app.container.flood_repo.override(flood_repo),
+            self.assertLogs('blueprints.event', 'INFO') as logs,
+        ):
+            for _ in range(4):
+                data = self.gen_update(self.gen_random_event_data() | {'reportedBy': reporter}, Action.ESCALATED)
+                resp = self.client.post('/api/v1/incident-update/notification', json=data)
+                self.assertEqual(resp.status_code, 200)
+
+        self.assertEqual(cast(Mock, mail_repo_mock.send).call_count, 2)
+        self.assertEqual(flood_repo.stats().suppressed, {'updated': 2})
+        self.assertEqual(sum('Suppressing updated mail' in line for line in logs.output), 2)
+
+    def test_duplicate_message(self) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        data = self.gen_random_event_data()
+        headers = {
+            'X-Goog-Pubsub-Message-Id': cast(str, self.faker.uuid4()),
+            'X-Goog-Pubsub-Subscription-Name': 'projects/capibaras/subscriptions/incident-alert-notification',
+        }
+
+        with self.app.container.mail_repo.override(mail_repo_mock):
+            for _ in range(2):
+                resp = self.client.post('/api/v1/incident-alert/notification', json=data, headers=headers)
+                self.assertEqual(resp.status_code, 200)
+
+        cast(Mock, mail_repo_mock.send).assert_called_once()
+
+    def test_duplicate_message_in_flight(self) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        dedup_repo = MemoryDedupRepository()
+        data = self.gen_random_event_data()
+        message_id = cast(str, self.faker.uuid4())
+        headers = {'X-Goog-Pubsub-Message-Id': message_id}
+
+        # The first delivery of the message is still being sent when it is delivered again
+        dedup_repo.claim(f'/{message_id}')
+
+        with self.app.container.mail_repo.override(mail_repo_mock), self.app.container.dedup_repo.override(dedup_repo):
+            resp = self.client.post('/api/v1/incident-alert/notification', json=data, headers=headers)
+            self.assertEqual(resp.status_code, 409)
+
+            # It failed, so the next redelivery sends it
+            dedup_repo.release(f'/{message_id}')
+            resp = self.client.post('/api/v1/incident-alert/notification', json=data, headers=headers)
+            self.assertEqual(resp.status_code, 200)
+
+        cast(Mock, mail_repo_mock.send).assert_called_once()
+
+    def test_duplicate_event_without_message_id(self) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        data = self.gen_random_event_data()
+
+        with self.app.container.mail_repo.override(mail_repo_mock):
+            self.client.post('/api/v1/incident-alert/notification', json=data)
+            self.client.post('/api/v1/incident-alert/notification', json=data)
+            self.client.post('/api/v1/incident-risk-updated/notification', json=data)
+
+        self.assertEqual(cast(Mock, mail_repo_mock.send).call_count, 2)
+
+    @parametrize(
+        ('retry_after',),
+        [
+            (1,),
+            (2.5,),
+        ],
+    )
+    def test_overloaded(self, retry_after: float) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        admission_mock = Mock(AdmissionController)
+        cast(Mock, admission_mock.admit).side_effect = OverloadedError('Overloaded', 503, retry_after)
+
+        with (
+            self.app.container.mail_repo.override(mail_repo_mock),
+            self.app.container.admission.override(admission_mock),
+            self.app.container.config.admission.mode.override('enabled'),
+        ):
+            resp = self.client.post('/api/v1/incident-alert/notification', json=self.gen_random_event_data())
+
+        cast(Mock, mail_repo_mock.send).assert_not_called()
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp.headers['Retry-After'], str(math.ceil(retry_after)))
+
+    def test_queued_past_deadline(self) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        headers = {'X-Request-Start': f't={time.time() - 30:.3f}'}
+
+        with (
+            self.app.container.mail_repo.override(mail_repo_mock),
+            self.app.container.admission.override(AdmissionController()),
+            self.app.container.config.admission.mode.override('enabled'),
+        ):
+            resp = self.client.post('/api/v1/incident-alert/notification', json=self.gen_random_event_data(), headers=headers)
+
+        cast(Mock, mail_repo_mock.send).assert_not_called()
+        self.assertEqual(resp.status_code, 503)
+        self.assertIn(resp.headers['Retry-After'], ('10', '11'))
+
+    def test_failed_delivery_is_retried(self) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        cast(Mock, mail_repo_mock.send).side_effect = [RuntimeError('SendGrid is down'), None]
+        data = self.gen_random_event_data()
+
+        with self.app.container.mail_repo.override(mail_repo_mock):
+            resp = self.client.post('/api/v1/incident-alert/notification', json=data)
+            self.assertEqual(resp.status_code, 500)
+
+            resp = self.client.post('/api/v1/incident-alert/notification', json=data)
+            self.assertEqual(resp.status_code, 200)
+
+        self.assertEqual(cast(Mock, mail_repo_mock.send).call_count, 2)
+
+    def test_upstream_unavailable(self) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        cast(Mock, mail_repo_mock.send).side_effect = UpstreamUnavailableError('Circuit is open', 12.5)
+
+        with self.app.container.mail_repo.override(mail_repo_mock):
+            resp = self.client.post('/api/v1/incident-alert/notification', json=self.gen_random_event_data())
+
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp.headers['Retry-After'], '13')
+        self.assertEqual(resp.get_json(), {'message': 'Mail provider unavailable, retry later.', 'code': 503})
+
+    def test_bulk_json_array(self) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        events = [self.gen_random_event_data(channel=Channel.WEB) for _ in range(5)]
+
+        with self.app.container.mail_repo.override(mail_repo_mock):
+            resp = self.client.post('/api/v1/incident-update/notification/bulk', json=events)
+
+        self.assertEqual(resp.status_code, 200)
+        resp_json = cast(dict[str, Any], resp.get_json())
+        self.assertEqual(resp_json['processed'], 5)
+        self.assertEqual(resp_json['failed'], 0)
+        self.assertEqual(resp_json['suppressed'], 0)
+        self.assertEqual([result['status'] for result in resp_json['results']], ['ok'] * 5)
+        self.assertEqual(cast(Mock, mail_repo_mock.send).call_count, 5)
+
+    def test_bulk_flood_suppressed(self) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        reporter = self.gen_random_event_data()['reportedBy']
+        events = [self.gen_update(self.gen_random_event_data() | {'reportedBy': reporter}, Action.ESCALATED) for _ in range(4)]
+
+        with (
+            self.app.container.mail_repo.override(mail_repo_mock),
+            self.app.container.flood_repo.override(MemoryFloodRepository({'updated': (2, 60)})),
+            self.assertLogs('blueprints.event', 'INFO'),
+        ):
+            resp = self.client.post('/api/v1/incident-update/notification/bulk', json=events)
+
+        resp_json = cast(dict[str, Any], resp.get_json())
+        self.assertEqual((resp_json['failed'], resp_json['suppressed']), (0, 2))
+        self.assertEqual(sum(result.get('suppressed', 0) for result in resp_json['results']), 2)
+        self.assertEqual(cast(Mock, mail_repo_mock.send).call_count, 2)
+
+    def test_bulk_ndjson(self) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        events = [self.gen_random_event_data() for _ in range(3)]
+        events[1]['channel'] = 'fax'
+        body = '\n'.join(json.dumps(event) for event in events)
+
+        with self.app.container.mail_repo.override(mail_repo_mock):
+            resp = self.client.post('/api/v1/incident-alert/notification/bulk', data=body, content_type='application/x-ndjson')
+
+        self.assertEqual(resp.status_code, 200)
+        resp_json = cast(dict[str, Any], resp.get_json())
+        self.assertEqual(resp_json['failed'], 1)
+        self.assertEqual(resp_json['results'][1]['status'], 'error')
+        self.assertIn('channel', resp_json['results'][1]['message'])
+        self.assertEqual(cast(Mock, mail_repo_mock.send).call_count, 2)
+
+    def test_bulk_invalid_body(self) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        body = json.dumps([self.gen_random_event_data()])[:-1] + ', {'
+
+        with self.app.container.mail_repo.override(mail_repo_mock):
+            resp = self.client.post(
+                '/api/v1/incident-risk-updated/notification/bulk', data=body, content_type='application/json'
+            )
+
+        self.assertEqual(resp.status_code, 400)
+        resp_json = cast(dict[str, Any], resp.get_json())
+        self.assertEqual(resp_json['processed'], 2)
+        self.assertEqual(resp_json['results'][0]['status'], 'ok')
+        self.assertEqual(resp_json['results'][1]['status'], 'error')
+        cast(Mock, mail_repo_mock.send).assert_called_once()
+
+    def test_bulk_trailing_data(self) -> None:
+        body = json.dumps([self.gen_random_event_data()]) + ' []'
+
+        with self.app.container.mail_repo.override(Mock(MailRepository)):
+            resp = self.client.post('/api/v1/incident-alert/notification/bulk', data=body, content_type='application/json')
+
+        self.assertEqual(resp.status_code, 400)
+        resp_json = cast(dict[str, Any], resp.get_json())
+        self.assertEqual(resp_json['results'][-1]['message'], 'Unexpected data after JSON array')
+
+    def test_bulk_unsupported_content_type(self) -> None:
+        resp = self.client.post('/api/v1/incident-alert/notification/bulk', data='id', content_type='text/plain')
+
+        self.assertEqual(resp.status_code, 415)
+
+    def test_bulk_replay_is_deduplicated(self) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        data = self.gen_random_event_data()
+
+        with self.app.container.mail_repo.override(mail_repo_mock):
+            self.client.post('/api/v1/incident-alert/notification/bulk', json=[data])
+            self.client.post('/api/v1/incident-alert/notification/bulk', json=[data])
+
+        cast(Mock, mail_repo_mock.send).assert_called_once()
+
+    def test_bulk_risk_change_is_not_a_replay(self) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        data = self.gen_random_event_data(risk=Risk.LOW)
+
+        # The risk changes without a new history entry
+        with self.app.container.mail_repo.override(mail_repo_mock):
+            self.client.post('/api/v1/incident-risk-updated/notification/bulk', json=[data])
+            self.client.post('/api/v1/incident-risk-updated/notification/bulk', json=[data | {'risk': Risk.HIGH}])
+
+        self.assertEqual(cast(Mock, mail_repo_mock.send).call_count, 2)
+
+    def test_bulk_replay_of_pushed_message(self) -> None:
+        mail_repo_mock = Mock(MailRepository)
+        data = self.gen_random_event_data()
+        headers = {'X-Goog-Pubsub-Message-Id': cast(str, self.faker.uuid4())}
+
+        # The push is keyed by its message id, which the replayed event does not carry
+        with self.app.container.mail_repo.override(mail_repo_mock):
+            self.client.post('/api/v1/incident-alert/notification', json=data, headers=headers)
+            self.client.post('/api/v1/incident-alert/notification/bulk', json=[data])
+
+        self.assertEqual(cast(Mock, mail_repo_mock.send).call_count, 2)
@@ -1,6 +1,14 @@
+import os
+import tempfile
+import threading
+import time
+from typing import cast
 from unittest import TestCase
+from unittest.mock import Mock, patch
 
-from app import create_app
+from app import create_app, reset_after_fork
+from repositories.rest import PooledSession
+from repositories.sqlite import SQLiteOutboxMailRepository
 
 
 class TestHealth(TestCase):
@@ -12,3 +20,56 @@ class TestHealth(TestCase):
         resp = self.client.get('/api/v1/health/notification')
 
         self.assertEqual(resp.status_code, 200)
+
+    def test_fast_start(self) -> None:
+        with patch.dict(os.environ, {'FAST_START': '1'}), patch.object(PooledSession, 'warm_up') as warm_up_mock:
+            app = create_app()
+
+            # The connection is opened in the background
+            deadline = time.monotonic() + 5
+            while not cast(Mock, warm_up_mock).called and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        cast(Mock, warm_up_mock).assert_called_once_with('https://api.sendgrid.com')
+        self.assertTrue(app._got_first_request)  # noqa: SLF001
+
+    def test_reset_after_fork(self) -> None:
+        app = create_app()
+        session = app.container.http_session()
+        templates = app.container.templates()
+
+        reset_after_fork(app)
+
+        # A forked worker opens its own connections but keeps the templates loaded by the master
+        self.assertIsNot(app.container.http_session(), session)
+        self.assertIs(app.container.templates(), templates)
+        self.assertEqual(app.test_client().get('/api/v1/health/notification').status_code, 200)
+
+    def test_preload_starts_workers_after_fork(self) -> None:
+        def background_threads() -> set[threading.Thread]:
+            prefixes = ('outbox-', 'metrics-flush', 'cloud-setup', 'warm-up')
+            return {thread for thread in threading.enumerate() if thread.name.startswith(prefixes)}
+
+        before = background_threads()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env = {
+                'PRELOAD_APP': '1',
+                'FAST_START': '1',
+                'MAIL_MODE': 'outbox',
+                'OUTBOX_PATH': f'{tmpdir}/outbox.sqlite3',
+                'METRICS_DIR': f'{tmpdir}/metrics',
+            }
+            with patch.dict(os.environ, env), patch.object(PooledSession, 'warm_up'):
+                app = create_app()
+
+                # Nothing runs in the master, the forked worker starts its own
+                self.assertEqual(background_threads() - before, set())
+
+                reset_after_fork(app)
+
+            mail_repo = app.container.mail_repo()
+            self.assertIsInstance(mail_repo, SQLiteOutboxMailRepository)
+            self.assertEqual(len({thread for thread in background_threads() - before if thread.name.startswith('outbox-')}), 2)
+            self.assertTrue(any(thread.name == 'metrics-flush' for thread in background_threads() - before))
+            mail_repo.close()
+            app.container.metrics_store().close()
@@ -0,0 +1,24 @@
+from unittest import TestCase
+
+from app import create_app
+
+
+class TestMetrics(TestCase):
+    def setUp(self) -> None:
+        self.app = create_app()
+        self.client = self.app.test_client()
+
+    def test_metrics(self) -> None:
+        self.client.post('/api/v1/incident-alert/notification', json={})
+
+        resp = self.client.get('/metrics')
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content_type, 'application/openmetrics-text; version=1.0.0; charset=utf-8')
+
+        body = resp.get_data(as_text=True)
+        self.assertIn('# TYPE notification_decode_seconds histogram\n', body)
+        self.assertIn(
+            'notification_decode_seconds_count{endpoint="/api/v1/incident-alert/notification",outcome="error"}', body
+        )
+        self.assertTrue(body.endswith('# EOF\n'))
@@ -0,0 +1,46 @@
+import os
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from app import create_app
+from repositories import MailRepository
+from repositories.sqlite import SQLiteOutboxMailRepository
+
+
+class TestOutbox(TestCase):
+    def setUp(self) -> None:
+        self.app = create_app()
+        self.client = self.app.test_client()
+
+    def test_outbox_disabled(self) -> None:
+        resp = self.client.get('/api/v1/outbox/notification')
+
+        self.assertEqual(resp.status_code, 404)
+
+    def test_outbox_stats(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            outbox = SQLiteOutboxMailRepository(Mock(MailRepository), str(Path(tmpdir) / 'outbox.sqlite3'), workers=0)
+
+            with self.app.container.mail_repo.override(outbox):
+                resp = self.client.get('/api/v1/outbox/notification')
+
+            outbox.close()
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.get_json(), {'depth': 0, 'failed': 0, 'delivered': 0, 'drain_rate': 0.0})
+
+    def test_outbox_mode(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env = {'MAIL_MODE': 'outbox', 'OUTBOX_PATH': str(Path(tmpdir) / 'outbox.sqlite3')}
+            with patch.dict(os.environ, env):
+                app = create_app()
+
+            mail_repo = app.container.mail_repo()
+            resp = app.test_client().get('/api/v1/outbox/notification')
+
+            self.assertIsInstance(mail_repo, SQLiteOutboxMailRepository)
+            mail_repo.close()
+
+        self.assertEqual(resp.status_code, 200)
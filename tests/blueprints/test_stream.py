@@ -0,0 +1,79 @@
+import io
+import json
+from unittest import TestCase
+from unittest.mock import patch
+
+from unittest_parametrize import ParametrizedTestCase, parametrize
+
+from blueprints.stream import StreamError, _decoder, iter_json_array, iter_ndjson
+
+
+class TestJsonArray(ParametrizedTestCase):
+    @parametrize(
+        ('chunk_size',),
+        [
+            (1,),
+            (3,),
+            (64,),
+            (65536,),
+        ],
+    )
+    def test_iter(self, chunk_size: int) -> None:
+        data = [{'id': idx, 'name': 'ação' * idx} for idx in range(20)] + [1, 2.5, -3e10, 'x', None, [1, [2]]]
+        raw = json.dumps(data, ensure_ascii=False, indent=2).encode()
+
+        self.assertEqual(list(iter_json_array(io.BytesIO(raw), chunk_size)), data)
+
+    def test_empty(self) -> None:
+        self.assertEqual(list(iter_json_array(io.BytesIO(b' [ ] \n'), 1)), [])
+
+    @parametrize(
+        ('raw', 'message'),
+        [
+            (b'', 'Unexpected end of JSON array'),
+            (b'{"id": 1}', 'Expected a JSON array'),
+            (b'[1, 2', 'Unexpected end of JSON array'),
+            (b'[1 2]', "Unexpected character '2' in JSON array"),
+            (b'[{"id": }]', 'Invalid JSON array element'),
+            (b'[1, 2] 3', 'Unexpected data after JSON array'),
+            (b'[]]', 'Unexpected data after JSON array'),
+        ],
+    )
+    def test_invalid(self, raw: bytes, message: str) -> None:
+        with self.assertRaisesRegex(StreamError, message):
+            list(iter_json_array(io.BytesIO(raw), 2))
+
+    def test_yields_before_end(self) -> None:
+        events = iter_json_array(io.BytesIO(b'[{"id": 1}, {"id": 2}, '), 4)
+
+        self.assertEqual(next(events), {'id': 1})
+        self.assertEqual(next(events), {'id': 2})
+        with self.assertRaises(StreamError):
+            next(events)
+
+    def test_large_element_decoded_few_times(self) -> None:
+        data = [{'history': ['x' * 100] * 1000}, 1]
+        raw = json.dumps(data).encode()
+
+        with patch.object(_decoder, 'raw_decode', wraps=_decoder.raw_decode) as raw_decode:
+            self.assertEqual(list(iter_json_array(io.BytesIO(raw), 16)), data)
+
+        # Once for every doubling of the buffered element, not once for every chunk
+        self.assertLess(raw_decode.call_count, 20)
+
+    def test_element_too_large(self) -> None:
+        raw = b'["' + b'x' * 100 + b'"]'
+
+        with self.assertRaisesRegex(StreamError, 'too large'):
+            list(iter_json_array(io.BytesIO(raw), 16, max_element_size=64))
+
+
+class TestNdjson(TestCase):
+    def test_iter(self) -> None:
+        raw = b'{"id": 1}\n\n{"id": 2}\n'
+
+        self.assertEqual(list(iter_ndjson(io.BytesIO(raw))), [{'id': 1}, {'id': 2}])
+
+    def test_invalid(self) -> None:
+        with self.assertRaisesRegex(StreamError, 'Invalid JSON line'):
+            list(iter_ndjson(io.BytesIO(b'{"id": 1}\n{"id":\n')))
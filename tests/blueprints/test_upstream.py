@@ -0,0 +1,20 @@
+from unittest import TestCase
+
+from app import create_app
+
+
+class TestUpstream(TestCase):
+    def setUp(self) -> None:
+        self.app = create_app()
+        self.client = self.app.test_client()
+
+    def test_upstream_stats(self) -> None:
+        resp = self.client.get('/api/v1/upstream/notification')
+
+        self.assertEqual(resp.status_code, 200)
+
+        data = resp.get_json()
+        self.assertEqual(data['breaker'], {'state': 'closed', 'failures': 0, 'rejected': 0, 'transitions': {}})
+        self.assertEqual(data['limiter']['rate'], 500)
+        self.assertEqual(data['limiter']['throttled'], 0)
+        self.assertEqual(data['retry']['retries'], 0)
@@ -0,0 +1,44 @@
+import base64
+import json
+from typing import Any, cast
+
+from faker import Faker
+from flask import Flask, request
+from unittest_parametrize import ParametrizedTestCase, parametrize
+
+from blueprints.util import setup_apigateway
+
+
+class TestApiGateway(ParametrizedTestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+
+        self.app = Flask(__name__)
+        setup_apigateway(self.app)
+
+        @self.app.get('/')
+        def user_token() -> dict[str, Any]:
+            return {'token': cast(Any, request).user_token}
+
+        self.client = self.app.test_client()
+
+    def test_user_token(self) -> None:
+        token = {'sub': cast(str, self.faker.uuid4()), 'email': self.faker.email()}
+        userinfo = base64.urlsafe_b64encode(json.dumps(token).encode()).decode().rstrip('=')
+
+        resp = self.client.get('/', headers={'X-Apigateway-Api-Userinfo': userinfo})
+
+        self.assertEqual(resp.get_json(), {'token': token})
+
+    @parametrize(
+        ('headers',),
+        [
+            ({},),
+            ({'X-Apigateway-Api-Userinfo': 'not base64!'},),
+            ({'X-Apigateway-Api-Userinfo': base64.urlsafe_b64encode(b'{"sub":').decode()},),
+        ],
+    )
+    def test_no_user_token(self, headers: dict[str, str]) -> None:
+        resp = self.client.get('/', headers=headers)
+
+        self.assertEqual(resp.get_json(), {'token': None})
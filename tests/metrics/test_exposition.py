@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+from metrics import Counter, Histogram, Registry, generate
+
+
+class TestExposition(TestCase):
+    def test_generate(self) -> None:
+        registry = Registry()
+        counter = Counter('sends', 'Mails "sent".', ('action',), registry=registry)
+        histogram = Histogram('latency', 'Latency.', ('stage',), buckets=(0.5, 1), registry=registry)
+
+        counter.labels('created').inc(3)
+        histogram.labels('decode').observe(0.25)
+        histogram.labels('decode').observe(2)
+
+        self.assertEqual(
+            generate(registry, registry.collect()),
+            '# TYPE sends counter\n'
+            '# HELP sends Mails \\"sent\\".\n'
+            'sends_total{action="created"} 3\n'
+            '# TYPE latency histogram\n'
+            '# HELP latency Latency.\n'
+            'latency_bucket{stage="decode",le="0.5"} 1\n'
+            'latency_bucket{stage="decode",le="1"} 1\n'
+            'latency_bucket{stage="decode",le="+Inf"} 2\n'
+            'latency_count{stage="decode"} 2\n'
+            'latency_sum{stage="decode"} 2.25\n'
+            '# EOF\n',
+        )
+
+    def test_escape(self) -> None:
+        registry = Registry()
+        Counter('sends', 'Sends.', ('template',), registry=registry).labels('a"b\\c\nd').inc()
+
+        self.assertIn('sends_total{template="a\\"b\\\\c\\nd"} 1\n', generate(registry, registry.collect()))
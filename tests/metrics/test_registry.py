@@ -0,0 +1,97 @@
+import threading
+from unittest import TestCase
+
+from metrics import Counter, Histogram, Registry
+
+
+class TestRegistry(TestCase):
+    def setUp(self) -> None:
+        self.registry = Registry()
+
+    def test_counter(self) -> None:
+        counter = Counter('sends', 'Sends.', ('action',), registry=self.registry)
+
+        counter.labels('created').inc()
+        counter.labels('created').inc(2)
+        counter.labels('closed').inc()
+
+        self.assertEqual(self.registry.collect(), {'sends': {('created',): 3, ('closed',): 1}})
+
+    def test_histogram(self) -> None:
+        histogram = Histogram('latency', 'Latency.', buckets=(0.1, 1, float('inf')), registry=self.registry)
+
+        for value in (0.05, 0.1, 0.5, 5):
+            histogram.labels().observe(value)
+
+        self.assertEqual(histogram.bounds, (0.1, 1))
+        self.assertEqual(self.registry.collect()['latency'][()], [2, 1, 1, 5.65])
+
+    def test_threads(self) -> None:
+        counter = Counter('sends', 'Sends.', registry=self.registry)
+        histogram = Histogram('latency', 'Latency.', registry=self.registry)
+
+        def run() -> None:
+            for _ in range(1000):
+                counter.labels().inc()
+                histogram.labels().observe(0.001)
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        samples = self.registry.collect()
+        self.assertEqual(samples['sends'][()], 8000)
+        self.assertEqual(sum(samples['latency'][()][:-1]), 8000)
+
+    def test_ended_threads_are_folded(self) -> None:
+        counter = Counter('sends', 'Sends.', registry=self.registry)
+        histogram = Histogram('latency', 'Latency.', registry=self.registry)
+        counter.labels().inc()
+
+        def run() -> None:
+            counter.labels().inc()
+            histogram.labels().observe(0.001)
+
+        for _ in range(20):
+            thread = threading.Thread(target=run)
+            thread.start()
+            thread.join()
+
+        # Only the shard of the thread still running is left
+        self.assertEqual(len(counter.labels().shards), 1)
+        self.assertEqual(len(histogram.labels().shards), 0)
+        self.assertEqual(counter.labels().value(), 21)
+        self.assertEqual(sum(histogram.labels().value()[:-1]), 20)
+
+    def test_reset(self) -> None:
+        counter = Counter('sends', 'Sends.', registry=self.registry)
+        counter.labels().inc()
+
+        self.registry.reset()
+
+        self.assertEqual(self.registry.collect(), {'sends': {(): 0}})
+
+    def test_reset_while_locked(self) -> None:
+        counter = Counter('sends', 'Sends.', registry=self.registry)
+        counter.labels().inc()
+
+        # Like the lock of a thread of the master that was forked while holding it
+        counter.labels().lock.acquire()
+        self.registry.reset()
+        counter.labels().inc()
+
+        self.assertEqual(self.registry.collect(), {'sends': {(): 1}})
+
+    def test_invalid_labels(self) -> None:
+        counter = Counter('sends', 'Sends.', ('action', 'outcome'), registry=self.registry)
+
+        with self.assertRaises(ValueError):
+            counter.labels('created')
+
+    def test_duplicated_name(self) -> None:
+        Counter('sends', 'Sends.', registry=self.registry)
+
+        with self.assertRaises(ValueError):
+            Counter('sends', 'Sends.', registry=self.registry)
@@ -0,0 +1,77 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from metrics import Counter, Histogram, MetricsStore, Registry, clear_snapshots, retire_snapshot
+
+
+class TestMetricsStore(TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name)
+
+        self.registry = Registry()
+        self.counter = Counter('sends', 'Sends.', ('action',), registry=self.registry)
+        self.histogram = Histogram('latency', 'Latency.', buckets=(1,), registry=self.registry)
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_in_process(self) -> None:
+        store = MetricsStore(registry=self.registry)
+        self.counter.labels('created').inc()
+
+        self.assertEqual(store.collect()['sends'], {('created',): 1})
+        self.assertIsNone(store.thread)
+
+    def test_merge_workers(self) -> None:
+        store = MetricsStore(str(self.path), interval=60, registry=self.registry)
+        self.counter.labels('created').inc()
+        self.histogram.labels().observe(0.5)
+
+        # Snapshot left by another worker, with a label this worker has not seen yet
+        other = {'sends': [[['created'], 2], [['closed'], 1]], 'latency': [[[], [1, 1, 2.5]]]}
+        (self.path / '1.json').write_text(json.dumps(other))
+        (self.path / '2.json').write_text('{"sends": [[')
+
+        samples = store.collect()
+        store.close()
+
+        self.assertEqual(samples['sends'], {('created',): 3, ('closed',): 1})
+        self.assertEqual(samples['latency'], {(): [2, 1, 3.0]})
+
+    def test_flush(self) -> None:
+        store = MetricsStore(str(self.path), interval=60, registry=self.registry)
+        self.counter.labels('created').inc(4)
+
+        store.close()
+
+        snapshot = json.loads((self.path / f'{store.pid}.json').read_text())
+        self.assertEqual(snapshot['sends'], [[['created'], 4]])
+        self.assertEqual(list(self.path.glob('*.tmp')), [])
+
+    def test_clear_snapshots(self) -> None:
+        for name in ('1.json', '1.tmp', 'exited.json'):
+            (self.path / name).write_text('{}')
+        (self.path / 'notes.txt').write_text('')
+
+        clear_snapshots(str(self.path))
+
+        self.assertEqual([file.name for file in self.path.iterdir()], ['notes.txt'])
+
+    def test_retire_snapshot(self) -> None:
+        store = MetricsStore(str(self.path), interval=60, registry=self.registry)
+        (self.path / '1.json').write_text(json.dumps({'sends': [[['created'], 2]], 'latency': [[[], [1, 1, 0.5]]]}))
+        (self.path / '2.json').write_text(json.dumps({'sends': [[['created'], 1], [['closed'], 1]]}))
+
+        retire_snapshot(str(self.path), 1)
+        retire_snapshot(str(self.path), 2)
+        retire_snapshot(str(self.path), 3)
+
+        # The counts of the exited workers are kept in a single file
+        self.assertEqual(sorted(file.name for file in self.path.iterdir()), ['exited.json'])
+        samples = store.collect()
+        store.close()
+        self.assertEqual(samples['sends'], {('created',): 3, ('closed',): 1})
+        self.assertEqual(samples['latency'], {(): [1, 1, 0.5]})
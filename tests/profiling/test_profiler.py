@@ -0,0 +1,105 @@
+import json
+import os
+import pstats
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from app import create_app
+from profiling import RequestProfiler
+
+
+def decode_event() -> None:
+    time.sleep(0.05)
+
+
+class TestRequestProfiler(TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name)
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def summaries(self) -> list[dict[str, object]]:
+        return [json.loads(file.read_text()) for file in self.path.glob('*-*.json')]
+
+    def test_sampled(self) -> None:
+        profiler = RequestProfiler(str(self.path), sample_rate=1, slow_threshold=None)
+
+        request = profiler.begin()
+        decode_event()
+        profiler.end(request, 'POST /api/v1/incident-alert/notification', 200)
+
+        pstats.Stats(str(next(self.path.glob('*.pstats'))))
+        summary = self.summaries()[0]
+        self.assertEqual(summary['label'], 'POST /api/v1/incident-alert/notification')
+        self.assertGreaterEqual(summary['stages']['decode'], 0.05)  # type: ignore[index]
+
+    def test_one_profile_at_a_time(self) -> None:
+        profiler = RequestProfiler(str(self.path), sample_rate=1, slow_threshold=None)
+
+        first = profiler.begin()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            second = executor.submit(profiler.begin).result()
+            profiler.end(first, 'first', 200)
+            third = executor.submit(profiler.begin).result()
+            executor.submit(profiler.end, third, 'third', 200).result()
+
+        self.assertIsNotNone(first and first.profile)
+        self.assertIsNone(second and second.profile)
+        self.assertIsNotNone(third and third.profile)
+        self.assertEqual(sorted(summary['label'] for summary in self.summaries()), ['first', 'third'])
+
+    def test_slow(self) -> None:
+        profiler = RequestProfiler(str(self.path), sample_rate=0, slow_threshold=0.03, interval=0.005)
+
+        request = profiler.begin()
+        decode_event()
+        profiler.end(request, 'slow', 200)
+
+        request = profiler.begin()
+        profiler.end(request, 'fast', 200)
+
+        collapsed = next(self.path.glob('*.collapsed')).read_text()
+        self.assertIn('decode_event (test_profiler.py:', collapsed)
+        self.assertEqual([summary['label'] for summary in self.summaries()], ['slow'])
+        self.assertEqual(list(self.path.glob('*.pstats')), [])
+
+    def test_disabled(self) -> None:
+        profiler = RequestProfiler(str(self.path), sample_rate=0, slow_threshold=0)
+
+        self.assertIsNone(profiler.begin())
+
+    def test_control(self) -> None:
+        profiler = RequestProfiler(str(self.path), sample_rate=0, slow_threshold=None, reload_interval=0)
+        (self.path / 'control.json').write_text('{"sample_rate": 1}')
+
+        profiler.end(profiler.begin(), 'sampled', 200)
+        self.assertEqual(len(self.summaries()), 1)
+
+        (self.path / 'control.json').write_text('{"sample_rate": "all"')
+        with self.assertLogs('RequestProfiler', 'ERROR'):
+            profiler.end(profiler.begin(), 'sampled', 200)
+        self.assertEqual(profiler.settings.sample_rate, 1)
+
+    def test_rotate(self) -> None:
+        profiler = RequestProfiler(str(self.path), sample_rate=1, slow_threshold=None, max_dumps=2)
+
+        for idx in range(4):
+            profiler.end(profiler.begin(), f'request {idx}', 200)
+
+        self.assertEqual(len(self.summaries()), 2)
+        self.assertEqual(len(list(self.path.glob('*.pstats'))), 2)
+
+    def test_app(self) -> None:
+        with patch.dict(os.environ, {'PROFILING_DIR': self.tmpdir.name, 'PROFILING_SAMPLE_RATE': '1'}):
+            app = create_app()
+
+        resp = app.test_client().get('/api/v1/health/notification')
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([summary['label'] for summary in self.summaries()], ['GET /api/v1/health/notification'])
@@ -0,0 +1,71 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import cast
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from repositories.file import FileBlocklistRepository
+
+
+class TestFileBlocklist(TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = Path(tmpdir.name) / 'blocklist.txt'
+        self.path.write_text('bounced@example.org\ntenant.test\n')
+
+    def rewrite(self, text: str) -> None:
+        self.path.write_text(text)
+        # Make the change visible even on filesystems with a coarse mtime
+        stat = self.path.stat()
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def test_is_blocked(self) -> None:
+        repo = FileBlocklistRepository(str(self.path), pattern=r'^qa\+')
+
+        self.assertTrue(repo.is_blocked('bounced@example.org'))
+        self.assertTrue(repo.is_blocked('user@eu.tenant.test'))
+        self.assertTrue(repo.is_blocked('qa+1@example.net'))
+        self.assertFalse(repo.is_blocked('user@example.org'))
+
+    def test_missing_file(self) -> None:
+        with self.assertRaises(FileNotFoundError):
+            FileBlocklistRepository(str(self.path.with_name('missing.txt')))
+
+    def test_reload(self) -> None:
+        with patch('time.monotonic') as monotonic_mock:
+            cast(Mock, monotonic_mock).return_value = 1000
+            repo = FileBlocklistRepository(str(self.path), reload_interval=5)
+
+            self.rewrite('user@example.org\n')
+
+            # Not checked again before the interval is over
+            cast(Mock, monotonic_mock).return_value = 1004
+            self.assertFalse(repo.is_blocked('user@example.org'))
+
+            cast(Mock, monotonic_mock).return_value = 1005
+            self.assertTrue(repo.is_blocked('user@example.org'))
+            self.assertFalse(repo.is_blocked('bounced@example.org'))
+
+    def test_reload_unchanged(self) -> None:
+        repo = FileBlocklistRepository(str(self.path), reload_interval=0)
+        index = repo.index
+
+        repo.is_blocked('user@example.org')
+
+        self.assertIs(repo.index, index)
+
+    def test_reload_error(self) -> None:
+        repo = FileBlocklistRepository(str(self.path), reload_interval=0)
+
+        self.rewrite('re:[\n')
+        with self.assertLogs('FileBlocklistRepository', 'ERROR'):
+            blocked = repo.is_blocked('bounced@example.org')
+
+        # The previous rules stay in place
+        self.assertTrue(blocked)
+
+        self.path.unlink()
+        with self.assertLogs('FileBlocklistRepository', 'ERROR'):
+            self.assertTrue(repo.is_blocked('bounced@example.org'))
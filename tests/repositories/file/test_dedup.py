@@ -0,0 +1,72 @@
+import tempfile
+from pathlib import Path
+from typing import cast
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from faker import Faker
+
+from repositories import Claim
+from repositories.file import FileDedupRepository
+
+
+class TestFileDedup(TestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = str(Path(tmpdir.name) / 'dedup.jsonl')
+
+    def test_claim(self) -> None:
+        repo = FileDedupRepository(self.path)
+        key = cast(str, self.faker.uuid4())
+
+        self.assertEqual(repo.claim(key), Claim.CLAIMED)
+        self.assertEqual(repo.claim(key), Claim.IN_FLIGHT)
+
+        repo.complete(key)
+
+        self.assertEqual(repo.claim(key), Claim.DONE)
+
+    def test_persisted(self) -> None:
+        completed, claimed, released = (cast(str, self.faker.uuid4()) for _ in range(3))
+
+        repo = FileDedupRepository(self.path)
+        repo.claim(completed)
+        repo.complete(completed)
+        repo.claim(claimed)
+        repo.claim(released)
+        repo.release(released)
+
+        reloaded = FileDedupRepository(self.path)
+
+        self.assertEqual(reloaded.claim(completed), Claim.DONE)
+        self.assertEqual(reloaded.claim(claimed), Claim.IN_FLIGHT)
+        self.assertEqual(reloaded.claim(released), Claim.CLAIMED)
+
+    def test_expire(self) -> None:
+        key = cast(str, self.faker.uuid4())
+
+        with patch('time.time') as time_mock:
+            cast(Mock, time_mock).return_value = 1000
+            repo = FileDedupRepository(self.path, ttl=60)
+            repo.claim(key)
+            repo.complete(key)
+
+            cast(Mock, time_mock).return_value = 1061
+            reloaded = FileDedupRepository(self.path, ttl=60)
+
+        self.assertEqual(reloaded.entries, {})
+        self.assertEqual(Path(self.path).read_text(), '')
+
+    def test_compact(self) -> None:
+        repo = FileDedupRepository(self.path, compact_lines=10)
+
+        for _ in range(20):
+            key = cast(str, self.faker.uuid4())
+            repo.claim(key)
+            repo.release(key)
+
+        self.assertLessEqual(len(Path(self.path).read_text().splitlines()), 10)
+        self.assertEqual(repo.entries, {})
@@ -0,0 +1,45 @@
+from unittest_parametrize import ParametrizedTestCase, parametrize
+
+from repositories.memory import MemoryBlocklistRepository
+
+
+class TestMemoryBlocklist(ParametrizedTestCase):
+    def setUp(self) -> None:
+        self.repo = MemoryBlocklistRepository(
+            [
+                '# Bounced',
+                'bounced@example.org',
+                '',
+                'tenant.test',
+                '@unsubscribed.example.com',
+                're:^qa\\+.*@',
+            ]
+        )
+
+    @parametrize(
+        ('email', 'blocked'),
+        [
+            ('bounced@example.org', True),
+            ('Bounced@Example.org', True),
+            ('other@example.org', False),
+            ('user@tenant.test', True),
+            ('user@eu.tenant.test', True),
+            ('user@othertenant.test', False),
+            ('user@test', False),
+            ('user@unsubscribed.example.com', True),
+            ('user@example.com', False),
+            ('qa+1@example.net', True),
+            ('qa@example.net', False),
+        ],
+    )
+    def test_is_blocked(self, email: str, *, blocked: bool) -> None:
+        self.assertEqual(self.repo.is_blocked(email), blocked)
+
+    def test_pattern(self) -> None:
+        repo = MemoryBlocklistRepository(pattern=r'^.*@example.org$')
+
+        self.assertTrue(repo.is_blocked('user@example.org'))
+        self.assertFalse(repo.is_blocked('user@example.com'))
+
+    def test_empty(self) -> None:
+        self.assertFalse(MemoryBlocklistRepository().is_blocked('user@example.org'))
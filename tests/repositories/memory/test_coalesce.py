@@ -0,0 +1,63 @@
+import threading
+from collections.abc import Callable
+from unittest import TestCase
+
+from repositories.memory import MemoryCoalesceRepository
+
+
+class TestMemoryCoalesce(TestCase):
+    def setUp(self) -> None:
+        self.calls: list[tuple[str, int]] = []
+        self.called = threading.Event()
+
+    def call(self, name: str) -> Callable[[int], None]:
+        def run(first_seq: int) -> None:
+            self.calls.append((name, first_seq))
+            self.called.set()
+
+        return run
+
+    def test_newest_wins(self) -> None:
+        repo = MemoryCoalesceRepository(window=0.05)
+
+        self.assertTrue(repo.submit('incident', 1, self.call('created')))
+        self.assertTrue(repo.submit('incident', 3, self.call('closed')))
+        self.assertFalse(repo.submit('incident', 2, self.call('escalated')))
+
+        self.assertTrue(self.called.wait(5))
+        repo.close()
+
+        self.assertEqual(self.calls, [('closed', 1)])
+        self.assertEqual(repo.stats().coalesced, 1)
+        self.assertEqual(repo.stats().dropped, 1)
+
+    def test_late_delivery(self) -> None:
+        repo = MemoryCoalesceRepository(window=60)
+        repo.submit('incident', 2, self.call('escalated'))
+        repo.close()
+
+        self.assertFalse(repo.submit('incident', 1, self.call('created')))
+        self.assertTrue(repo.submit('incident', 3, self.call('closed')))
+
+        self.assertEqual(self.calls, [('escalated', 2), ('closed', 3)])
+
+    def test_keys(self) -> None:
+        repo = MemoryCoalesceRepository(window=60, max_keys=1)
+        repo.submit('first', 1, self.call('first'))
+        repo.submit('second', 1, self.call('second'))
+        repo.close()
+
+        # Only the last key is remembered
+        self.assertFalse(repo.submit('second', 1, self.call('second')))
+        self.assertTrue(repo.submit('first', 1, self.call('first')))
+
+    def test_failed_call(self) -> None:
+        repo = MemoryCoalesceRepository(window=60)
+
+        def fail(_: int) -> None:
+            raise RuntimeError('SendGrid is down')
+
+        repo.submit('incident', 1, fail)
+
+        with self.assertLogs('MemoryCoalesceRepository', 'ERROR'):
+            repo.close()
@@ -0,0 +1,67 @@
+from typing import cast
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from faker import Faker
+
+from repositories import Claim
+from repositories.memory import MemoryDedupRepository
+
+
+class TestMemoryDedup(TestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.repo = MemoryDedupRepository(max_entries=3, ttl=60, lease=10)
+
+    def test_claim(self) -> None:
+        key = cast(str, self.faker.uuid4())
+
+        self.assertEqual(self.repo.claim(key), Claim.CLAIMED)
+        self.assertEqual(self.repo.claim(key), Claim.IN_FLIGHT)
+
+        self.repo.complete(key)
+
+        self.assertEqual(self.repo.claim(key), Claim.DONE)
+
+    def test_release(self) -> None:
+        key = cast(str, self.faker.uuid4())
+
+        self.repo.claim(key)
+        self.repo.release(key)
+
+        self.assertEqual(self.repo.claim(key), Claim.CLAIMED)
+
+    def test_expire(self) -> None:
+        key = cast(str, self.faker.uuid4())
+
+        with patch('time.monotonic') as monotonic_mock:
+            cast(Mock, monotonic_mock).return_value = 1000
+            self.repo.claim(key)
+            self.repo.complete(key)
+
+            cast(Mock, monotonic_mock).return_value = 1061
+            self.assertEqual(self.repo.claim(key), Claim.CLAIMED)
+
+    def test_lease_expire(self) -> None:
+        key = cast(str, self.faker.uuid4())
+
+        with patch('time.monotonic') as monotonic_mock:
+            cast(Mock, monotonic_mock).return_value = 1000
+            self.repo.claim(key)
+
+            cast(Mock, monotonic_mock).return_value = 1009
+            self.assertEqual(self.repo.claim(key), Claim.IN_FLIGHT)
+
+            cast(Mock, monotonic_mock).return_value = 1011
+            self.assertEqual(self.repo.claim(key), Claim.CLAIMED)
+
+    def test_evict_least_recently_used(self) -> None:
+        keys = [cast(str, self.faker.uuid4()) for _ in range(4)]
+
+        for key in keys[:3]:
+            self.repo.claim(key)
+        self.repo.claim(keys[0])
+        self.repo.claim(keys[3])
+
+        self.assertEqual(list(self.repo.entries), [keys[2], keys[0], keys[3]])
+        self.assertEqual(self.repo.claim(keys[1]), Claim.CLAIMED)
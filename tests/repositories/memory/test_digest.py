@@ -0,0 +1,99 @@
+import threading
+from typing import cast
+from unittest import TestCase
+from unittest.mock import Mock
+
+from faker import Faker
+
+from repositories import MailRepository
+from repositories.memory import MemoryDigestRepository
+from repositories.resource import ResourceTemplateRepository
+
+
+class TestMemoryDigest(TestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.mail_repo = Mock(MailRepository)
+        self.templates = ResourceTemplateRepository('blueprints.mails')
+        self.sender = (self.faker.company(), self.faker.email())
+
+    def gen_receiver(self) -> tuple[str | None, str]:
+        return (self.faker.name(), self.faker.email())
+
+    def wait_sent(self, count: int) -> None:
+        sent = threading.Event()
+        send = cast(Mock, self.mail_repo.send)
+        send.side_effect = lambda *_: sent.set() if send.call_count >= count else None
+        if send.call_count < count:
+            self.assertTrue(sent.wait(5))
+
+    def test_window(self) -> None:
+        repo = MemoryDigestRepository(self.mail_repo, self.templates, window=0.05)
+        receiver = self.gen_receiver()
+
+        repo.add(self.sender, receiver, 'es', 'first')
+        repo.add(self.sender, receiver, 'es', 'second')
+        self.wait_sent(1)
+        repo.close()
+
+        sender, to, subject, text, reply_to = cast(Mock, self.mail_repo.send).call_args.args
+        self.assertEqual((sender, to, subject, reply_to), (self.sender, receiver, 'Resumen de incidentes (2)', None))
+        self.assertIn('first\n\nsecond', text)
+        self.assertIn(f'El equipo de {self.sender[0]}', text)
+        self.assertEqual(repo.stats().digests, 1)
+        self.assertEqual(repo.stats().entries, 2)
+
+    def test_grouped_by_receiver_and_language(self) -> None:
+        repo = MemoryDigestRepository(self.mail_repo, self.templates, window=60)
+        receiver = self.gen_receiver()
+
+        repo.add(self.sender, receiver, 'es', 'es')
+        repo.add(self.sender, receiver, 'pt', 'pt')
+        repo.add(self.sender, self.gen_receiver(), 'es', 'other')
+        self.assertEqual(repo.stats().pending, 3)
+
+        repo.close()
+
+        self.assertEqual(cast(Mock, self.mail_repo.send).call_count, 3)
+
+    def test_max_entries(self) -> None:
+        repo = MemoryDigestRepository(self.mail_repo, self.templates, window=60, max_entries=3)
+        receiver = self.gen_receiver()
+
+        for idx in range(3):
+            repo.add(self.sender, receiver, 'pt', str(idx))
+        self.wait_sent(1)
+
+        self.assertEqual(cast(Mock, self.mail_repo.send).call_args.args[2], 'Resumo de incidentes (3)')
+        self.assertEqual(repo.stats().pending, 0)
+        repo.close()
+
+    def test_max_bytes(self) -> None:
+        repo = MemoryDigestRepository(self.mail_repo, self.templates, window=60, max_bytes=100)
+        oldest = self.gen_receiver()
+
+        repo.add(self.sender, oldest, 'es', 'a' * 60)
+        repo.add(self.sender, self.gen_receiver(), 'es', 'b' * 60)
+        self.wait_sent(1)
+
+        self.assertEqual(cast(Mock, self.mail_repo.send).call_args.args[1], oldest)
+        self.assertEqual(repo.stats().buffered_bytes, 60)
+        repo.close()
+
+    def test_failed_send(self) -> None:
+        cast(Mock, self.mail_repo.send).side_effect = RuntimeError('SendGrid is down')
+        repo = MemoryDigestRepository(self.mail_repo, self.templates, window=60)
+        repo.add(self.sender, self.gen_receiver(), 'es', 'entry')
+
+        with self.assertLogs('MemoryDigestRepository', 'ERROR'):
+            repo.close()
+
+        self.assertEqual(repo.stats().failed, 1)
+
+    def test_add_after_close(self) -> None:
+        repo = MemoryDigestRepository(self.mail_repo, self.templates, window=60)
+        repo.close()
+
+        repo.add(self.sender, self.gen_receiver(), 'es', 'entry')
+
+        cast(Mock, self.mail_repo.send).assert_called_once()
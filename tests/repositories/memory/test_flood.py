@@ -0,0 +1,100 @@
+from typing import cast
+from unittest.mock import Mock, patch
+
+from faker import Faker
+from unittest_parametrize import ParametrizedTestCase, parametrize
+
+from blueprints.mails import TEMPLATES
+from repositories.memory import MemoryFloodRepository, parse_limits
+
+
+class TestMemoryFlood(ParametrizedTestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.repo = MemoryFloodRepository({'updated': (3, 60), 'default': (1, 60)}, max_keys=3)
+
+    @parametrize(
+        ('value', 'limits'),
+        [
+            ('', {}),
+            ('updated=5/60', {'updated': (5, 60)}),
+            (' updated=5/60, default=0.5/1 ,', {'updated': (5, 60), 'default': (0.5, 1)}),
+        ],
+    )
+    def test_parse_limits(self, value: str, limits: dict[str, tuple[float, float]]) -> None:
+        self.assertEqual(parse_limits(value, TEMPLATES), limits)
+
+    @parametrize(
+        ('value', 'message'),
+        [
+            ('updated=5', 'Malformed flood limit'),
+            ('updated=five/60', 'Malformed flood limit'),
+            ('updated=5/0', 'positive count and period'),
+            ('updated=0/60', 'positive count and period'),
+            ('updated=-5/60', 'positive count and period'),
+            ('updated=5/nan', 'positive count and period'),
+            ('upd4ted=5/60', 'unknown template'),
+            ('5/60', 'unknown template'),
+        ],
+    )
+    def test_parse_invalid(self, value: str, message: str) -> None:
+        with self.assertRaisesRegex(ValueError, message):
+            parse_limits(value, TEMPLATES)
+
+    def test_limit(self) -> None:
+        email = self.faker.email()
+
+        allowed = [self.repo.allow('updated', email) for _ in range(5)]
+
+        self.assertEqual(allowed, [True, True, True, False, False])
+        self.assertFalse(self.repo.allow('updated', email.upper()))
+        self.assertTrue(self.repo.allow('updated', self.faker.email()))
+        self.assertEqual(self.repo.stats().suppressed, {'updated': 3})
+
+    def test_per_template(self) -> None:
+        email = self.faker.email()
+
+        self.assertTrue(self.repo.allow('closed', email))
+        self.assertFalse(self.repo.allow('closed', email))
+        self.assertTrue(self.repo.allow('updated', email))
+
+    def test_unlimited(self) -> None:
+        repo = MemoryFloodRepository({'updated': (1, 60)})
+        email = self.faker.email()
+
+        self.assertTrue(all(repo.allow('urgent', email) for _ in range(10)))
+        self.assertEqual(repo.stats().keys, 0)
+
+    def test_refill(self) -> None:
+        email = self.faker.email()
+
+        with patch('time.monotonic') as monotonic_mock:
+            cast(Mock, monotonic_mock).return_value = 1000
+            for _ in range(3):
+                self.repo.allow('updated', email)
+            self.assertFalse(self.repo.allow('updated', email))
+
+            # A third of the period gives back one of the three mails
+            cast(Mock, monotonic_mock).return_value = 1020
+            self.assertTrue(self.repo.allow('updated', email))
+            self.assertFalse(self.repo.allow('updated', email))
+
+    def test_bounded(self) -> None:
+        emails = [self.faker.unique.email() for _ in range(10)]
+
+        for email in emails:
+            self.repo.allow('closed', email)
+
+        self.assertEqual(self.repo.stats().keys, 3)
+        # Evicted receivers start over with a full bucket
+        self.assertTrue(self.repo.allow('closed', emails[0]))
+
+    def test_idle_dropped(self) -> None:
+        with patch('time.monotonic') as monotonic_mock:
+            cast(Mock, monotonic_mock).return_value = 1000
+            self.repo.allow('closed', self.faker.email())
+
+            cast(Mock, monotonic_mock).return_value = 1060
+            self.repo.allow('closed', self.faker.email())
+
+        self.assertEqual(self.repo.stats().keys, 1)
@@ -0,0 +1,150 @@
+import threading
+import time
+from typing import cast
+from unittest import TestCase
+from unittest.mock import Mock
+
+from metrics import QUEUE_SECONDS
+from repositories import MailRepository
+from repositories.priority import HIGH, LOW, NORMAL, PriorityMailRepository, mail_priority
+from repositories.rest import UpstreamUnavailableError
+from repositories.retry import ack_deadline
+
+
+class GatedDelivery:
+    # Mails with a subject starting with block hold their slot until the gate is opened, failing ones raise
+    def __init__(self) -> None:
+        self.gate = threading.Event()
+        self.sent: list[str] = []
+        self.repo = Mock(MailRepository)
+        cast(Mock, self.repo.send).side_effect = self.send
+
+    def send(self, _sender: object, _receiver: object, subject: str, *_: object) -> None:
+        self.sent.append(subject)
+        if subject == 'failing':
+            raise ValueError(subject)
+        if subject.startswith('block'):
+            self.gate.wait(5)
+
+
+def queue_count(priority: str, outcome: str) -> float:
+    return sum(QUEUE_SECONDS.labels(priority, outcome).value()[:-1])
+
+
+class TestPriorityMail(TestCase):
+    def setUp(self) -> None:
+        self.delivery = GatedDelivery()
+        self.threads: list[threading.Thread] = []
+        self.addCleanup(self.join)
+
+    def join(self) -> None:
+        self.delivery.gate.set()
+        for thread in self.threads:
+            thread.join()
+
+    def send(self, repo: PriorityMailRepository, priority: str, subject: str) -> None:
+        with mail_priority(priority):
+            repo.send((None, 'sender@example.org'), (None, 'receiver@example.org'), subject, 'Text', None)
+
+    def start(self, repo: PriorityMailRepository, priority: str, subject: str) -> None:
+        thread = threading.Thread(target=self.send, args=(repo, priority, subject))
+        thread.start()
+        self.threads.append(thread)
+
+    def wait_queued(self, repo: PriorityMailRepository, count: int) -> None:
+        deadline = time.monotonic() + 5
+        while sum(repo.stats().queued.values()) < count and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+    def queue(self, repo: PriorityMailRepository, *mails: tuple[str, str]) -> None:
+        # The first mail takes a slot and holds it, the others wait in the order given
+        self.start(repo, NORMAL, 'block')
+        deadline = time.monotonic() + 5
+        while self.delivery.sent != ['block'] and time.monotonic() < deadline:
+            time.sleep(0.001)
+        for idx, (priority, subject) in enumerate(mails, 1):
+            self.start(repo, priority, subject)
+            self.wait_queued(repo, idx)
+
+    def test_high_first(self) -> None:
+        repo = PriorityMailRepository(self.delivery.repo, capacity=1, reserved=0, max_wait=10)
+
+        self.queue(repo, (LOW, 'low'), (NORMAL, 'normal'), (HIGH, 'high'))
+        self.join()
+
+        self.assertEqual(self.delivery.sent, ['block', 'high', 'normal', 'low'])
+        self.assertEqual(repo.stats().granted, {NORMAL: 2, LOW: 1, HIGH: 1})
+
+    def test_weighted(self) -> None:
+        repo = PriorityMailRepository(self.delivery.repo, capacity=1, reserved=0, max_wait=10)
+
+        self.queue(repo, *[(LOW, f'low{idx}') for idx in range(4)], *[(NORMAL, f'normal{idx}') for idx in range(4)])
+        self.join()
+
+        # Three normal mails for every low one while both are waiting
+        self.assertEqual(self.delivery.sent[1:], ['normal0', 'normal1', 'low0', 'normal2', 'normal3', 'low1', 'low2', 'low3'])
+
+    def test_reserved(self) -> None:
+        repo = PriorityMailRepository(self.delivery.repo, capacity=2, reserved=1, max_wait=10)
+
+        self.queue(repo, (NORMAL, 'normal'))
+        self.send(repo, HIGH, 'high')
+
+        self.assertEqual(self.delivery.sent, ['block', 'high'])
+        self.assertEqual(repo.stats().queued[NORMAL], 1)
+
+        self.join()
+        self.assertEqual(self.delivery.sent, ['block', 'high', 'normal'])
+
+    def test_aged(self) -> None:
+        repo = PriorityMailRepository(self.delivery.repo, capacity=1, reserved=0, max_wait=0.05)
+
+        self.queue(repo, (LOW, 'low'))
+        time.sleep(0.1)
+        self.start(repo, HIGH, 'high')
+        self.wait_queued(repo, 2)
+        self.join()
+
+        self.assertEqual(self.delivery.sent, ['block', 'low', 'high'])
+        self.assertEqual(repo.stats().aged, 1)
+
+    def test_ack_deadline(self) -> None:
+        repo = PriorityMailRepository(self.delivery.repo, capacity=1, reserved=0)
+        expired = queue_count(LOW, 'expired')
+
+        self.queue(repo)
+        with ack_deadline(0.05), self.assertRaises(UpstreamUnavailableError) as ctx:
+            self.send(repo, LOW, 'low')
+
+        self.assertEqual(ctx.exception.retry_after, 1)
+        self.assertEqual(queue_count(LOW, 'expired'), expired + 1)
+        stats = repo.stats()
+        self.assertEqual((stats.queued[LOW], stats.expired), (0, {LOW: 1}))
+
+        self.join()
+        self.assertEqual(self.delivery.sent, ['block'])
+        self.assertEqual(repo.stats().in_use, 0)
+
+    def test_error_releases(self) -> None:
+        repo = PriorityMailRepository(self.delivery.repo, capacity=1, reserved=0)
+        granted = queue_count(NORMAL, 'granted')
+
+        with self.assertRaises(ValueError):
+            self.send(repo, NORMAL, 'failing')
+
+        self.assertEqual(repo.stats().in_use, 0)
+        self.assertEqual(queue_count(NORMAL, 'granted'), granted + 1)
+
+    def test_max_queued(self) -> None:
+        repo = PriorityMailRepository(self.delivery.repo, capacity=2, reserved=1, max_wait=10, max_queued=1)
+
+        self.queue(repo, (LOW, 'low'))
+        with self.assertRaises(UpstreamUnavailableError):
+            self.send(repo, NORMAL, 'normal')
+
+        # Urgent alerts are never turned away
+        self.send(repo, HIGH, 'high')
+
+        self.join()
+        self.assertEqual(self.delivery.sent, ['block', 'high', 'low'])
+        self.assertEqual(repo.stats().rejected, 1)
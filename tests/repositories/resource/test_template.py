@@ -0,0 +1,110 @@
+import sys
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from faker import Faker
+from unittest_parametrize import ParametrizedTestCase, parametrize
+
+from blueprints import mails
+from models import Action, Risk
+from repositories.resource import ResourceTemplateRepository
+
+MANIFEST = """
+LANGUAGES = ('es', 'pt')
+TEMPLATES = {'greeting': frozenset({'name'})}
+TRANSLATIONS = {'word': {'hello': {'es': 'hola', 'pt': 'ola'}}}
+"""
+
+
+class TestResourceTemplate(ParametrizedTestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.repo = ResourceTemplateRepository('blueprints.mails')
+
+    def test_loads_every_template(self) -> None:
+        for template in mails.TEMPLATES:
+            for language in mails.LANGUAGES:
+                self.assertIn((template, language), self.repo.templates)
+
+    def test_render(self) -> None:
+        client_name = self.faker.company()
+
+        text = self.repo.render('created', 'es', client_name=client_name)
+
+        self.assertIn(client_name, text)
+        self.assertNotIn('{', text)
+
+    @parametrize(
+        ('table', 'key', 'language', 'expected'),
+        [
+            ('state', Action.CLOSED, 'pt', 'fechado'),
+            ('risk', Risk.MEDIUM, 'pt', 'Médio'),
+            ('subject_risk_updated', 'default', 'es', 'Riesgo actualizado'),
+        ],
+    )
+    def test_translate(self, table: str, key: str, language: str, expected: str) -> None:
+        self.assertEqual(self.repo.translate(table, key, language), expected)
+
+
+class TestResourceTemplateValidation(TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+        self.package = f'mails_{id(self)}'
+        self.path = Path(self.tmpdir.name) / self.package
+        self.path.mkdir()
+        (self.path / '__init__.py').write_text(MANIFEST)
+
+        sys.path.insert(0, self.tmpdir.name)
+        self.addCleanup(sys.path.remove, self.tmpdir.name)
+        self.addCleanup(sys.modules.pop, self.package, None)
+
+    def write(self, name: str, text: str) -> None:
+        (self.path / name).write_text(text, encoding='utf-8')
+
+    def test_valid(self) -> None:
+        self.write('greeting.es.txt', 'Hola {name}')
+        self.write('greeting.pt.txt', 'Ola {name}')
+
+        repo = ResourceTemplateRepository(self.package)
+
+        self.assertEqual(repo.render('greeting', 'pt', name='Ana'), 'Ola Ana')
+        self.assertEqual(repo.translate('word', 'hello', 'es'), 'hola')
+
+    def test_missing_language(self) -> None:
+        self.write('greeting.es.txt', 'Hola {name}')
+
+        with self.assertRaisesRegex(ValueError, 'Missing mail template greeting.pt.txt'):
+            ResourceTemplateRepository(self.package)
+
+    def test_missing_placeholder(self) -> None:
+        self.write('greeting.es.txt', 'Hola {name}')
+        self.write('greeting.pt.txt', 'Ola {nome}')
+
+        with self.assertRaisesRegex(ValueError, 'missing: name, unknown: nome'):
+            ResourceTemplateRepository(self.package)
+
+    def test_positional_placeholder(self) -> None:
+        self.write('greeting.es.txt', 'Hola {name} {}')
+        self.write('greeting.pt.txt', 'Ola {name}')
+
+        with self.assertRaisesRegex(ValueError, 'named placeholders'):
+            ResourceTemplateRepository(self.package)
+
+    def test_unexpected_template(self) -> None:
+        self.write('greeting.es.txt', 'Hola {name}')
+        self.write('greeting.pt.txt', 'Ola {name}')
+        self.write('farewell.es.txt', 'Adios')
+
+        with self.assertRaisesRegex(ValueError, 'Unexpected mail template farewell.es.txt'):
+            ResourceTemplateRepository(self.package)
+
+    def test_missing_translation(self) -> None:
+        (self.path / '__init__.py').write_text(MANIFEST.replace(", 'pt': 'ola'", ''))
+        self.write('greeting.es.txt', 'Hola {name}')
+        self.write('greeting.pt.txt', 'Ola {name}')
+
+        with self.assertRaisesRegex(ValueError, 'Missing pt translation for word.hello'):
+            ResourceTemplateRepository(self.package)
@@ -0,0 +1,191 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, cast
+from unittest.mock import patch
+
+import responses
+from faker import Faker
+from requests import HTTPError, PreparedRequest
+from unittest_parametrize import ParametrizedTestCase, parametrize
+
+from repositories.memory import MemoryBlocklistRepository
+from repositories.rest import BatchMail, SendgridBatchingMailRepository, SendgridMailRepository
+from repositories.retry import ack_deadline, remaining_time
+
+SEND_URL = 'https://api.sendgrid.com/v3/mail/send'
+
+
+class TestBatching(ParametrizedTestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.repo = SendgridMailRepository(None, MemoryBlocklistRepository(['example.org']))
+        self.sender = (self.faker.name(), self.faker.email())
+
+    def gen_mail(self, email: str | None = None, text: str | None = None) -> BatchMail:
+        return BatchMail(
+            receiver=(self.faker.name(), email or f'{self.faker.user_name()}@capibaras.co'),
+            subject=self.faker.sentence(4),
+            text=text or self.faker.text(),
+            reply_to=self.faker.random_element([None, '<S6HpplnTSkmW7zQ0Si7Z8A@geopod-ismtpd-4>']),
+        )
+
+    @staticmethod
+    def request_json(call: Any) -> dict[str, Any]:  # noqa: ANN401
+        return cast(dict[str, Any], json.loads(cast(str | bytes, call.request.body)))
+
+    def test_send_batch(self) -> None:
+        mails = [self.gen_mail() for _ in range(3)]
+
+        with responses.RequestsMock() as rsps:
+            rsps.post(SEND_URL, status=202)
+            results = self.repo.send_batch(self.sender, mails)
+
+            self.assertEqual(len(rsps.calls), 1)
+            req_json = self.request_json(rsps.calls[0])
+
+        self.assertEqual(results, [None, None, None])
+        self.assertEqual(req_json['from'], {'name': self.sender[0], 'email': self.sender[1]})
+        self.assertEqual(req_json['content'], [{'type': 'text/plain', 'value': '-notification-body-'}])
+
+        for mail, personalization in zip(mails, req_json['personalizations'], strict=True):
+            self.assertEqual(personalization['to'], [{'name': mail.receiver[0], 'email': mail.receiver[1]}])
+            self.assertEqual(personalization['subject'], mail.subject)
+            self.assertEqual(personalization['substitutions'], {'-notification-body-': mail.text})
+            if mail.reply_to is None:
+                self.assertNotIn('headers', personalization)
+            else:
+                self.assertEqual(personalization['headers']['In-Reply-To'], mail.reply_to)
+
+    def test_send_batch_blocked_and_oversized(self) -> None:
+        blocked = self.gen_mail(email='blocked@example.org')
+        oversized = self.gen_mail(text='x' * 20000)
+        mails = [blocked, oversized, self.gen_mail(), self.gen_mail()]
+
+        with responses.RequestsMock() as rsps:
+            rsps.post(SEND_URL, status=202)
+            results = self.repo.send_batch(self.sender, mails)
+
+            self.assertEqual(len(rsps.calls), 2)
+            single, batch = (self.request_json(call) for call in rsps.calls)
+
+        self.assertEqual(results, [None] * 4)
+        self.assertEqual(single['content'][0]['value'], oversized.text)
+        self.assertEqual(len(batch['personalizations']), 2)
+
+    def test_send_batch_rejected(self) -> None:
+        mails = [self.gen_mail() for _ in range(3)]
+        invalid = mails[1].receiver[1]
+
+        def callback(request: PreparedRequest) -> tuple[int, dict[str, str], str]:
+            req_json = json.loads(cast(bytes, request.body))
+            emails = [p['to'][0]['email'] for p in req_json['personalizations']]
+            return (400 if invalid in emails else 202), {}, ''
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(responses.POST, SEND_URL, callback=callback)
+            results = self.repo.send_batch(self.sender, mails)
+
+            self.assertEqual(len(rsps.calls), 4)
+
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], HTTPError)
+        self.assertIsNone(results[2])
+
+    @parametrize(
+        ('status',),
+        [
+            (200,),
+            (429,),
+            (500,),
+        ],
+    )
+    def test_send_batch_error(self, status: int) -> None:
+        mails = [self.gen_mail() for _ in range(3)]
+
+        with responses.RequestsMock() as rsps:
+            rsps.post(SEND_URL, status=status)
+            results = self.repo.send_batch(self.sender, mails)
+
+            self.assertEqual(len(rsps.calls), 1)
+
+        for result in results:
+            self.assertIsInstance(result, HTTPError)
+
+    def test_coalesce_concurrent_sends(self) -> None:
+        batching = SendgridBatchingMailRepository(self.repo, max_batch=100, max_delay=0.2)
+        self.addCleanup(batching.close)
+        mails = [self.gen_mail() for _ in range(5)]
+
+        with responses.RequestsMock() as rsps, ThreadPoolExecutor(max_workers=5) as executor:
+            rsps.post(SEND_URL, status=202)
+            futures = [executor.submit(batching.send, self.sender, *mail) for mail in mails]
+            for future in futures:
+                future.result()
+
+            self.assertEqual(len(rsps.calls), 1)
+            self.assertEqual(len(self.request_json(rsps.calls[0])['personalizations']), 5)
+
+    def test_flush_full_batch(self) -> None:
+        batching = SendgridBatchingMailRepository(self.repo, max_batch=2, max_delay=60)
+        self.addCleanup(batching.close)
+
+        with responses.RequestsMock() as rsps, ThreadPoolExecutor(max_workers=2) as executor:
+            rsps.post(SEND_URL, status=202)
+            futures = [executor.submit(batching.send, self.sender, *self.gen_mail()) for _ in range(2)]
+            for future in futures:
+                future.result(timeout=5)
+
+            self.assertEqual(len(rsps.calls), 1)
+
+    def test_flush_earliest_ack_deadline(self) -> None:
+        batching = SendgridBatchingMailRepository(self.repo, max_batch=100, max_delay=0.2)
+        self.addCleanup(batching.close)
+        remaining: list[float | None] = []
+        send_batch = self.repo.send_batch
+
+        def record(sender: tuple[str | None, str], mails: list[BatchMail]) -> list[Exception | None]:
+            remaining.append(remaining_time())
+            return send_batch(sender, mails)
+
+        def send(seconds: float | None) -> None:
+            if seconds is None:
+                batching.send(self.sender, *self.gen_mail())
+                return
+            with ack_deadline(seconds):
+                batching.send(self.sender, *self.gen_mail())
+
+        with (
+            patch.object(self.repo, 'send_batch', record),
+            responses.RequestsMock() as rsps,
+            ThreadPoolExecutor(max_workers=3) as executor,
+        ):
+            rsps.post(SEND_URL, status=202)
+            for future in [executor.submit(send, seconds) for seconds in (30, None, 3)]:
+                future.result(timeout=5)
+
+            self.assertEqual(len(rsps.calls), 1)
+
+        # The flusher thread has no ack deadline of its own, the batch is timed by the earliest of its pushes
+        self.assertEqual(len(remaining), 1)
+        self.assertIsNotNone(remaining[0])
+        self.assertAlmostEqual(cast(float, remaining[0]), 2.8, delta=0.2)
+
+    def test_report_failure(self) -> None:
+        batching = SendgridBatchingMailRepository(self.repo, max_delay=0.01)
+        self.addCleanup(batching.close)
+
+        with responses.RequestsMock() as rsps:
+            rsps.post(SEND_URL, status=500)
+
+            with self.assertRaises(HTTPError):
+                batching.send(self.sender, *self.gen_mail())
+
+    def test_send_after_close(self) -> None:
+        batching = SendgridBatchingMailRepository(self.repo)
+        batching.close()
+
+        with responses.RequestsMock() as rsps:
+            rsps.post(SEND_URL, status=202)
+            batching.send(self.sender, *self.gen_mail())
+
+            self.assertEqual(len(rsps.calls), 1)
@@ -0,0 +1,190 @@
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime
+from typing import cast
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from unittest_parametrize import ParametrizedTestCase, parametrize
+
+from repositories.rest import CircuitBreaker, RateLimiter, UpstreamUnavailableError
+from repositories.rest.guard import parse_retry_after
+
+
+class TestRetryAfter(ParametrizedTestCase):
+    @parametrize(
+        ('headers', 'expected'),
+        [
+            ({}, None),
+            ({'Retry-After': '12'}, 12),
+            ({'Retry-After': '-3'}, 0),
+            ({'Retry-After': 'soon'}, None),
+        ],
+    )
+    def test_parse(self, headers: dict[str, str], expected: float | None) -> None:
+        self.assertEqual(parse_retry_after(headers), expected)
+
+    def test_parse_date(self) -> None:
+        value = format_datetime(datetime.now(UTC) + timedelta(seconds=30), usegmt=True)
+
+        self.assertAlmostEqual(cast(float, parse_retry_after({'Retry-After': value})), 30, delta=2)
+
+
+class TestRateLimiter(TestCase):
+    def setUp(self) -> None:
+        patcher = patch('time.monotonic')
+        self.monotonic = cast(Mock, patcher.start())
+        self.monotonic.return_value = 1000
+        self.addCleanup(patcher.stop)
+
+    def test_burst(self) -> None:
+        limiter = RateLimiter(max_rate=10, burst=3, max_wait=1)
+
+        self.assertEqual([limiter.reserve() for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(limiter.reserve(), 0.1)
+        self.assertAlmostEqual(limiter.reserve(), 0.2)
+
+    def test_refill(self) -> None:
+        limiter = RateLimiter(max_rate=10, burst=3)
+        for _ in range(3):
+            limiter.reserve()
+
+        self.monotonic.return_value = 1000.5
+
+        self.assertEqual([limiter.reserve() for _ in range(3)], [0, 0, 0])
+
+    def test_throttled(self) -> None:
+        limiter = RateLimiter(max_rate=1, burst=1, max_wait=1)
+        limiter.reserve()
+        limiter.reserve()
+
+        with self.assertRaises(UpstreamUnavailableError) as ctx:
+            limiter.reserve()
+
+        self.assertAlmostEqual(ctx.exception.retry_after, 2)
+        self.assertEqual(limiter.stats().throttled, 1)
+
+    def test_retry_after(self) -> None:
+        limiter = RateLimiter(max_rate=100, burst=100, max_wait=10)
+
+        with self.assertLogs('RateLimiter', 'WARNING'):
+            limiter.update(429, {'Retry-After': '5'})
+
+        self.assertAlmostEqual(limiter.reserve(), 5, delta=0.1)
+        self.assertEqual(limiter.stats().rate, 50)
+
+    def test_rate_limit_headers(self) -> None:
+        limiter = RateLimiter(max_rate=100, burst=100)
+
+        with patch('time.time') as time_mock:
+            cast(Mock, time_mock).return_value = 5000
+            limiter.update(202, {'X-RateLimit-Remaining': '20', 'X-RateLimit-Reset': '5010'})
+
+        stats = limiter.stats()
+        self.assertEqual(stats.rate, 2)
+        self.assertEqual(stats.tokens, 20)
+
+    def test_rate_limit_exhausted(self) -> None:
+        limiter = RateLimiter(max_rate=100, burst=100, max_wait=1)
+
+        with patch('time.time') as time_mock, self.assertLogs('RateLimiter', 'WARNING'):
+            cast(Mock, time_mock).return_value = 5000
+            limiter.update(202, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '5030'})
+
+        with self.assertRaises(UpstreamUnavailableError):
+            limiter.reserve()
+
+    def test_recover_rate(self) -> None:
+        limiter = RateLimiter(max_rate=100)
+        limiter.update(429, {})
+        limiter.update(429, {})
+
+        for _ in range(20):
+            limiter.update(202, {})
+
+        self.assertEqual(limiter.stats().rate, 100)
+
+
+class TestCircuitBreaker(TestCase):
+    def setUp(self) -> None:
+        patcher = patch('time.monotonic')
+        self.monotonic = cast(Mock, patcher.start())
+        self.monotonic.return_value = 1000
+        self.addCleanup(patcher.stop)
+
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+
+    def trip(self) -> None:
+        with self.assertLogs('CircuitBreaker', 'WARNING'):
+            for _ in range(3):
+                self.breaker.before()
+                self.breaker.record(503, {})
+
+    def test_closed(self) -> None:
+        for _ in range(5):
+            self.breaker.before()
+            self.breaker.record(400, {})
+            self.breaker.before()
+            self.breaker.record(500, {})
+
+        self.assertEqual(self.breaker.stats().state, 'closed')
+
+    def test_open(self) -> None:
+        self.trip()
+
+        with self.assertRaises(UpstreamUnavailableError) as ctx:
+            self.breaker.before()
+
+        self.assertEqual(ctx.exception.retry_after, 30)
+        self.assertEqual(self.breaker.stats().rejected, 1)
+
+    def test_open_for_retry_after(self) -> None:
+        with self.assertLogs('CircuitBreaker', 'WARNING'):
+            for _ in range(3):
+                self.breaker.record(429, {'Retry-After': '120'})
+
+        self.monotonic.return_value = 1060
+        with self.assertRaises(UpstreamUnavailableError) as ctx:
+            self.breaker.before()
+
+        self.assertEqual(ctx.exception.retry_after, 60)
+
+    def test_half_open_success(self) -> None:
+        self.trip()
+        self.monotonic.return_value = 1030
+
+        with self.assertLogs('CircuitBreaker', 'WARNING'):
+            self.breaker.before()
+
+            # Only one probe goes through
+            with self.assertRaises(UpstreamUnavailableError):
+                self.breaker.before()
+
+            self.breaker.record(202, {})
+
+        self.breaker.before()
+        self.assertEqual(
+            self.breaker.stats().transitions,
+            {'closed->open': 1, 'open->half_open': 1, 'half_open->closed': 1},
+        )
+
+    def test_half_open_failure(self) -> None:
+        self.trip()
+        self.monotonic.return_value = 1030
+
+        with self.assertLogs('CircuitBreaker', 'WARNING'):
+            self.breaker.before()
+            self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.stats().state, 'open')
+        with self.assertRaises(UpstreamUnavailableError):
+            self.breaker.before()
+
+    def test_lost_probe(self) -> None:
+        self.trip()
+        self.monotonic.return_value = 1030
+
+        with self.assertLogs('CircuitBreaker', 'WARNING'):
+            self.breaker.before()
+
+        self.monotonic.return_value = 1060
+        self.breaker.before()
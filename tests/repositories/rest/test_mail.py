@@ -2,12 +2,15 @@ import json
 from typing import cast
 from unittest.mock import Mock
 
+import requests
 import responses
 from faker import Faker
 from requests import HTTPError
 from unittest_parametrize import ParametrizedTestCase, parametrize
 
+from repositories.memory import MemoryBlocklistRepository
 from repositories.rest import SendgridMailRepository, TokenProvider
+from repositories.retry import ack_deadline
 
 
 class TestMail(ParametrizedTestCase):
@@ -36,6 +39,22 @@ class TestMail(ParametrizedTestCase):
             repo.authenticated_post(self.base_url, json={})
             self.assertEqual(rsps.calls[0].request.headers['Authorization'], f'Bearer {token}')
 
+    def test_timeout_follows_ack_deadline(self) -> None:
+        session = Mock(requests.Session)
+        repo = SendgridMailRepository(None, session=session, connect_timeout=2, read_timeout=5)
+
+        repo.authenticated_post(self.base_url, json={})
+        with ack_deadline(3):
+            repo.authenticated_post(self.base_url, json={})
+        with ack_deadline(-1):
+            repo.authenticated_post(self.base_url, json={})
+
+        timeouts = [call.kwargs['timeout'] for call in cast(Mock, session.post).call_args_list]
+        self.assertEqual(timeouts[0], (2, 5))
+        self.assertEqual(timeouts[1][0], 2)
+        self.assertAlmostEqual(timeouts[1][1], 3, delta=0.5)
+        self.assertEqual(timeouts[2], (0.1, 0.1))
+
     @parametrize(
         ('has_sender_name', 'has_receiver_name', 'reply_to'),
         [
@@ -142,7 +161,7 @@ class TestMail(ParametrizedTestCase):
         subject = self.faker.sentence(4)
         text = self.faker.text()
 
-        repo = SendgridMailRepository(None, r'^.*@example.org$')
+        repo = SendgridMailRepository(None, MemoryBlocklistRepository(['example.org']))
 
         repo.send(
             sender=(sender_name, sender_email),
@@ -0,0 +1,101 @@
+from typing import cast
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import requests
+import responses
+from faker import Faker
+from requests.adapters import HTTPAdapter
+
+from repositories.rest import CircuitBreaker, PooledSession, RateLimiter, SendgridMailRepository, UpstreamUnavailableError
+
+
+class TestPooledSession(TestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.base_url = self.faker.url().rstrip('/')
+
+    def test_adapter(self) -> None:
+        session = PooledSession(pool_size=16)
+
+        adapter = cast(HTTPAdapter, session.get_adapter('https://api.sendgrid.com'))
+
+        self.assertEqual(adapter._pool_maxsize, 16)  # type: ignore[attr-defined]  # noqa: SLF001
+        self.assertEqual(adapter.max_retries.total, 0)
+
+    def test_repository_uses_session(self) -> None:
+        session = PooledSession()
+        repo = SendgridMailRepository(None, session=session, connect_timeout=0.5, read_timeout=3)
+
+        with responses.RequestsMock() as rsps, patch.object(session, 'send', wraps=session.send) as send_mock:
+            rsps.post(self.base_url)
+            repo.authenticated_post(self.base_url, json={})
+            repo.authenticated_post(self.base_url, json={})
+
+        self.assertEqual(send_mock.call_count, 2)
+        self.assertEqual(send_mock.call_args.kwargs['timeout'], (0.5, 3))
+
+    def test_evict_idle(self) -> None:
+        session = PooledSession(idle_timeout=60)
+        adapter = cast(HTTPAdapter, session.get_adapter('https://api.sendgrid.com'))
+
+        with patch.object(adapter.poolmanager, 'clear') as clear_mock, patch('time.monotonic') as monotonic_mock:
+            cast(Mock, monotonic_mock).return_value = session.last_used + 10
+            session.evict_idle()
+            clear_mock.assert_not_called()
+
+            cast(Mock, monotonic_mock).return_value = session.last_used + 61
+            session.evict_idle()
+            clear_mock.assert_called()
+
+    def test_breaker(self) -> None:
+        breaker = CircuitBreaker(failure_threshold=2)
+        session = PooledSession(breaker=breaker)
+
+        with responses.RequestsMock() as rsps, self.assertLogs('CircuitBreaker', 'WARNING'):
+            rsps.post(self.base_url, status=503)
+            rsps.post(self.base_url, body=requests.ConnectionError('Connection refused'))
+
+            session.post(self.base_url)
+            with self.assertRaises(requests.ConnectionError):
+                session.post(self.base_url)
+
+            # Rejected without reaching the server
+            with self.assertRaises(UpstreamUnavailableError):
+                session.post(self.base_url)
+
+            self.assertEqual(len(rsps.calls), 2)
+
+    def test_limiter(self) -> None:
+        limiter = RateLimiter(max_rate=100, burst=100, max_wait=1)
+        session = PooledSession(limiter=limiter)
+
+        with responses.RequestsMock() as rsps, self.assertLogs('RateLimiter', 'WARNING'):
+            rsps.post(self.base_url, status=429, headers={'Retry-After': '30'})
+
+            session.post(self.base_url)
+            with self.assertRaises(UpstreamUnavailableError):
+                session.post(self.base_url)
+
+            self.assertEqual(len(rsps.calls), 1)
+
+    def test_warm_up(self) -> None:
+        breaker = Mock(CircuitBreaker)
+        limiter = Mock(RateLimiter)
+        session = PooledSession(limiter=limiter, breaker=breaker)
+
+        with responses.RequestsMock() as rsps:
+            rsps.head(self.base_url)
+            session.warm_up(self.base_url)
+
+            self.assertEqual(len(rsps.calls), 1)
+
+        cast(Mock, breaker.before).assert_not_called()
+        cast(Mock, limiter.acquire).assert_not_called()
+
+    def test_warm_up_failure(self) -> None:
+        session = PooledSession()
+
+        with responses.RequestsMock() as rsps, self.assertLogs('PooledSession', 'WARNING'):
+            rsps.head(self.base_url, body=requests.ConnectionError('Connection refused'))
+            session.warm_up(self.base_url)
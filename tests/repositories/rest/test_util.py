@@ -0,0 +1,154 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+from typing import cast
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from faker import Faker
+
+from app import load_config
+from containers import Container
+from repositories.rest import CachedTokenProvider, SendgridMailRepository, StaticTokenProvider, TokenProvider
+
+
+class SlowTokenProvider:
+    def __init__(self, delay: float, expires_in: float | None = None) -> None:
+        self.delay = delay
+        self.expires_in = expires_in
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def get_token(self) -> str:
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls += 1
+            return f'token-{self.calls}'
+
+
+class SlowExpiringTokenProvider(SlowTokenProvider):
+    def get_token_with_expiry(self) -> tuple[str, datetime]:
+        return self.get_token(), datetime.now(UTC) + timedelta(seconds=cast(float, self.expires_in))
+
+
+class TestCachedTokenProvider(TestCase):
+    def wait_until(self, predicate: object) -> None:
+        deadline = time.monotonic() + 5
+        while not predicate():  # type: ignore[operator]
+            if time.monotonic() > deadline:
+                self.fail('Condition not met in time')
+            time.sleep(0.01)
+
+    def test_static(self) -> None:
+        self.assertEqual(StaticTokenProvider('apikey').get_token(), 'apikey')
+
+    def test_cached(self) -> None:
+        slow = SlowTokenProvider(delay=0.2)
+        provider = CachedTokenProvider(slow)
+
+        self.assertEqual(provider.get_token(), 'token-1')
+
+        start = time.perf_counter()
+        for _ in range(100):
+            self.assertEqual(provider.get_token(), 'token-1')
+        elapsed = time.perf_counter() - start
+
+        # Without the cache these calls would take 20s
+        self.assertLess(elapsed, 0.1)
+        self.assertEqual(slow.calls, 1)
+
+    def test_single_flight(self) -> None:
+        slow = SlowTokenProvider(delay=0.2)
+        provider = CachedTokenProvider(slow)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            tokens = list(executor.map(lambda _: provider.get_token(), range(8)))
+
+        self.assertEqual(tokens, ['token-1'] * 8)
+        self.assertEqual(slow.calls, 1)
+
+    def test_refresh_ahead(self) -> None:
+        slow = SlowTokenProvider(delay=0.2)
+        provider = CachedTokenProvider(slow, ttl=10, refresh_ahead=5)
+        provider.get_token()
+
+        with patch('time.time') as time_mock:
+            cast(Mock, time_mock).return_value = cast(tuple[str, float], provider.current)[1] - 1
+
+            # The current token is returned right away while the next one is fetched in the background
+            start = time.perf_counter()
+            self.assertEqual(provider.get_token(), 'token-1')
+            self.assertEqual(provider.get_token(), 'token-1')
+            self.assertLess(time.perf_counter() - start, 0.1)
+
+            self.wait_until(lambda: slow.calls == 2)  # noqa: PLR2004
+            self.wait_until(lambda: not provider.refreshing)
+            self.assertEqual(provider.get_token(), 'token-2')
+
+    def test_refresh_failure(self) -> None:
+        failing = Mock(TokenProvider)
+        cast(Mock, failing.get_token).side_effect = ['token-1', RuntimeError('Secret Manager unavailable'), 'token-2']
+        provider = CachedTokenProvider(failing, ttl=10, refresh_ahead=5, retry_interval=60)
+        provider.get_token()
+
+        with patch('time.time') as time_mock:
+            now = cast(tuple[str, float], provider.current)[1] - 1
+            cast(Mock, time_mock).return_value = now
+
+            self.assertEqual(provider.get_token(), 'token-1')
+            self.wait_until(lambda: not provider.refreshing)
+
+            # Backs off before trying again
+            self.assertEqual(provider.get_token(), 'token-1')
+            self.assertEqual(cast(Mock, failing.get_token).call_count, 2)
+            self.assertEqual(provider.next_refresh, now + 60)
+
+    def test_expired(self) -> None:
+        slow = SlowExpiringTokenProvider(delay=0, expires_in=0)
+        provider = CachedTokenProvider(slow)
+
+        self.assertEqual(provider.get_token(), 'token-1')
+        self.assertEqual(provider.get_token(), 'token-2')
+
+    def test_honors_expiry(self) -> None:
+        slow = SlowExpiringTokenProvider(delay=0, expires_in=3600)
+        provider = CachedTokenProvider(slow, ttl=1)
+        provider.get_token()
+
+        self.assertAlmostEqual(cast(tuple[str, float], provider.current)[1], time.time() + 3600, delta=5)
+
+
+class TestHeaders(TestCase):
+    def test_headers_cached_per_token(self) -> None:
+        token = Faker().pystr()
+        token_provider = Mock(TokenProvider)
+        cast(Mock, token_provider.get_token).return_value = token
+        repo = SendgridMailRepository(token_provider)
+
+        headers = repo._get_headers()  # noqa: SLF001
+        self.assertIs(repo._get_headers(), headers)  # noqa: SLF001
+
+        cast(Mock, token_provider.get_token).return_value = 'rotated'
+        self.assertEqual(repo._get_headers(), {'Authorization': 'Bearer rotated'})  # noqa: SLF001
+
+
+class TestContainer(TestCase):
+    def setUp(self) -> None:
+        self.container = Container()
+        load_config(self.container.config)
+
+    def test_token_provider_cached(self) -> None:
+        slow = SlowTokenProvider(delay=0)
+        self.container.config.sendgrid.token_provider.from_value(slow)
+
+        repo = self.container.sendgrid_mail_repo()
+        repo._get_headers()  # noqa: SLF001
+        repo._get_headers()  # noqa: SLF001
+
+        self.assertIsInstance(repo.token_provider, CachedTokenProvider)
+        self.assertIs(cast(CachedTokenProvider, repo.token_provider).provider, slow)
+        self.assertEqual(slow.calls, 1)
+
+    def test_without_token_provider(self) -> None:
+        self.assertIsNone(self.container.sendgrid_mail_repo().token_provider)
@@ -0,0 +1,148 @@
+import smtplib
+import threading
+from typing import cast
+from unittest.mock import Mock
+
+import requests
+from faker import Faker
+from unittest_parametrize import ParametrizedTestCase, parametrize
+
+from repositories import MailRepository
+from repositories.rest import UpstreamUnavailableError
+from repositories.retry import RetryingMailRepository, ack_deadline, is_transient, remaining_time
+
+
+def http_error(status: int) -> requests.HTTPError:
+    resp = requests.Response()
+    resp.status_code = status
+    return requests.HTTPError(response=resp)
+
+
+class TestRetryingMail(ParametrizedTestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.delivery = Mock(MailRepository)
+
+    def create_repo(self, **kwargs: float) -> RetryingMailRepository:
+        return RetryingMailRepository(self.delivery, base_delay=0.01, **kwargs)  # type: ignore[arg-type]
+
+    def send(self, repo: RetryingMailRepository) -> None:
+        repo.send((None, self.faker.email()), (None, self.faker.email()), 'Subject', 'Text', None)
+
+    @parametrize(
+        ('err', 'transient'),
+        [
+            (requests.ConnectionError('Connection reset'), True),
+            (requests.Timeout('Read timed out'), True),
+            (http_error(502), True),
+            (http_error(429), True),
+            (http_error(400), False),
+            (smtplib.SMTPServerDisconnected('Connection unexpectedly closed'), True),
+            (smtplib.SMTPSenderRefused(451, b'Try again later', 'sender@example.org'), True),
+            (smtplib.SMTPDataError(554, b'Rejected'), False),
+            (smtplib.SMTPRecipientsRefused({'receiver@example.org': (450, b'Mailbox busy')}), True),
+            (smtplib.SMTPRecipientsRefused({'receiver@example.org': (550, b'No such user')}), False),
+            (TimeoutError(), True),
+            (UpstreamUnavailableError('Circuit is open', 30), False),
+            (ValueError('Invalid mail'), False),
+        ],
+    )
+    def test_is_transient(self, err: Exception, *, transient: bool) -> None:
+        self.assertEqual(is_transient(err), transient)
+
+    def test_recovered(self) -> None:
+        cast(Mock, self.delivery.send).side_effect = [requests.ConnectionError('Connection reset'), http_error(502), None]
+        repo = self.create_repo()
+
+        with self.assertLogs('RetryingMailRepository', 'WARNING'):
+            self.send(repo)
+
+        self.assertEqual(cast(Mock, self.delivery.send).call_count, 3)
+        stats = repo.stats()
+        self.assertEqual((stats.retries, stats.recovered), (2, 1))
+
+    def test_not_transient(self) -> None:
+        cast(Mock, self.delivery.send).side_effect = http_error(400)
+        repo = self.create_repo()
+
+        with self.assertRaises(requests.HTTPError):
+            self.send(repo)
+
+        self.assertEqual(cast(Mock, self.delivery.send).call_count, 1)
+
+    def test_exhausted(self) -> None:
+        cast(Mock, self.delivery.send).side_effect = http_error(503)
+        repo = self.create_repo(max_attempts=2)
+
+        with self.assertLogs('RetryingMailRepository', 'WARNING'), self.assertRaises(requests.HTTPError):
+            self.send(repo)
+
+        self.assertEqual(cast(Mock, self.delivery.send).call_count, 2)
+        self.assertEqual(repo.stats().exhausted, 1)
+
+    def test_budget(self) -> None:
+        cast(Mock, self.delivery.send).side_effect = http_error(503)
+        repo = self.create_repo(max_attempts=2, max_budget=1, budget_ratio=0)
+
+        with self.assertLogs('RetryingMailRepository', 'WARNING'), self.assertRaises(requests.HTTPError):
+            self.send(repo)
+
+        # The only retry of the budget is spent
+        with self.assertRaises(requests.HTTPError):
+            self.send(repo)
+
+        self.assertEqual(cast(Mock, self.delivery.send).call_count, 3)
+        self.assertEqual(repo.stats().budget_exhausted, 1)
+
+    def test_deadline(self) -> None:
+        cast(Mock, self.delivery.send).side_effect = requests.Timeout('Read timed out')
+        repo = self.create_repo(attempt_timeout=4)
+
+        with ack_deadline(3), self.assertRaises(requests.Timeout):
+            self.send(repo)
+
+        self.assertEqual(cast(Mock, self.delivery.send).call_count, 1)
+        self.assertEqual(repo.stats().deadline_exceeded, 1)
+
+    def test_retry_keeps_deadline(self) -> None:
+        remaining: list[float | None] = []
+
+        def deliver(*_: object) -> None:
+            remaining.append(remaining_time())
+            if len(remaining) == 1:
+                raise requests.ConnectionError('Connection reset')
+
+        cast(Mock, self.delivery.send).side_effect = deliver
+        repo = self.create_repo(attempt_timeout=1)
+
+        with ack_deadline(10), self.assertLogs('RetryingMailRepository', 'WARNING'):
+            self.send(repo)
+
+        self.assertEqual(len(remaining), 2)
+        self.assertIsNotNone(remaining[1])
+
+    def test_retry_on_calling_thread(self) -> None:
+        threads: list[int] = []
+        errors = [requests.ConnectionError('Connection reset'), requests.Timeout('Read timed out')]
+
+        def deliver(*_: object) -> None:
+            threads.append(threading.get_ident())
+            if errors:
+                raise errors.pop()
+
+        cast(Mock, self.delivery.send).side_effect = deliver
+        repo = self.create_repo()
+
+        with self.assertLogs('RetryingMailRepository', 'WARNING'):
+            self.send(repo)
+
+        self.assertEqual(threads, [threading.get_ident()] * 3)
+        self.assertEqual(repo.stats().pending, 0)
+
+    def test_ack_deadline(self) -> None:
+        self.assertIsNone(remaining_time())
+
+        with ack_deadline(20):
+            self.assertAlmostEqual(cast(float, remaining_time()), 20, delta=1)
+
+        self.assertIsNone(remaining_time())
@@ -0,0 +1,45 @@
+from email import message_from_bytes, policy
+from email.message import EmailMessage
+from typing import cast
+from unittest import TestCase
+
+from faker import Faker
+
+from repositories.memory import MemoryBlocklistRepository
+from repositories.smtp import SMTPConnectionPool, SMTPMailRepository
+from scripts.smtp_stub import SMTPStub
+
+
+class TestSMTPMail(TestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+        self.stub = SMTPStub().start()
+        self.addCleanup(self.stub.close)
+        self.pool = SMTPConnectionPool(*self.stub.address, starttls=False)
+        self.addCleanup(self.pool.close)
+
+    def test_send(self) -> None:
+        repo = SMTPMailRepository(self.pool)
+        sender = (self.faker.name(), self.faker.email())
+        receiver = (None, self.faker.email())
+        reply_to = f'<{cast(str, self.faker.uuid4())}@example.org>'
+
+        repo.send(sender, receiver, 'Actualización', 'Texto\n.\nfin', reply_to)
+
+        envelope_sender, recipients, data = self.stub.messages[0]
+        message = cast(EmailMessage, message_from_bytes(data, policy=policy.default))
+        self.assertEqual((envelope_sender, recipients), (sender[1], [receiver[1]]))
+        self.assertEqual(message['From'].addresses[0].display_name, sender[0])
+        self.assertEqual(message['To'], receiver[1])
+        self.assertEqual(message['Subject'], 'Actualización')
+        self.assertEqual(message['In-Reply-To'], reply_to)
+        self.assertEqual(message['References'], reply_to)
+        self.assertTrue(message['Message-ID'].endswith(f'@{sender[1].rpartition("@")[2]}>'))
+        self.assertEqual(message.get_content().splitlines(), ['Texto', '.', 'fin'])
+
+    def test_send_blocked(self) -> None:
+        repo = SMTPMailRepository(self.pool, MemoryBlocklistRepository(['example.org']))
+
+        repo.send((None, self.faker.email()), (None, 'blocked@example.org'), 'Subject', 'Text', None)
+
+        self.assertEqual(self.stub.messages, [])
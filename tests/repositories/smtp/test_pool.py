@@ -0,0 +1,157 @@
+import shutil
+import smtplib
+import ssl
+import threading
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import ClassVar
+from unittest import TestCase, skipIf
+
+from repositories.smtp import SMTPConnectionPool
+from scripts.smtp_stub import SMTPStub, generate_certificate
+
+
+class TestSMTPConnectionPool(TestCase):
+    def start_stub(self, **kwargs: object) -> SMTPStub:
+        stub = SMTPStub(**kwargs).start()  # type: ignore[arg-type]
+        self.addCleanup(stub.close)
+        return stub
+
+    def create_pool(self, stub: SMTPStub, **kwargs: object) -> SMTPConnectionPool:
+        host, port = stub.address
+        pool = SMTPConnectionPool(host, port, starttls=False, **kwargs)  # type: ignore[arg-type]
+        self.addCleanup(pool.close)
+        return pool
+
+    def send(self, pool: SMTPConnectionPool) -> None:
+        with pool.connection() as smtp:
+            smtp.sendmail('sender@example.org', ['receiver@example.org'], b'Subject: Test\r\n\r\nText')
+
+    def test_reuse(self) -> None:
+        stub = self.start_stub()
+        pool = self.create_pool(stub)
+
+        for _ in range(5):
+            self.send(pool)
+
+        self.assertEqual((stub.connections, stub.received), (1, 5))
+        stats = pool.stats()
+        self.assertEqual((stats.opened, stats.reused, stats.idle, stats.in_use), (1, 4, 1, 0))
+
+    def test_bounded(self) -> None:
+        stub = self.start_stub(latency=0.02)
+        pool = self.create_pool(stub, size=3)
+
+        threads = [threading.Thread(target=self.send, args=(pool,)) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(stub.received, 12)
+        self.assertEqual(stub.connections, 3)
+
+    def test_max_messages(self) -> None:
+        stub = self.start_stub()
+        pool = self.create_pool(stub, max_messages=2)
+
+        for _ in range(5):
+            self.send(pool)
+
+        self.assertEqual(stub.connections, 3)
+
+    def test_idle_timeout(self) -> None:
+        stub = self.start_stub()
+        pool = self.create_pool(stub, idle_timeout=0.05)
+
+        self.send(pool)
+        time.sleep(0.1)
+        self.send(pool)
+
+        self.assertEqual(stub.connections, 2)
+        self.assertEqual(pool.stats().reused, 0)
+
+    def test_dead_connection(self) -> None:
+        stub = self.start_stub()
+        pool = self.create_pool(stub, check_after=0)
+
+        self.send(pool)
+        stub.drop_connections()
+        time.sleep(0.05)
+
+        with self.assertLogs('SMTPConnectionPool', 'INFO'):
+            self.send(pool)
+
+        self.assertEqual(stub.received, 2)
+        self.assertEqual(pool.stats().replaced, 1)
+
+    def test_error_keeps_connection(self) -> None:
+        stub = self.start_stub()
+        pool = self.create_pool(stub)
+
+        # A refused command leaves the session usable, a broken connection is dropped
+        with self.assertRaises(smtplib.SMTPResponseException), pool.connection():
+            raise smtplib.SMTPResponseException(550, b'Rejected')
+        with self.assertRaises(smtplib.SMTPServerDisconnected), pool.connection():
+            raise smtplib.SMTPServerDisconnected
+        self.send(pool)
+
+        self.assertEqual(stub.connections, 2)
+        self.assertEqual(pool.stats().in_use, 0)
+
+    def test_exhausted(self) -> None:
+        stub = self.start_stub()
+        pool = self.create_pool(stub, size=1, timeout=0.05)
+
+        with pool.connection(), self.assertRaises(TimeoutError), pool.connection():
+            pass  # pragma: no cover
+
+    def test_close(self) -> None:
+        stub = self.start_stub()
+        pool = self.create_pool(stub)
+
+        with pool.connection() as smtp:
+            pool.close()
+            smtp.sendmail('sender@example.org', ['receiver@example.org'], b'Text')
+
+        self.assertEqual(pool.stats().idle, 0)
+
+
+@skipIf(shutil.which('openssl') is None, 'openssl is needed to generate a certificate')
+class TestSMTPConnectionPoolTLS(TestCase):
+    directory: ClassVar[TemporaryDirectory[str]]
+    certificate: ClassVar[tuple[Path, Path]]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.directory = TemporaryDirectory()
+        cls.certificate = generate_certificate(Path(cls.directory.name))
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.directory.cleanup()
+
+    def test_starttls_login(self) -> None:
+        stub = SMTPStub(credentials=('user', 'secret'), certificate=self.certificate).start()
+        self.addCleanup(stub.close)
+        context = ssl.create_default_context(cafile=self.certificate[0])
+        pool = SMTPConnectionPool(*stub.address, username='user', password='secret', ssl_context=context)  # noqa: S106
+        self.addCleanup(pool.close)
+
+        for _ in range(3):
+            with pool.connection() as smtp:
+                smtp.sendmail('sender@example.org', ['receiver@example.org'], b'Text')
+
+        self.assertEqual((stub.connections, stub.received), (1, 3))
+
+    def test_login_failed(self) -> None:
+        stub = SMTPStub(credentials=('user', 'secret'), certificate=self.certificate).start()
+        self.addCleanup(stub.close)
+        context = ssl.create_default_context(cafile=self.certificate[0])
+        pool = SMTPConnectionPool(*stub.address, username='user', password='wrong', ssl_context=context)  # noqa: S106
+
+        with self.assertRaises(smtplib.SMTPAuthenticationError), pool.connection():
+            pass  # pragma: no cover
+
+        self.assertEqual(pool.stats().opened, 0)
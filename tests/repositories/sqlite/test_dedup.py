@@ -0,0 +1,75 @@
+import tempfile
+from pathlib import Path
+from typing import cast
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from faker import Faker
+
+from repositories import Claim
+from repositories.sqlite import SQLiteDedupRepository
+
+
+class TestSQLiteDedup(TestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = str(Path(tmpdir.name) / 'dedup.sqlite3')
+
+    def test_claim(self) -> None:
+        repo = SQLiteDedupRepository(self.path)
+        key = cast(str, self.faker.uuid4())
+
+        self.assertEqual(repo.claim(key), Claim.CLAIMED)
+        self.assertEqual(repo.claim(key), Claim.IN_FLIGHT)
+
+        repo.complete(key)
+
+        self.assertEqual(repo.claim(key), Claim.DONE)
+
+    def test_shared(self) -> None:
+        # Like two gunicorn workers of the same instance
+        first, second = SQLiteDedupRepository(self.path), SQLiteDedupRepository(self.path)
+        completed, released = cast(str, self.faker.uuid4()), cast(str, self.faker.uuid4())
+
+        self.assertEqual(first.claim(completed), Claim.CLAIMED)
+        self.assertEqual(second.claim(completed), Claim.IN_FLIGHT)
+        first.complete(completed)
+        self.assertEqual(second.claim(completed), Claim.DONE)
+
+        self.assertEqual(first.claim(released), Claim.CLAIMED)
+        first.release(released)
+        self.assertEqual(second.claim(released), Claim.CLAIMED)
+
+    def test_expire(self) -> None:
+        repo = SQLiteDedupRepository(self.path, ttl=60, lease=10, purge_interval=0)
+        claimed, completed = cast(str, self.faker.uuid4()), cast(str, self.faker.uuid4())
+
+        with patch('time.time') as time_mock:
+            cast(Mock, time_mock).return_value = 1000
+            repo.claim(claimed)
+            repo.claim(completed)
+            repo.complete(completed)
+
+            cast(Mock, time_mock).return_value = 1011
+            self.assertEqual(repo.claim(claimed), Claim.CLAIMED)
+            self.assertEqual(repo.claim(completed), Claim.DONE)
+
+            cast(Mock, time_mock).return_value = 1061
+            self.assertEqual(repo.claim(completed), Claim.CLAIMED)
+
+    def test_purge(self) -> None:
+        repo = SQLiteDedupRepository(self.path, lease=10, purge_interval=0)
+        keys = [cast(str, self.faker.uuid4()) for _ in range(3)]
+
+        with patch('time.time') as time_mock:
+            cast(Mock, time_mock).return_value = 1000
+            for key in keys:
+                repo.claim(key)
+
+            cast(Mock, time_mock).return_value = 1011
+            repo.claim(keys[0])
+
+        self.assertEqual(repo._conn().execute('SELECT key FROM dedup').fetchall(), [(keys[0],)])  # noqa: SLF001
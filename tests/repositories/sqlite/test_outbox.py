@@ -0,0 +1,138 @@
+import sqlite3
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import cast
+from unittest import TestCase
+from unittest.mock import Mock
+
+from faker import Faker
+
+from repositories import MailRepository
+from repositories.sqlite import SQLiteOutboxMailRepository
+
+
+class TestOutbox(TestCase):
+    def setUp(self) -> None:
+        self.faker = Faker()
+
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = str(Path(tmpdir.name) / 'outbox.sqlite3')
+
+        self.delivery = Mock(MailRepository)
+
+    def create_repo(self, workers: int, **kwargs: float) -> SQLiteOutboxMailRepository:
+        repo = SQLiteOutboxMailRepository(self.delivery, self.path, workers=workers, poll_interval=0.01, **kwargs)  # type: ignore[arg-type]
+        self.addCleanup(repo.close)
+        return repo
+
+    def send(self, repo: SQLiteOutboxMailRepository) -> dict[str, object]:
+        mail: dict[str, object] = {
+            'sender': (self.faker.name(), self.faker.email()),
+            'receiver': (None, self.faker.email()),
+            'subject': self.faker.sentence(4),
+            'text': self.faker.text(),
+            'reply_to': None,
+        }
+        repo.send(**mail)  # type: ignore[arg-type]
+        return mail
+
+    def wait_until(self, predicate: Callable[[], bool]) -> None:
+        deadline = time.monotonic() + 5
+        while not predicate():
+            if time.monotonic() > deadline:
+                self.fail('Condition not met in time')
+            time.sleep(0.01)
+
+    def test_deliver(self) -> None:
+        repo = self.create_repo(workers=2)
+
+        mail = self.send(repo)
+
+        self.wait_until(lambda: repo.stats().delivered == 1)
+        cast(Mock, self.delivery.send).assert_called_once_with(**mail)
+
+        stats = repo.stats()
+        self.assertEqual(stats.depth, 0)
+        self.assertEqual(stats.failed, 0)
+        self.assertGreater(stats.drain_rate, 0)
+
+    def test_redeliver_after_restart(self) -> None:
+        repo = self.create_repo(workers=0)
+        mail = self.send(repo)
+        self.assertEqual(repo.stats().depth, 1)
+        repo.close()
+
+        restarted = self.create_repo(workers=1)
+
+        self.wait_until(lambda: restarted.stats().depth == 0)
+        cast(Mock, self.delivery.send).assert_called_once_with(**mail)
+
+    def test_reclaim_expired_lease(self) -> None:
+        repo = self.create_repo(workers=0, lease=0)
+        self.send(repo)
+
+        claimed = repo._claim()  # noqa: SLF001
+        self.assertIsNotNone(claimed)
+
+        # The worker that claimed the mail died, once the lease expires it can be claimed again
+        reclaimed = repo._claim()  # noqa: SLF001
+        self.assertIsNotNone(reclaimed)
+        self.assertEqual(cast(tuple[int, str, int], reclaimed)[2], 2)
+
+    def test_retry(self) -> None:
+        cast(Mock, self.delivery.send).side_effect = [RuntimeError('SendGrid is down'), None]
+        repo = self.create_repo(workers=0)
+        self.send(repo)
+
+        row = cast(tuple[int, str, int], repo._claim())  # noqa: SLF001
+        repo._deliver(*row)  # noqa: SLF001
+
+        # Backing off, not available yet
+        self.assertIsNone(repo._claim())  # noqa: SLF001
+        self.assertEqual(repo.stats().depth, 1)
+
+        repo._conn().execute('UPDATE outbox SET available_at = 0')  # noqa: SLF001
+        row = cast(tuple[int, str, int], repo._claim())  # noqa: SLF001
+        repo._deliver(*row)  # noqa: SLF001
+
+        self.assertEqual(repo.stats().depth, 0)
+        self.assertEqual(cast(Mock, self.delivery.send).call_count, 2)
+
+    def test_give_up(self) -> None:
+        cast(Mock, self.delivery.send).side_effect = RuntimeError('Invalid recipient')
+        repo = self.create_repo(workers=0, max_attempts=1)
+        self.send(repo)
+
+        row = cast(tuple[int, str, int], repo._claim())  # noqa: SLF001
+        repo._deliver(*row)  # noqa: SLF001
+
+        stats = repo.stats()
+        self.assertEqual(stats.depth, 0)
+        self.assertEqual(stats.failed, 1)
+        self.assertIsNone(repo._claim())  # noqa: SLF001
+
+    def test_record_failure(self) -> None:
+        repo = self.create_repo(workers=1)
+        conn: sqlite3.Connection | None = None
+
+        def locked(*_: object) -> None:
+            repo.local.conn = conn
+            raise sqlite3.OperationalError('database is locked')
+
+        def send(**_: object) -> None:
+            # The database is locked by the time the delivery is recorded
+            nonlocal conn
+            conn = repo._conn()  # noqa: SLF001
+            repo.local.conn = Mock(sqlite3.Connection, execute=Mock(side_effect=locked))
+
+        cast(Mock, self.delivery.send).side_effect = send
+        with self.assertLogs('SQLiteOutboxMailRepository', 'ERROR') as logs:
+            self.send(repo)
+            self.wait_until(lambda: len(logs.output) > 0)
+
+        self.assertIn('Failed to record the delivery of outbox mail', logs.output[0])
+        self.assertTrue(repo.workers[0].is_alive())
+        self.assertEqual(repo.stats().depth, 1)
@@ -0,0 +1,51 @@
+import threading
+import time
+from dataclasses import dataclass
+from unittest import TestCase
+
+from repositories.window import WindowedFlusher
+
+
+@dataclass
+class Entry:
+    deadline: float
+
+
+class RecordingFlusher(WindowedFlusher[str, Entry]):
+    def __init__(self) -> None:
+        self.flushed: list[tuple[str, str]] = []
+        self.done = threading.Event()
+        super().__init__('test', 1)
+
+    def add(self, key: str, delay: float) -> None:
+        with self.cond:
+            self.pending[key] = Entry(time.monotonic() + delay)
+            self.cond.notify()
+
+    def _flush(self, key: str, _: Entry) -> None:
+        self.flushed.append((key, threading.current_thread().name))
+        self.done.set()
+
+
+class TestWindowedFlusher(TestCase):
+    def test_flush_at_deadline(self) -> None:
+        flusher = RecordingFlusher()
+        self.addCleanup(flusher.close)
+
+        flusher.add('late', 60)
+        flusher.add('soon', 0.01)
+
+        self.assertTrue(flusher.done.wait(5))
+        self.assertEqual([key for key, _ in flusher.flushed], ['soon'])
+        self.assertTrue(flusher.flushed[0][1].startswith('test'))
+        self.assertEqual(list(flusher.pending), ['late'])
+
+    def test_close_flushes_pending(self) -> None:
+        flusher = RecordingFlusher()
+        flusher.add('late', 60)
+
+        flusher.close()
+
+        self.assertEqual([key for key, _ in flusher.flushed], ['late'])
+        self.assertEqual(flusher.pending, {})
+        self.assertFalse(flusher.flusher.is_alive())
@@ -0,0 +1,104 @@
+import json
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from scripts.bench_decoder import gen_event
+from scripts.replay import replay, write_checkpoint
+from scripts.sendgrid_stub import SendgridStub
+
+
+class TestReplay(TestCase):
+    def setUp(self) -> None:
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+        self.stub = SendgridStub().start()
+        self.addCleanup(self.stub.close)
+        env = patch.dict(os.environ, {'SENDGRID_BASE_URL': self.stub.base_url})
+        env.start()
+        self.addCleanup(env.stop)
+
+        self.dump = self.directory / 'events.jsonl'
+        self.checkpoint = self.directory / 'events.checkpoint'
+
+    def write_dump(self, count: int, *extra: str) -> None:
+        lines = [json.dumps(gen_event(3)) for _ in range(count)]
+        self.dump.write_text('\n'.join([*lines, *extra]) + '\n')
+
+    def test_dry_run(self) -> None:
+        self.write_dump(20)
+
+        stats = replay(self.dump, 'alert', workers=4, rate=1000, dry_run=True)
+
+        self.assertEqual((stats.events, stats.mails, stats.failed), (20, 20, 0))
+        self.assertEqual(self.stub.received, 0)
+
+    def test_processes(self) -> None:
+        self.write_dump(10)
+
+        stats = replay(self.dump, 'update', workers=2, processes=True, rate=1000, checkpoint=self.checkpoint)
+
+        self.assertEqual((stats.events, stats.failed), (10, 0))
+        self.assertEqual(self.stub.received, stats.mails)
+
+    def test_send(self) -> None:
+        self.write_dump(10)
+
+        stats = replay(self.dump, 'alert', workers=4, rate=1000, checkpoint=self.checkpoint, checkpoint_every=3)
+
+        self.assertEqual((stats.events, stats.mails), (10, 10))
+        self.assertEqual(self.stub.received, 10)
+        self.assertEqual(json.loads(self.checkpoint.read_text())['line'], 10)
+
+    def test_flood_limits_ignored(self) -> None:
+        # Every event is for the same people
+        first = gen_event(3)
+        lines = [json.dumps(gen_event(3) | {key: first[key] for key in ('reportedBy', 'assignedTo')}) for _ in range(5)]
+        self.dump.write_text('\n'.join(lines) + '\n')
+
+        with patch.dict(os.environ, {'FLOOD_LIMITS': 'default=1/60'}):
+            stats = replay(self.dump, 'alert', workers=2, rate=1000)
+
+        self.assertEqual(stats.mails, 5)
+        self.assertEqual(self.stub.received, 5)
+
+    def test_resume(self) -> None:
+        self.write_dump(10)
+        write_checkpoint(self.checkpoint, self.dump, 4)
+
+        stats = replay(self.dump, 'risk', workers=2, rate=1000, checkpoint=self.checkpoint)
+
+        self.assertEqual((stats.skipped, stats.events), (4, 6))
+        self.assertEqual(self.stub.received, 6)
+
+    def test_resume_out_of_order(self) -> None:
+        self.write_dump(10)
+        write_checkpoint(self.checkpoint, self.dump, 4, {6, 8})
+
+        stats = replay(self.dump, 'risk', workers=2, rate=1000, checkpoint=self.checkpoint)
+
+        self.assertEqual((stats.skipped, stats.events), (6, 4))
+        self.assertEqual(self.stub.received, 4)
+        self.assertEqual(json.loads(self.checkpoint.read_text()), {'dump': str(self.dump), 'line': 10, 'finished': []})
+
+    def test_checkpoint_of_other_dump(self) -> None:
+        self.write_dump(1)
+        write_checkpoint(self.checkpoint, self.directory / 'other.jsonl', 4)
+
+        with self.assertRaises(ValueError):
+            replay(self.dump, 'alert', checkpoint=self.checkpoint)
+
+    def test_failed(self) -> None:
+        self.write_dump(3, '{"id": "invalid"}', '', 'not json')
+        failed = self.directory / 'failed.jsonl'
+
+        with self.assertLogs('replay', 'ERROR'):
+            stats = replay(self.dump, 'alert', rate=1000, checkpoint=self.checkpoint, failed=failed)
+
+        self.assertEqual((stats.events, stats.mails, stats.failed), (5, 3, 2))
+        self.assertEqual(failed.read_text().splitlines(), ['{"id": "invalid"}', 'not json'])
+        self.assertEqual(json.loads(self.checkpoint.read_text())['line'], 6)